@@ -0,0 +1,530 @@
+#!/usr/bin/env bash
+set -euo pipefail
+
+ROOT_DIR="$(cd "$(dirname "$0")/.." && pwd)"
+CACHE_ROOT="${VIBEARENA_CACHE_DIR:-${XDG_CACHE_HOME:-$HOME/.cache}/vibearena}"
+BENCH_DIR="${ROOT_DIR}/.tmp/bench"
+BENCH_WORK="${BENCH_DIR}/work"
+BENCH_CACHE="${BENCH_DIR}/cache"
+BENCH_LOGS="${BENCH_DIR}/logs"
+BENCH_RESULTS="${BENCH_DIR}/results.tsv"
+BASELINE_FILE="${ROOT_DIR}/bench/baseline.json"
+HISTORY_FILE="${BENCH_DIR}/history.jsonl"
+
+. "${ROOT_DIR}/scripts/lib/jobs.sh"
+
+ENGINE_URL="${VIBEARENA_ENGINE_URL:-https://github.com/ioquake/ioq3.git}"
+OPENARENA_URL="https://downloads.sourceforge.net/project/oarena/openarena-0.8.8.zip"
+FIXTURE_DIR="${VIBEARENA_BENCH_FIXTURES:-${CACHE_ROOT}/bench-fixtures}"
+ENGINE_FIXTURE="${FIXTURE_DIR}/ioq3.git"
+OPENARENA_FIXTURE="${FIXTURE_DIR}/openarena-0.8.8.zip"
+
+ALL_SCENARIOS="cold,warm,noop,mod-patch,ten-mods,variant-matrix"
+SCENARIOS="$ALL_SCENARIOS"
+RUNS=1
+THRESHOLD_PCT=20
+# Changes smaller than this are never regressions (timer and scheduler noise).
+MIN_DELTA_MS="${VIBEARENA_BENCH_MIN_DELTA_MS:-1000}"
+BUILD_ARGS=""
+UPDATE_BASELINE=0
+PREPARE=0
+BENCH_MOD="bounce_twice_rockets"
+BENCH_PATCH="${BENCH_WORK}/mods/${BENCH_MOD}/patches/rocket_bounce_twice.patch"
+
+usage() {
+  cat <<'EOF'
+Usage: ./scripts/bench.sh [options]
+
+Benchmarks build.sh and generate_default_mod.sh in a scratch checkout under
+.tmp/bench/, fetching ioquake3 and OpenArena from local fixtures only.
+
+Scenarios (run in this order):
+  cold        Empty caches and checkout: build.sh, then generate_default_mod.sh
+  warm        Populated caches, fresh checkout: build.sh, then generate_default_mod.sh
+  noop        Rerun of both scripts with nothing changed
+  mod-patch   One-line change to the bounce_twice_rockets patch, then generate_default_mod.sh
+  ten-mods    Ten new mods on top of an existing build, with one generate_default_mod.sh --all
+  variant-matrix
+              A new mod built as a default,debug-visible matrix, then its QVMs
+              rebuilt from the shared object set; every object is checked
+              against a single-variant build
+
+Options:
+  --prepare             Create the fixtures (clone ioquake3, fetch the OpenArena zip) and exit
+  --engine-mirror PATH  ioquake3 clone to use as the engine fixture
+  --openarena-zip PATH  openarena-0.8.8.zip to use as the asset fixture
+  --scenarios LIST      Comma-separated subset of the scenarios above (default: all)
+  --runs N              Runs per scenario; the median is recorded (default: 1)
+  --build-args ARGS     Extra arguments for build.sh (for example "--profile dev-fast")
+  --threshold PCT       Slowdown versus the baseline that counts as a regression (default: 20)
+  --update-baseline     Write this run's results to bench/baseline.json
+  -h, --help            Show help
+
+Environment:
+  VIBEARENA_BENCH_FIXTURES       Fixture directory (default: ~/.cache/vibearena/bench-fixtures)
+  VIBEARENA_BENCH_MIN_DELTA_MS   Smallest slowdown in ms reported as a regression (default: 1000)
+EOF
+}
+
+require_cmd() {
+  if ! command -v "$1" >/dev/null 2>&1; then
+    echo "ERROR: required command not found: $1" >&2
+    exit 1
+  fi
+}
+
+now_ms() {
+  perl -MTime::HiRes=time -e 'printf "%d\n", time() * 1000'
+}
+
+prepare_fixtures() {
+  mkdir -p "$FIXTURE_DIR"
+  if [ ! -d "$ENGINE_FIXTURE" ]; then
+    echo "Cloning ioquake3 into ${ENGINE_FIXTURE}..."
+    git clone --quiet --bare "$ENGINE_URL" "$ENGINE_FIXTURE"
+  fi
+  if [ ! -f "$OPENARENA_FIXTURE" ]; then
+    if [ -f "${ROOT_DIR}/openarena-0.8.8.zip" ]; then
+      cp "${ROOT_DIR}/openarena-0.8.8.zip" "$OPENARENA_FIXTURE"
+    else
+      echo "Downloading OpenArena 0.8.8 into ${OPENARENA_FIXTURE}..."
+      curl -fL "$OPENARENA_URL" -o "${OPENARENA_FIXTURE}.download"
+      mv "${OPENARENA_FIXTURE}.download" "$OPENARENA_FIXTURE"
+    fi
+  fi
+  echo "Fixtures ready in ${FIXTURE_DIR}."
+}
+
+reset_work() {
+  local mod_dir
+
+  rm -rf "$BENCH_WORK"
+  mkdir -p "$BENCH_WORK"
+  cp -R "${ROOT_DIR}/scripts" "${ROOT_DIR}/engine" "${ROOT_DIR}/mods" "$BENCH_WORK/"
+  for mod_dir in "$BENCH_WORK"/mods/*/; do
+    rm -rf "${mod_dir}build"
+  done
+  # Reuse a bootstrapped CMake instead of downloading it again.
+  if [ -d "${ROOT_DIR}/.tools" ]; then
+    ln -s "${ROOT_DIR}/.tools" "${BENCH_WORK}/.tools"
+  fi
+}
+
+# Runs a command in the scratch checkout against the fixtures and the
+# benchmark's private cache.
+run_in_work() {
+  (
+    cd "$BENCH_WORK"
+    unset VIBEARENA_TRACE_DIR VIBEARENA_TRACE_PID
+    export VIBEARENA_CACHE_DIR="$BENCH_CACHE"
+    export VIBEARENA_COMPILER_CACHE_DIR="${BENCH_CACHE}/compiler-cache"
+    export VIBEARENA_ENGINE_MIRROR="$ENGINE_FIXTURE"
+    export VIBEARENA_OPENARENA_MIRRORS="file://${OPENARENA_FIXTURE}"
+    "$@"
+  )
+}
+
+# Usage: measure <scenario> <run> <label> <command>...
+# Appends "scenario run label wall_ms cpu_ms trace" to the results file.
+measure() {
+  local scenario="$1"
+  local run="$2"
+  local label="$3"
+  shift 3
+  local log="${BENCH_LOGS}/${scenario}-${run}-${label}.log"
+  local trace="${BENCH_LOGS}/${scenario}-${run}-${label}.trace.json"
+  local cpu_file="${BENCH_LOGS}/.times"
+  local started wall cpu rc=0
+
+  rm -f "${BENCH_WORK}/build_trace.json"
+  started="$(now_ms)"
+  (
+    status=0
+    run_in_work "$@" || status=$?
+    times > "$cpu_file"
+    exit "$status"
+  ) > "$log" 2>&1 < /dev/null || rc=$?
+  wall=$(($(now_ms) - started))
+  if [ "$rc" -ne 0 ]; then
+    echo "ERROR: ${label} failed in scenario ${scenario} (exit ${rc}); last lines of ${log}:" >&2
+    tail -n 20 "$log" >&2
+    exit 1
+  fi
+  cpu="$(awk 'NR == 2 {
+    split($1, u, "m"); split($2, s, "m")
+    printf "%d\n", ((u[1] * 60 + u[2]) + (s[1] * 60 + s[2])) * 1000
+  }' "$cpu_file")"
+  if [ -f "${BENCH_WORK}/build_trace.json" ]; then
+    cp "${BENCH_WORK}/build_trace.json" "$trace"
+  else
+    trace=""
+  fi
+  printf '%s\t%s\t%s\t%s\t%s\t%s\n' "$scenario" "$run" "$label" "$wall" "$cpu" "$trace" >> "$BENCH_RESULTS"
+  echo "  ${label}: ${wall} ms (cpu ${cpu} ms)"
+}
+
+# Brings the scratch checkout to a finished build plus the benchmark mod
+# without measuring it.
+ensure_built() {
+  if [ -x "${BENCH_WORK}/VibeArena_Build/play.sh" ] &&
+    [ -f "${BENCH_WORK}/VibeArena_Build/${BENCH_MOD}/z_${BENCH_MOD}.pk3" ]; then
+    return 0
+  fi
+  echo "  (preparing: build.sh and ${BENCH_MOD}, not measured)"
+  if [ ! -d "$BENCH_WORK" ]; then
+    reset_work
+  fi
+  run_in_work ./scripts/build.sh $BUILD_ARGS > "${BENCH_LOGS}/prepare.log" 2>&1 < /dev/null
+  run_in_work ./scripts/generate_default_mod.sh "$BENCH_MOD" >> "${BENCH_LOGS}/prepare.log" 2>&1 < /dev/null
+}
+
+scenario_cold() {
+  rm -rf "$BENCH_CACHE"
+  reset_work
+  measure cold "$1" build ./scripts/build.sh $BUILD_ARGS
+  measure cold "$1" mod ./scripts/generate_default_mod.sh "$BENCH_MOD"
+}
+
+scenario_warm() {
+  if [ ! -d "${BENCH_CACHE}/engine-builds" ]; then
+    ensure_built
+  fi
+  reset_work
+  measure warm "$1" build ./scripts/build.sh $BUILD_ARGS
+  measure warm "$1" mod ./scripts/generate_default_mod.sh "$BENCH_MOD"
+}
+
+scenario_noop() {
+  ensure_built
+  measure noop "$1" build ./scripts/build.sh $BUILD_ARGS
+  measure noop "$1" mod ./scripts/generate_default_mod.sh "$BENCH_MOD"
+}
+
+# Alternates the rocket slowdown factor so every run is a real one-line edit.
+scenario_mod_patch() {
+  ensure_built
+  if grep -q '0\.65f' "$BENCH_PATCH"; then
+    perl -pi -e 's/0\.65f/0.60f/' "$BENCH_PATCH"
+  elif grep -q '0\.60f' "$BENCH_PATCH"; then
+    perl -pi -e 's/0\.60f/0.65f/' "$BENCH_PATCH"
+  else
+    echo "ERROR: ${BENCH_PATCH} has no 0.65f/0.60f line to edit." >&2
+    exit 1
+  fi
+  measure mod-patch "$1" mod ./scripts/generate_default_mod.sh "$BENCH_MOD"
+}
+
+# Scaffolds ten new mods from the benchmark mod and builds them with one
+# generate_default_mod.sh --all, which rebuilds them in parallel and skips the
+# already built benchmark mod.
+scenario_ten_mods() {
+  local i name
+
+  ensure_built
+  rm -rf "${BENCH_WORK}"/mods/bench_mod_* "${BENCH_WORK}"/VibeArena_Build/bench_mod_* \
+    "${BENCH_WORK}"/VibeArena_Build/run_bench_mod_* "${BENCH_WORK}"/.tmp/stamps/mod-bench_mod_* \
+    "${BENCH_WORK}"/.tmp/stamps/mods-all/mod_bench_mod_* "${BENCH_WORK}"/.tmp/mod-workspaces/bench_mod_*
+  git -C "${BENCH_WORK}/quake_engine" worktree prune
+  # Brings the --all stamps of the existing mods up to date, not measured.
+  run_in_work ./scripts/generate_default_mod.sh --all >> "${BENCH_LOGS}/prepare.log" 2>&1 < /dev/null
+  for i in 01 02 03 04 05 06 07 08 09 10; do
+    name="bench_mod_${i}"
+    mkdir -p "${BENCH_WORK}/mods/${name}/patches"
+    cp "${BENCH_WORK}/mods/${BENCH_MOD}/patches/rocket_bounce_twice.patch" "${BENCH_WORK}/mods/${name}/patches/"
+    sed "s/${BENCH_MOD}/${name}/g" "${BENCH_WORK}/mods/${BENCH_MOD}/README.md" > "${BENCH_WORK}/mods/${name}/README.md"
+  done
+  measure ten-mods "$1" all ./scripts/generate_default_mod.sh --all
+}
+
+# Builds a new mod as a two-variant matrix with the .asm cache off, so the
+# debug variant compiles against the default variant's objects, then
+# rebuilds both QVMs from the object set alone. Every object the matrix
+# linked is then compared with the .asm a single-variant build of the same
+# mod compiles from scratch, so an object overwritten by another variant's
+# compile fails the run.
+scenario_variant_matrix() {
+  local name="bench_matrix"
+  local matrix="${BENCH_WORK}/.tmp/mod-workspaces/${name}.matrix"
+  local variant mod asm key obj bad=0
+
+  ensure_built
+  rm -rf "${BENCH_WORK}"/mods/${name} "${BENCH_WORK}"/mods/${name}_debug \
+    "${BENCH_WORK}"/VibeArena_Build/${name} "${BENCH_WORK}"/VibeArena_Build/${name}_debug \
+    "${BENCH_WORK}"/VibeArena_Build/run_${name}.sh "${BENCH_WORK}"/VibeArena_Build/run_${name}_debug.sh \
+    "${BENCH_WORK}"/.tmp/stamps/matrix-${name} "${BENCH_WORK}"/.tmp/stamps/mod-${name} \
+    "${BENCH_WORK}"/.tmp/stamps/mod-${name}_debug "${BENCH_WORK}"/.tmp/mod-workspaces/${name}*
+  git -C "${BENCH_WORK}/quake_engine" worktree prune
+  measure variant-matrix "$1" matrix env VIBEARENA_QVM_ASM_CACHE=0 \
+    ./scripts/generate_default_mod.sh "$name" --variant default,debug-visible
+  measure variant-matrix "$1" rebuild env VIBEARENA_QVM_ASM_CACHE=0 \
+    ./scripts/generate_default_mod.sh "$name" --variant default,debug-visible --from qvm
+
+  for variant in default debug-visible; do
+    mod="$name"
+    [ "$variant" = "debug-visible" ] && mod="${name}_debug"
+    run_in_work env VIBEARENA_QVM_ASM_CACHE=0 ./scripts/generate_default_mod.sh "$mod" --variant "$variant" \
+      >> "${BENCH_LOGS}/prepare.log" 2>&1 < /dev/null
+    for asm in "${BENCH_WORK}/.tmp/mod-workspaces/${mod}/qvm"/*.asm; do
+      key="$(cat "${asm}.key")"
+      obj="${matrix}/objs/${key}.asm"
+      if [ ! -f "$obj" ] || [ -L "$obj" ] || ! cmp -s "$obj" "$asm"; then
+        echo "ERROR: matrix object for ${variant} $(basename "$asm") (${key}) does not match a single-variant build." >&2
+        bad=1
+      fi
+    done
+  done
+  if [ "$bad" -ne 0 ]; then
+    exit 1
+  fi
+  echo "  objects: match single-variant builds"
+}
+
+# Turns the results file into a history record, compares it with the
+# baseline, and prints the comparison. Exits 3 when a scenario regressed and 4
+# when the baseline has no numbers for any measured scenario.
+report() {
+  local commit dirty=false
+
+  commit="$(git -C "$ROOT_DIR" rev-parse --short HEAD 2>/dev/null || echo unknown)"
+  if [ -n "$(git -C "$ROOT_DIR" status --porcelain --untracked-files=no 2>/dev/null)" ]; then
+    dirty=true
+  fi
+
+  perl -MJSON::PP -e '
+    use strict;
+    use warnings;
+
+    my ($results, $baseline_file, $history_file, $threshold, $min_delta, $update,
+        $commit, $dirty, $host, $cpus, $runs, $build_args) = @ARGV;
+
+    sub median {
+      my @v = sort { $a <=> $b } @_;
+      return $v[int($#v / 2)];
+    }
+
+    # Phase totals (ms) from a Chrome trace: begin/end pairs per thread.
+    sub phases {
+      my ($file, $totals) = @_;
+      return unless $file && -f $file;
+      open(my $fh, "<", $file) or return;
+      local $/;
+      my $trace = decode_json(<$fh>);
+      my %open;
+      for my $e (@{ $trace->{traceEvents} }) {
+        my $thread = "$e->{pid}/" . ($e->{tid} // 0);
+        if ($e->{ph} eq "B") {
+          push @{ $open{$thread} }, $e;
+        } elsif ($e->{ph} eq "E" && @{ $open{$thread} || [] }) {
+          my $b = pop @{ $open{$thread} };
+          $totals->{ $b->{name} } += int(($e->{ts} - $b->{ts}) / 1000);
+        }
+      }
+    }
+
+    my (%runs, @order);
+    open(my $fh, "<", $results) or die "ERROR: no benchmark results in $results.\n";
+    while (my $line = <$fh>) {
+      chomp $line;
+      my ($scenario, $run, $label, $wall, $cpu, $trace) = split /\t/, $line, -1;
+      push @order, $scenario unless $runs{$scenario};
+      my $r = $runs{$scenario}{$run} ||= { wall_ms => 0, cpu_ms => 0, commands => {}, traces => [] };
+      $r->{wall_ms} += $wall;
+      $r->{cpu_ms} += $cpu;
+      $r->{commands}{$label} = $wall + 0;
+      push @{ $r->{traces} }, $trace if $trace;
+    }
+
+    my %scenarios;
+    for my $scenario (@order) {
+      my @runs = values %{ $runs{$scenario} };
+      my $wall = median(map { $_->{wall_ms} } @runs);
+      my ($mid) = grep { $_->{wall_ms} == $wall } @runs;
+      my %phases;
+      phases($_, \%phases) for @{ $mid->{traces} };
+      $scenarios{$scenario} = {
+        wall_ms => $wall,
+        cpu_ms => median(map { $_->{cpu_ms} } @runs),
+        runs => [map { $_->{wall_ms} } @runs],
+        commands => $mid->{commands},
+        phases => \%phases,
+      };
+    }
+
+    my @t = gmtime();
+    my $record = {
+      date => sprintf("%04d-%02d-%02dT%02d:%02d:%02dZ", $t[5] + 1900, $t[4] + 1, @t[3, 2, 1, 0]),
+      commit => $commit,
+      dirty => $dirty eq "true" ? JSON::PP::true : JSON::PP::false,
+      host => $host,
+      cpus => $cpus + 0,
+      runs => $runs + 0,
+      build_args => $build_args,
+      scenarios => \%scenarios,
+    };
+    my $json = JSON::PP->new->canonical;
+
+    open(my $history, ">>", $history_file) or die "ERROR: cannot write $history_file.\n";
+    print $history $json->encode($record), "\n";
+    close($history);
+
+    my $baseline = { scenarios => {} };
+    if (-f $baseline_file) {
+      open(my $bh, "<", $baseline_file) or die "ERROR: cannot read $baseline_file.\n";
+      local $/;
+      $baseline = decode_json(<$bh>);
+    }
+    if (($baseline->{host} // $host) ne $host || ($baseline->{cpus} // $cpus) != $cpus) {
+      printf "Note: baseline was recorded on %s with %s CPUs; this host is %s with %s.\n",
+        $baseline->{host}, $baseline->{cpus}, $host, $cpus;
+    }
+
+    my ($regressed, $checked) = (0, 0);
+    printf "\n  %-10s %12s %12s %8s  %s\n", "scenario", "baseline", "current", "change", "status";
+    for my $scenario (@order) {
+      my $now = $scenarios{$scenario}{wall_ms};
+      my $base = $baseline->{scenarios}{$scenario} && $baseline->{scenarios}{$scenario}{wall_ms};
+      if (!$base) {
+        printf "  %-10s %12s %9d ms %8s  %s\n", $scenario, "-", $now, "-", "NOT CHECKED (no baseline)";
+        next;
+      }
+      $checked++;
+      my $change = ($now - $base) * 100 / $base;
+      my $status = "ok";
+      if ($change > $threshold && $now - $base > $min_delta) {
+        $status = "REGRESSION";
+        $regressed = 1;
+      } elsif ($change < -$threshold && $base - $now > $min_delta) {
+        $status = "faster";
+      }
+      printf "  %-10s %9d ms %9d ms %+7.1f%%  %s\n", $scenario, $base, $now, $change, $status;
+    }
+
+    if ($update) {
+      my %merged = %{ $baseline->{scenarios} || {} };
+      $merged{$_} = { wall_ms => $scenarios{$_}{wall_ms}, cpu_ms => $scenarios{$_}{cpu_ms} } for @order;
+      open(my $out, ">", $baseline_file) or die "ERROR: cannot write $baseline_file.\n";
+      print $out JSON::PP->new->canonical->pretty->encode({
+        commit => $commit,
+        date => $record->{date},
+        host => $host,
+        cpus => $cpus + 0,
+        build_args => $build_args,
+        scenarios => \%merged,
+      });
+      close($out);
+      print "\nBaseline updated: $baseline_file\n";
+    }
+
+    if ($checked < @order && !$update) {
+      printf "\nWARNING: %d of %d scenario(s) have no baseline in %s and were not checked.\n",
+        @order - $checked, scalar @order, $baseline_file;
+    }
+    exit 3 if $regressed;
+    exit 4 if !$checked && !$update;
+    exit 0;
+  ' "$BENCH_RESULTS" "$BASELINE_FILE" "$HISTORY_FILE" "$THRESHOLD_PCT" "$MIN_DELTA_MS" "$UPDATE_BASELINE" \
+    "$commit" "$dirty" "$(uname -s)-$(uname -m)" "$(cpu_count)" "$RUNS" "$BUILD_ARGS"
+}
+
+main() {
+  local scenario run rc=0
+
+  while [ $# -gt 0 ]; do
+    case "$1" in
+      --prepare)
+        PREPARE=1
+        ;;
+      --engine-mirror|--openarena-zip|--scenarios|--runs|--build-args|--threshold)
+        if [ $# -lt 2 ]; then
+          echo "ERROR: $1 requires a value." >&2
+          exit 1
+        fi
+        case "$1" in
+          --engine-mirror) ENGINE_FIXTURE="$2" ;;
+          --openarena-zip) OPENARENA_FIXTURE="$2" ;;
+          --scenarios) SCENARIOS="$2" ;;
+          --runs) RUNS="$2" ;;
+          --build-args) BUILD_ARGS="$2" ;;
+          --threshold) THRESHOLD_PCT="$2" ;;
+        esac
+        shift
+        ;;
+      --update-baseline)
+        UPDATE_BASELINE=1
+        ;;
+      -h|--help)
+        usage
+        exit 0
+        ;;
+      *)
+        echo "ERROR: unknown argument '$1'." >&2
+        usage >&2
+        exit 1
+        ;;
+    esac
+    shift
+  done
+
+  require_cmd git
+  require_cmd perl
+
+  if [ "$PREPARE" = "1" ]; then
+    require_cmd curl
+    prepare_fixtures
+    exit 0
+  fi
+
+  case "$ENGINE_FIXTURE" in
+    /*) ;;
+    *) ENGINE_FIXTURE="$(pwd)/${ENGINE_FIXTURE}" ;;
+  esac
+  case "$OPENARENA_FIXTURE" in
+    /*) ;;
+    *) OPENARENA_FIXTURE="$(pwd)/${OPENARENA_FIXTURE}" ;;
+  esac
+  if [ ! -d "$ENGINE_FIXTURE" ] || [ ! -f "$OPENARENA_FIXTURE" ]; then
+    echo "ERROR: benchmark fixtures missing (${ENGINE_FIXTURE}, ${OPENARENA_FIXTURE}); run ./scripts/bench.sh --prepare once." >&2
+    exit 1
+  fi
+  for scenario in $(echo "$SCENARIOS" | tr ',' ' '); do
+    case ",${ALL_SCENARIOS}," in
+      *",${scenario},"*) ;;
+      *)
+        echo "ERROR: unknown scenario '$scenario' (expected ${ALL_SCENARIOS})." >&2
+        exit 1
+        ;;
+    esac
+  done
+
+  mkdir -p "$BENCH_LOGS"
+  : > "$BENCH_RESULTS"
+
+  for scenario in $(echo "$ALL_SCENARIOS" | tr ',' ' '); do
+    case ",${SCENARIOS}," in
+      *",${scenario},"*) ;;
+      *) continue ;;
+    esac
+    run=1
+    while [ "$run" -le "$RUNS" ]; do
+      echo "Scenario ${scenario} (run ${run}/${RUNS})..."
+      "scenario_$(echo "$scenario" | tr '-' '_')" "$run"
+      run=$((run + 1))
+    done
+  done
+
+  report || rc=$?
+  echo
+  echo "History: ${HISTORY_FILE}"
+  echo "Logs and traces: ${BENCH_LOGS}"
+  if [ "$rc" -eq 3 ]; then
+    echo "ERROR: build pipeline regressed by more than ${THRESHOLD_PCT}% against ${BASELINE_FILE}." >&2
+    exit 1
+  fi
+  if [ "$rc" -eq 4 ]; then
+    echo "ERROR: ${BASELINE_FILE} has no reference numbers for these scenarios, so nothing was checked. Record them on the reference machine with --update-baseline and commit the file." >&2
+    exit 1
+  fi
+  exit "$rc"
+}
+
+main "$@"
@@ -3,22 +3,170 @@ set -euo pipefail
 
 ROOT_DIR="$(cd "$(dirname "$0")/.." && pwd)"
 ENGINE_DIR="${ROOT_DIR}/quake_engine"
-BUILD_DIR="${ENGINE_DIR}/build-macos"
 DIST_DIR="${ROOT_DIR}/VibeArena_Build"
+SERVER_DIST_DIR="${ROOT_DIR}/VibeArena_Server"
 OA_ZIP="${ROOT_DIR}/openarena-0.8.8.zip"
+OA_ZIP_SIDECAR="${OA_ZIP}.verified"
+OA_ZIP_PARTS="${OA_ZIP}.parts"
 OA_EXTRACT="${ROOT_DIR}/openarena_0.8.8"
+OA_EXTRACT_STAMP="${OA_EXTRACT}/.vibearena-extract.stamp"
 VERIFY_CLIENT_LOG="${ROOT_DIR}/verify_client.log"
 VERIFY_DEDICATED_LOG="${ROOT_DIR}/verify_dedicated.log"
+VERIFY_RESULTS="${ROOT_DIR}/verify_results.json"
+BUILD_TRACE="${ROOT_DIR}/build_trace.json"
+
+. "${ROOT_DIR}/scripts/lib/jobs.sh"
+. "${ROOT_DIR}/scripts/lib/compiler_cache.sh"
+. "${ROOT_DIR}/scripts/lib/manifest.sh"
+. "${ROOT_DIR}/scripts/lib/graph.sh"
+. "${ROOT_DIR}/scripts/lib/trace.sh"
+. "${ROOT_DIR}/scripts/lib/mods.sh"
 
 REQUIRED_CMAKE_MAJOR=3
 REQUIRED_CMAKE_MINOR=25
 LOCAL_CMAKE_VERSION="3.31.6"
-LOCAL_CMAKE_DIR="${ROOT_DIR}/.tools/cmake-${LOCAL_CMAKE_VERSION}-macos-universal"
-LOCAL_CMAKE_ARCHIVE="${ROOT_DIR}/.tools/cmake-${LOCAL_CMAKE_VERSION}-macos-universal.tar.gz"
-LOCAL_CMAKE_BIN="${LOCAL_CMAKE_DIR}/CMake.app/Contents/bin/cmake"
+case "$(uname -s)" in
+  Darwin)
+    LOCAL_CMAKE_PLATFORM="macos-universal"
+    LOCAL_CMAKE_BIN_PATH="CMake.app/Contents/bin/cmake"
+    ;;
+  *)
+    LOCAL_CMAKE_PLATFORM="linux-$(uname -m)"
+    LOCAL_CMAKE_BIN_PATH="bin/cmake"
+    ;;
+esac
+LOCAL_CMAKE_DIR="${ROOT_DIR}/.tools/cmake-${LOCAL_CMAKE_VERSION}-${LOCAL_CMAKE_PLATFORM}"
+LOCAL_CMAKE_ARCHIVE="${ROOT_DIR}/.tools/cmake-${LOCAL_CMAKE_VERSION}-${LOCAL_CMAKE_PLATFORM}.tar.gz"
+LOCAL_CMAKE_BIN="${LOCAL_CMAKE_DIR}/${LOCAL_CMAKE_BIN_PATH}"
+
+ENGINE_URL="${VIBEARENA_ENGINE_URL:-https://github.com/ioquake/ioq3.git}"
+ENGINE_PIN_FILE="${ROOT_DIR}/engine/ioq3.rev"
+# A local bare clone (path or file:// URL) fetched from instead of ENGINE_URL
+# for offline builds.
+ENGINE_SOURCE="${VIBEARENA_ENGINE_MIRROR:-$ENGINE_URL}"
+# Patch series applied to the pristine checkout in file name order, or "none".
+ENGINE_PATCH_DIR="${VIBEARENA_ENGINE_PATCHES:-${ROOT_DIR}/engine/patches}"
+# What build.sh last applied to quake_engine/ (revision, patch set, diff).
+ENGINE_PATCH_RECORD="${ENGINE_DIR}/.git/vibearena-patches"
 
 OPENARENA_PRIMARY_URL="https://sourceforge.net/projects/oarena/files/openarena-0.8.8.zip/download"
 OPENARENA_FALLBACK_URL="https://downloads.sourceforge.net/project/oarena/openarena-0.8.8.zip"
+# Space-separated; file:// and local http:// stand-ins work for offline runs.
+OPENARENA_MIRRORS="${VIBEARENA_OPENARENA_MIRRORS:-${OPENARENA_PRIMARY_URL} ${OPENARENA_FALLBACK_URL}}"
+DOWNLOAD_SEGMENTS="${VIBEARENA_DOWNLOAD_SEGMENTS:-4}"
+# Expected SHA-256 of openarena-0.8.8.zip. When empty, the first download that
+# passes a full CRC test is recorded in the sidecar and later runs compare to it.
+OPENARENA_SHA256="${VIBEARENA_OPENARENA_SHA256:-}"
+
+BUILD_PROFILE="${VIBEARENA_BUILD_PROFILE:-release}"
+ENGINE_CLIENT_TARGET="ioquake3"
+ENGINE_SERVER_TARGET="ioq3ded"
+# ioquake3's CMake options; with the client off, SDL is never looked up.
+SERVER_ONLY_CMAKE_ARGS="-DBUILD_CLIENT=OFF -DBUILD_RENDERER_GL1=OFF -DBUILD_RENDERER_GL2=OFF"
+# Comma-separated: client, dedicated, opengl1, opengl2, qvms, raw CMake target
+# names, or "all". Defaults to client,dedicated,opengl1 (ioquake3 loads opengl1
+# by default and falls back to it), or dedicated in server-only mode.
+ENGINE_TARGETS="${VIBEARENA_TARGETS:-}"
+SERVER_ONLY="${VIBEARENA_SERVER_ONLY:-0}"
+CACHE_ROOT="${VIBEARENA_CACHE_DIR:-${XDG_CACHE_HOME:-$HOME/.cache}/vibearena}"
+ENGINE_CACHE_DIR="${CACHE_ROOT}/engine-builds"
+ENGINE_MIRROR_DIR="${CACHE_ROOT}/git/ioq3.git"
+ENGINE_CACHE_MAX_MB="${VIBEARENA_ENGINE_CACHE_MAX_MB:-2048}"
+ENGINE_CACHE_ENABLED="${VIBEARENA_ENGINE_CACHE:-1}"
+CLEAN_DIST="0"
+BUILD_MODS="0"
+LIST_NODES="0"
+VERIFY_TIMEOUT="${VIBEARENA_VERIFY_TIMEOUT:-20}"
+# any: client or dedicated must pass; all: every check must pass; off: report only.
+VERIFY_GATE="${VIBEARENA_VERIFY:-any}"
+
+# pgo profile: training/benchmark workload (headless bot matches).
+PGO_MAPS="${VIBEARENA_PGO_MAPS:-oa_dm1 oa_dm4}"
+PGO_BOTS="${VIBEARENA_PGO_BOTS:-8}"
+PGO_TRAIN_FRAMES="${VIBEARENA_PGO_TRAIN_FRAMES:-1200}"
+PGO_BENCH_FRAMES="${VIBEARENA_PGO_BENCH_FRAMES:-1200}"
+PGO_MOD="${VIBEARENA_PGO_MOD:-bounce_twice_rockets}"
+
+# Set by configure_build_profile(): per-profile build tree and flag set.
+BUILD_DIR=""
+ENGINE_MANIFEST=""
+BUILD_TYPE=""
+PROFILE_C_FLAGS=""
+PROFILE_LINKER_FLAGS=""
+PROFILE_UNITY="OFF"
+PROFILE_CMAKE_ARGS=""
+# Set by the cmake and engine-fetch nodes.
+CMAKE_BIN=""
+ENGINE_HEAD=""
+ENGINE_DIFF=""
+ENGINE_PATCH_COUNT=0
+# Set by build_engine(): client bundle and dedicated binary to ship.
+CLIENT_APP=""
+DED_BIN=""
+# Set by verify_dist(): scratch directory for per-check results.
+VERIFY_WORK=""
+# Set by download_openarena_zip(): SHA-256 of the verified archive.
+OA_ZIP_SHA256=""
+# Set by the assets node: size and mtime of the archive it verified.
+OA_ZIP_STAT=""
+# Set by extract_openarena(): extracted baseoa directory.
+OA_BASEOA_DIR=""
+
+usage() {
+  cat <<'EOF'
+Usage: ./scripts/build.sh [options]
+
+Options:
+  --no-cache            Always configure and compile ioquake3 (bypass the engine build cache)
+  --clean               Delete VibeArena_Build/ (including mod profiles) before assembling
+  --only NODES          Run only these build graph nodes (comma-separated); the
+                        others keep the results of their last successful run
+  --from NODE           Rerun NODE and every node after it, even if up to date
+  --mods                Also rebuild every mod under mods/ (nodes mod:<name>)
+  --list-nodes          Print the build graph nodes and exit
+  --engine-patches DIR  Engine patch series to apply (default: engine/patches;
+                        "none" builds the pristine revision)
+  --profile NAME        Engine build profile: dev-fast, release (default), native,
+                        profiling, or pgo (PGO+LTO trained on a headless bot match)
+  --targets LIST        Engine targets to build, comma-separated: client, dedicated,
+                        opengl1, opengl2, qvms, CMake target names, or all
+                        (default: client,dedicated,opengl1)
+  --verify MODE         Gate on verification: any (default), all, or off
+  --server-only         Build ioq3ded only (no client, renderers, or SDL) and
+                        assemble VibeArena_Server/
+  --concurrent          Deprecated, no effect: independent nodes always run in parallel
+  -h, --help            Show help
+
+Environment:
+  VIBEARENA_CACHE_DIR             Shared cache root (default: ~/.cache/vibearena)
+  VIBEARENA_ENGINE_CACHE_MAX_MB   Engine build cache size cap in MB (default: 2048)
+  VIBEARENA_ENGINE_CACHE=0        Same as --no-cache
+  VIBEARENA_GRAPH_JOBS            Build graph nodes run at the same time (default: 4)
+  VIBEARENA_BUILD_PROFILE         Same as --profile
+  VIBEARENA_PGO_MAPS              pgo training maps (default: "oa_dm1 oa_dm4"; the first is benchmarked)
+  VIBEARENA_PGO_BOTS              Bots per pgo training match (default: 8)
+  VIBEARENA_PGO_TRAIN_FRAMES      Server frames per training map (default: 1200)
+  VIBEARENA_PGO_BENCH_FRAMES      Server frames per benchmark run (default: 1200)
+  VIBEARENA_PGO_MOD               Mod whose QVM runs during training, if packaged (default: bounce_twice_rockets)
+  VIBEARENA_TARGETS               Same as --targets
+  VIBEARENA_SERVER_ONLY=1         Same as --server-only
+  VIBEARENA_VERIFY                Same as --verify
+  VIBEARENA_VERIFY_TIMEOUT        Seconds each verification run may take (default: 20)
+  VIBEARENA_ENGINE_REV            ioquake3 commit to build instead of engine/ioq3.rev
+  VIBEARENA_ENGINE_URL            ioquake3 upstream (default: https://github.com/ioquake/ioq3.git)
+  VIBEARENA_ENGINE_MIRROR         Local ioquake3 clone to fetch from instead (offline builds)
+  VIBEARENA_ENGINE_PATCHES        Same as --engine-patches
+  VIBEARENA_COMPILER_CACHE        auto (default), ccache, sccache, or none
+  VIBEARENA_COMPILER_CACHE_DIR    Compiler cache location (default: ~/.cache/vibearena/compiler-cache)
+  VIBEARENA_COMPILER_CACHE_MAX_SIZE  Compiler cache size cap (default: 5G)
+  VIBEARENA_JOBS                  Fixed job count for every parallel step
+  VIBEARENA_JOB_BUDGET            Host-wide job budget shared by concurrent builds (default: usable cores)
+  VIBEARENA_MB_PER_JOB            Memory reserved per compile job in MB (default: 512)
+  VIBEARENA_OPENARENA_SHA256      Pinned SHA-256 of openarena-0.8.8.zip
+  VIBEARENA_OPENARENA_MIRRORS     Space-separated mirror URLs to race (http(s):// or file://)
+  VIBEARENA_DOWNLOAD_SEGMENTS     Parallel byte-range segments per download (default: 4)
+EOF
+}
 
 require_cmd() {
   if ! command -v "$1" >/dev/null 2>&1; then
@@ -55,7 +203,7 @@ detect_cmake() {
 
   if [ ! -x "$LOCAL_CMAKE_BIN" ]; then
     echo "Bootstrapping local CMake ${LOCAL_CMAKE_VERSION} into .tools/"
-    curl -L "https://github.com/Kitware/CMake/releases/download/v${LOCAL_CMAKE_VERSION}/cmake-${LOCAL_CMAKE_VERSION}-macos-universal.tar.gz" -o "$LOCAL_CMAKE_ARCHIVE"
+    curl -L "https://github.com/Kitware/CMake/releases/download/v${LOCAL_CMAKE_VERSION}/cmake-${LOCAL_CMAKE_VERSION}-${LOCAL_CMAKE_PLATFORM}.tar.gz" -o "$LOCAL_CMAKE_ARCHIVE"
     tar -xzf "$LOCAL_CMAKE_ARCHIVE" -C "${ROOT_DIR}/.tools"
   fi
 
@@ -67,88 +215,1253 @@ detect_cmake() {
   echo "$LOCAL_CMAKE_BIN"
 }
 
-download_openarena_zip() {
-  if [ -f "$OA_ZIP" ] && unzip -tq "$OA_ZIP" >/dev/null 2>&1; then
-    echo "Using cached OpenArena archive: $OA_ZIP"
+sha256_stdin() {
+  if command -v shasum >/dev/null 2>&1; then
+    shasum -a 256 | awk '{print $1}'
+  else
+    sha256sum | awk '{print $1}'
+  fi
+}
+
+# Everything that can change the compiled engine without changing this script.
+engine_cache_key() {
+  local compiler="${CC:-cc}"
+  {
+    echo "commit=$(git -C "$ENGINE_DIR" rev-parse HEAD)"
+    echo "patches=$(git -C "$ENGINE_DIR" diff HEAD --binary | sha256_stdin)"
+    echo "profile=${BUILD_PROFILE} build_type=${BUILD_TYPE} unity=${PROFILE_UNITY}"
+    echo "targets=$(engine_cmake_targets) server_only=${SERVER_ONLY}"
+    echo "cflags=${PROFILE_C_FLAGS}"
+    echo "ldflags=${PROFILE_LINKER_FLAGS}"
+    if [ "$BUILD_PROFILE" = "pgo" ]; then
+      echo "pgo=${PGO_MAPS} ${PGO_BOTS} ${PGO_TRAIN_FRAMES} mod=$(pgo_mod_hash)"
+    fi
+    if [ "$BUILD_PROFILE" = "native" ]; then
+      # -march=native output is only valid on the same CPU model.
+      echo "cpu=$(host_cpu_model)"
+    fi
+    echo "compiler=$(command -v "$compiler" 2>/dev/null || echo "$compiler") $("$compiler" --version 2>/dev/null | head -n1)"
+    echo "host=$(uname -s)-$(uname -m)"
+  } | sha256_stdin
+}
+
+evict_engine_cache() {
+  local keep="$1"
+  local max_kb total_kb stamp entry entry_kb
+
+  # Half-written entries from interrupted runs.
+  find "$ENGINE_CACHE_DIR" -mindepth 1 -maxdepth 1 -type d -name '*.tmp.*' -mtime +0 -exec rm -rf {} + 2>/dev/null || true
+
+  max_kb=$((ENGINE_CACHE_MAX_MB * 1024))
+  total_kb="$(du -sk "$ENGINE_CACHE_DIR" | awk '{print $1}')"
+
+  # Oldest .last_used stamp first; every cache hit touches it.
+  while IFS= read -r stamp; do
+    [ "$total_kb" -le "$max_kb" ] && break
+    entry="$(dirname "$stamp")"
+    [ "$(basename "$entry")" = "$keep" ] && continue
+    entry_kb="$(du -sk "$entry" | awk '{print $1}')"
+    rm -rf "$entry"
+    total_kb=$((total_kb - entry_kb))
+    echo "Evicted engine build cache entry $(basename "$entry" | cut -c1-12)"
+  done < <(ls -1tr "$ENGINE_CACHE_DIR"/*/.last_used 2>/dev/null)
+}
+
+store_engine_cache() {
+  local key="$1"
+  local entry="${ENGINE_CACHE_DIR}/${key}"
+  local tmp_entry="${entry}.tmp.$$"
+
+  mkdir -p "$ENGINE_CACHE_DIR"
+  rm -rf "$tmp_entry"
+  mkdir -p "$tmp_entry"
+  if [ -n "$CLIENT_APP" ]; then
+    cp -R "$CLIENT_APP" "$tmp_entry/"
+  fi
+  cp "$DED_BIN" "$tmp_entry/"
+  touch "$tmp_entry/.last_used"
+
+  # Publish with a rename so concurrent builds never restore a partial entry.
+  if ! mv "$tmp_entry" "$entry" 2>/dev/null; then
+    rm -rf "$tmp_entry"
+  fi
+  evict_engine_cache "$key"
+}
+
+host_cpu_model() {
+  if [ -r /proc/cpuinfo ]; then
+    awk -F': ' '/^(model name|CPU part|Hardware)/ { print $2; exit }' /proc/cpuinfo
+  else
+    sysctl -n machdep.cpu.brand_string 2>/dev/null || uname -m
+  fi
+}
+
+fast_linker_flag() {
+  case "$(uname -s)" in
+    Darwin)
+      # Apple's default linker is already the fast one; use lld only if present.
+      if command -v ld64.lld >/dev/null 2>&1; then
+        echo "-fuse-ld=lld"
+      fi
+      ;;
+    *)
+      if command -v mold >/dev/null 2>&1; then
+        echo "-fuse-ld=mold"
+      elif command -v ld.lld >/dev/null 2>&1; then
+        echo "-fuse-ld=lld"
+      elif command -v ld.gold >/dev/null 2>&1; then
+        echo "-fuse-ld=gold"
+      fi
+      ;;
+  esac
+}
+
+# Profiles build in separate trees (quake_engine/build-<profile>) and key the
+# engine build cache separately, so switching never invalidates another
+# profile's objects. CFLAGS/LDFLAGS from the environment are kept as a base.
+configure_build_profile() {
+  local linker
+
+  PROFILE_C_FLAGS="${CFLAGS:-}"
+  PROFILE_LINKER_FLAGS="${LDFLAGS:-}"
+  PROFILE_UNITY="OFF"
+  PROFILE_CMAKE_ARGS=""
+
+  case "$BUILD_PROFILE" in
+    dev-fast)
+      BUILD_TYPE="Debug"
+      PROFILE_UNITY="${VIBEARENA_UNITY_BUILD:-ON}"
+      linker="$(fast_linker_flag)"
+      PROFILE_LINKER_FLAGS="${PROFILE_LINKER_FLAGS:+${PROFILE_LINKER_FLAGS} }${linker}"
+      ;;
+    release)
+      BUILD_TYPE="Release"
+      ;;
+    native)
+      BUILD_TYPE="Release"
+      case "$(uname -m)" in
+        arm64|aarch64) PROFILE_C_FLAGS="${PROFILE_C_FLAGS:+${PROFILE_C_FLAGS} }-mcpu=native" ;;
+        *) PROFILE_C_FLAGS="${PROFILE_C_FLAGS:+${PROFILE_C_FLAGS} }-march=native" ;;
+      esac
+      ;;
+    profiling)
+      BUILD_TYPE="RelWithDebInfo"
+      PROFILE_C_FLAGS="${PROFILE_C_FLAGS:+${PROFILE_C_FLAGS} }-fno-omit-frame-pointer"
+      # macOS already keeps debug info out of the binary (objects + dsymutil).
+      if [ "$(uname -s)" != "Darwin" ]; then
+        PROFILE_C_FLAGS="${PROFILE_C_FLAGS} -gsplit-dwarf"
+      fi
+      ;;
+    pgo)
+      # Profile-use flags are added by pgo_train once the profile exists.
+      BUILD_TYPE="Release"
+      PROFILE_CMAKE_ARGS="-DCMAKE_INTERPROCEDURAL_OPTIMIZATION=ON"
+      ;;
+    *)
+      echo "ERROR: unknown build profile '$BUILD_PROFILE' (expected dev-fast, release, native, profiling, or pgo)." >&2
+      exit 1
+      ;;
+  esac
+
+  case "$PROFILE_UNITY" in
+    1|ON|on) PROFILE_UNITY="ON" ;;
+    *) PROFILE_UNITY="OFF" ;;
+  esac
+
+  BUILD_DIR="${ENGINE_DIR}/build-${BUILD_PROFILE}"
+  if [ "$SERVER_ONLY" = "1" ]; then
+    PROFILE_CMAKE_ARGS="${PROFILE_CMAKE_ARGS:+${PROFILE_CMAKE_ARGS} }${SERVER_ONLY_CMAKE_ARGS}"
+    BUILD_DIR="${BUILD_DIR}-server"
+    ENGINE_TARGETS="${ENGINE_TARGETS:-dedicated}"
+  else
+    ENGINE_TARGETS="${ENGINE_TARGETS:-client,dedicated,opengl1}"
+  fi
+  ENGINE_MANIFEST="${BUILD_DIR}/vibearena-manifest.tsv"
+}
+
+# Maps the --targets selection to CMake target names ("all" stays "all").
+engine_cmake_targets() {
+  local name
+  local names=""
+
+  for name in $(echo "$ENGINE_TARGETS" | tr ',' ' '); do
+    case "$name" in
+      all) echo "all"; return 0 ;;
+      client) name="$ENGINE_CLIENT_TARGET" ;;
+      dedicated) name="$ENGINE_SERVER_TARGET" ;;
+      opengl1|opengl2) name="renderer_${name}" ;;
+    esac
+    names="${names:+${names} }${name}"
+  done
+  echo "$names"
+}
+
+validate_engine_targets() {
+  local targets=" $(engine_cmake_targets) "
+
+  if [ "$SERVER_ONLY" = "1" ]; then
+    case "$targets" in
+      *" all "*|*" ${ENGINE_CLIENT_TARGET} "*|*" renderer_"*)
+        echo "ERROR: --server-only builds no client or renderers; drop them from --targets." >&2
+        exit 1
+        ;;
+    esac
+  fi
+  case "$targets" in
+    *" all "*) return 0 ;;
+  esac
+  case "$targets" in
+    *" ${ENGINE_SERVER_TARGET} "*) ;;
+    *)
+      echo "ERROR: --targets must include dedicated; the distribution ships it." >&2
+      exit 1
+      ;;
+  esac
+  if [ "$SERVER_ONLY" = "1" ]; then
     return 0
   fi
+  case "$targets" in
+    *" ${ENGINE_CLIENT_TARGET} "*) ;;
+    *)
+      echo "ERROR: --targets must include client; the distribution ships it." >&2
+      exit 1
+      ;;
+  esac
+}
 
-  echo "Downloading OpenArena 0.8.8 assets..."
-  curl -L "$OPENARENA_PRIMARY_URL" -o "$OA_ZIP"
+# Prints which targets were left out and the build time saved, estimated from
+# the share of compile units the selection covered.
+report_target_savings() {
+  local plan="$1"
+  local elapsed="$2"
+  local selected total skipped full
 
-  if ! unzip -tq "$OA_ZIP" >/dev/null 2>&1; then
-    echo "Primary URL did not return a valid zip, retrying fallback mirror..."
-    curl -L "$OPENARENA_FALLBACK_URL" -o "$OA_ZIP"
+  selected="$(echo "$plan" | awk -F '\t' '$1 == "units" { print $2 }')"
+  total="$(echo "$plan" | awk -F '\t' '$1 == "units" { print $3 }')"
+  skipped="$(echo "$plan" | awk -F '\t' '$1 == "skipped" { printf "%s%s", sep, $2; sep = " " }')"
+
+  echo "Built targets: $(echo "$plan" | awk -F '\t' '$1 == "target" { printf "%s%s", sep, $2; sep = " " }') (${selected} of ${total} compile units)"
+  if [ -n "$skipped" ]; then
+    echo "Skipped targets: $skipped"
+  fi
+  if [ "$selected" -gt 0 ] && [ "$total" -gt "$selected" ]; then
+    full=$((elapsed * total / selected))
+    echo "Engine build took ${elapsed}s; a full build would take ~${full}s (~$((full - elapsed))s saved, estimated from compile units)."
   fi
+}
 
-  if ! unzip -tq "$OA_ZIP" >/dev/null 2>&1; then
-    echo "ERROR: unable to fetch a valid OpenArena 0.8.8 zip archive." >&2
+# Usage: configure_engine <cmake_bin> <ON|OFF unity>
+configure_engine() {
+  local cmake_bin="$1"
+  local unity="$2"
+  local generator_args=""
+
+  # The generator is fixed once a tree is configured; only pick one for new trees.
+  if [ ! -f "$BUILD_DIR/CMakeCache.txt" ] && command -v ninja >/dev/null 2>&1; then
+    generator_args="-G Ninja"
+  fi
+  manifest_request "$BUILD_DIR"
+
+  echo "Configuring ioquake3 (${BUILD_PROFILE}: ${BUILD_TYPE}, unity ${unity}${PROFILE_C_FLAGS:+, CFLAGS ${PROFILE_C_FLAGS}}${PROFILE_LINKER_FLAGS:+, LDFLAGS ${PROFILE_LINKER_FLAGS}})..."
+  "$cmake_bin" -S "$ENGINE_DIR" -B "$BUILD_DIR" $generator_args \
+    -DCMAKE_BUILD_TYPE="$BUILD_TYPE" \
+    -DCMAKE_UNITY_BUILD="$unity" \
+    -DCMAKE_C_FLAGS="$PROFILE_C_FLAGS" \
+    -DCMAKE_EXE_LINKER_FLAGS="$PROFILE_LINKER_FLAGS" \
+    -DCMAKE_SHARED_LINKER_FLAGS="$PROFILE_LINKER_FLAGS" \
+    -DCMAKE_MODULE_LINKER_FLAGS="$PROFILE_LINKER_FLAGS" \
+    $PROFILE_CMAKE_ARGS $COMPILER_CACHE_CMAKE_ARGS
+}
+
+pgo_mod_pk3() {
+  local pk3="${DIST_DIR}/${PGO_MOD}/z_${PGO_MOD}.pk3"
+
+  if [ -f "$pk3" ]; then
+    echo "$pk3"
+  fi
+}
+
+pgo_mod_hash() {
+  local pk3
+
+  pk3="$(pgo_mod_pk3)"
+  if [ -n "$pk3" ]; then
+    sha256_stdin < "$pk3"
+  else
+    echo "none"
+  fi
+}
+
+pgo_is_clang() {
+  "${CC:-cc}" --version 2>/dev/null | grep -qi clang
+}
+
+pgo_profdata_tool() {
+  if command -v xcrun >/dev/null 2>&1 && xcrun -f llvm-profdata >/dev/null 2>&1; then
+    xcrun -f llvm-profdata
+  else
+    compgen -c llvm-profdata | sort -t- -k3,3n | tail -n1
+  fi
+}
+
+# Training/benchmark sandbox: OpenArena data, the packaged mod (if any), and a
+# private home path so nothing is written into the extracted assets.
+pgo_setup_sandbox() {
+  local sandbox="${ROOT_DIR}/.tmp/pgo-train"
+  local pk3
+
+  rm -rf "$sandbox"
+  mkdir -p "$sandbox/home"
+  ln -s "$OA_BASEOA_DIR" "$sandbox/baseoa"
+  pk3="$(pgo_mod_pk3)"
+  if [ -n "$pk3" ]; then
+    mkdir -p "$sandbox/$PGO_MOD"
+    ln -s "$pk3" "$sandbox/$PGO_MOD/"
+  fi
+}
+
+# Usage: pgo_workload <ioq3ded> <map> <frames> <log>
+# A headless bot match for a fixed number of server frames; prints the
+# run_timed result line.
+pgo_workload() {
+  local bin="$1"
+  local map="$2"
+  local frames="$3"
+  local log="$4"
+  local sandbox="${ROOT_DIR}/.tmp/pgo-train"
+  local mod_args=""
+
+  if [ -n "$(pgo_mod_pk3)" ]; then
+    mod_args="+set fs_game ${PGO_MOD} +set vm_game 2"
+  fi
+
+  # 20 server frames per second, with headroom for instrumented binaries.
+  run_timed $((frames / 5 + 60)) "$log" "$sandbox" "$bin" \
+    +set dedicated 1 \
+    +set net_enabled 0 \
+    +set fs_basepath "$sandbox" \
+    +set fs_homepath "$sandbox/home" \
+    +set com_basegame baseoa \
+    $mod_args \
+    +set g_gametype 0 \
+    +set fraglimit 0 \
+    +set timelimit 0 \
+    +set bot_enable 1 \
+    +set bot_minplayers "$PGO_BOTS" \
+    +map "$map" \
+    +wait "$frames" \
+    +quit
+}
+
+# Stages 1 and 2 of the pgo profile: builds an instrumented ioq3ded in the
+# pgo tree, trains it on headless bot matches, and appends the profile-use
+# flags for stage 3 (the regular configure/build that follows). Instrumented
+# and optimized objects share one tree because GCC names .gcda files after
+# the object paths.
+pgo_train() {
+  local cmake_bin="$1"
+  local profile_dir="${BUILD_DIR}/pgo-profile"
+  local base_c_flags="$PROFILE_C_FLAGS"
+  local base_linker_flags="$PROFILE_LINKER_FLAGS"
+  local generate="-fprofile-generate=${profile_dir}"
+  local use jobs instrumented map result profdata
+
+  echo "PGO stage 1/3: building instrumented ioq3ded..."
+  PROFILE_C_FLAGS="${base_c_flags:+${base_c_flags} }${generate}"
+  PROFILE_LINKER_FLAGS="${base_linker_flags:+${base_linker_flags} }${generate}"
+  configure_engine "$cmake_bin" OFF
+  jobs="$(jobs_acquire compile)"
+  "$cmake_bin" --build "$BUILD_DIR" -j"$jobs" --target "$ENGINE_SERVER_TARGET"
+  jobs_release compile
+  manifest_write "$BUILD_DIR" "$ENGINE_MANIFEST" "$BUILD_TYPE" "$ENGINE_SERVER_TARGET"
+  instrumented="$(manifest_path "$ENGINE_MANIFEST" "$ENGINE_SERVER_TARGET")"
+
+  rm -rf "$profile_dir"
+  mkdir -p "$profile_dir"
+  pgo_setup_sandbox
+  echo "PGO stage 2/3: training on ${PGO_MAPS} (${PGO_BOTS} bots, ${PGO_TRAIN_FRAMES} frames each$([ -n "$(pgo_mod_pk3)" ] && echo ", mod ${PGO_MOD}"))..."
+  for map in $PGO_MAPS; do
+    result="$(pgo_workload "$instrumented" "$map" "$PGO_TRAIN_FRAMES" "${ROOT_DIR}/.tmp/pgo-train/train-${map}.log")"
+    case "${result%% *}" in
+      0) echo "  ${map}: $(echo "$result" | awk '{ printf "%.1fs", $2 / 1000 }')" ;;
+      timeout) echo "  ${map}: stopped at the time limit (profile kept)" ;;
+      *)
+        echo "ERROR: PGO training on ${map} failed; see .tmp/pgo-train/train-${map}.log." >&2
+        exit 1
+        ;;
+    esac
+  done
+
+  if pgo_is_clang; then
+    profdata="$(pgo_profdata_tool)"
+    if [ -z "$profdata" ]; then
+      echo "ERROR: llvm-profdata not found; it is needed to merge clang PGO profiles." >&2
+      exit 1
+    fi
+    "$profdata" merge -output="${profile_dir}/merged.profdata" "$profile_dir"/*.profraw
+    use="-fprofile-use=${profile_dir}/merged.profdata -Wno-profile-instr-unprofiled -Wno-profile-instr-out-of-date"
+  else
+    if [ -z "$(find "$profile_dir" -name '*.gcda' | head -n1)" ]; then
+      echo "ERROR: PGO training wrote no profile data to ${profile_dir}." >&2
+      exit 1
+    fi
+    use="-fprofile-use=${profile_dir} -fprofile-correction -Wno-missing-profile"
+  fi
+
+  echo "PGO stage 3/3: rebuilding with the collected profile and LTO..."
+  PROFILE_C_FLAGS="${base_c_flags:+${base_c_flags} }${use}"
+  PROFILE_LINKER_FLAGS="${base_linker_flags:+${base_linker_flags} }${use}"
+}
+
+# Usage: pgo_frame_ms <ioq3ded> <label>
+# Best of two benchmark runs on the first training map, in CPU ms per server
+# frame. Prints nothing if the benchmark did not finish.
+pgo_frame_ms() {
+  local bin="$1"
+  local label="$2"
+  local map="${PGO_MAPS%% *}"
+  local run result best=""
+
+  for run in 1 2; do
+    result="$(pgo_workload "$bin" "$map" "$PGO_BENCH_FRAMES" "${ROOT_DIR}/.tmp/pgo-train/bench-${label}-${run}.log")"
+    if [ "${result%% *}" = "0" ]; then
+      best="$(echo "$result" | awk -v best="$best" '{ if (best == "" || $3 < best) best = $3; print best }')"
+    fi
+  done
+  if [ -n "$best" ]; then
+    awk -v cpu="$best" -v frames="$PGO_BENCH_FRAMES" 'BEGIN { printf "%.4f\n", cpu / frames }'
+  fi
+}
+
+# Benchmarks the PGO+LTO ioq3ded against a plain Release ioq3ded built in
+# build-pgo-baseline (server target only).
+pgo_report() {
+  local cmake_bin="$1"
+  local baseline_dir="${ENGINE_DIR}/build-pgo-baseline"
+  local jobs baseline base_ms pgo_ms
+
+  echo "Building plain Release ioq3ded for comparison..."
+  manifest_request "$baseline_dir"
+  "$cmake_bin" -S "$ENGINE_DIR" -B "$baseline_dir" \
+    -DCMAKE_BUILD_TYPE=Release \
+    -DCMAKE_C_FLAGS="${CFLAGS:-}" \
+    -DCMAKE_EXE_LINKER_FLAGS="${LDFLAGS:-}" \
+    $SERVER_ONLY_CMAKE_ARGS $COMPILER_CACHE_CMAKE_ARGS > "${ROOT_DIR}/.tmp/pgo-train/baseline-build.log" 2>&1
+  jobs="$(jobs_acquire compile)"
+  "$cmake_bin" --build "$baseline_dir" -j"$jobs" --target "$ENGINE_SERVER_TARGET" >> "${ROOT_DIR}/.tmp/pgo-train/baseline-build.log" 2>&1
+  jobs_release compile
+  manifest_write "$baseline_dir" "${baseline_dir}/vibearena-manifest.tsv" Release "$ENGINE_SERVER_TARGET"
+  baseline="$(manifest_path "${baseline_dir}/vibearena-manifest.tsv" "$ENGINE_SERVER_TARGET")"
+
+  echo "Benchmarking server frames on ${PGO_MAPS%% *} (${PGO_BOTS} bots, ${PGO_BENCH_FRAMES} frames, best of 2)..."
+  base_ms="$(pgo_frame_ms "$baseline" release)"
+  pgo_ms="$(pgo_frame_ms "$DED_BIN" pgo)"
+  if [ -z "$base_ms" ] || [ -z "$pgo_ms" ]; then
+    echo "WARNING: PGO benchmark did not complete; see .tmp/pgo-train/bench-*.log." >&2
+    return 0
+  fi
+  awk -v base="$base_ms" -v pgo="$pgo_ms" 'BEGIN {
+    printf "Server frame time (CPU per frame): Release %.4f ms, PGO+LTO %.4f ms", base, pgo
+    if (base > 0 && pgo <= base) printf " (%.1f%% faster)", (base - pgo) * 100 / base
+    if (base > 0 && pgo > base) printf " (%.1f%% slower)", (pgo - base) * 100 / base
+    printf "\n"
+  }'
+}
+
+# Sets CLIENT_APP and DED_BIN. On an engine build cache hit they point into the
+# cache and cmake is never invoked.
+build_engine() {
+  local cmake_bin="$1"
+  local key="" entry jobs unity client_bin cmake_targets target_args plan name started
+  local unity_marker="${BUILD_DIR}/.vibearena-unity-failed"
+
+  if [ "$ENGINE_CACHE_ENABLED" = "1" ]; then
+    key="$(engine_cache_key)"
+    entry="${ENGINE_CACHE_DIR}/${key}"
+    if [ -f "$entry/ioq3ded" ] && { [ "$SERVER_ONLY" = "1" ] || [ -d "$entry/ioquake3.app" ]; }; then
+      touch "$entry/.last_used"
+      echo "Engine build cache hit ($(echo "$key" | cut -c1-12)); skipping configure and compile."
+      if [ "$SERVER_ONLY" != "1" ]; then
+        CLIENT_APP="$entry/ioquake3.app"
+      fi
+      DED_BIN="$entry/ioq3ded"
+      return 0
+    fi
+    echo "Engine build cache miss ($(echo "$key" | cut -c1-12))."
+  fi
+
+  compiler_cache_setup "$ENGINE_DIR"
+
+  if [ "$BUILD_PROFILE" = "pgo" ]; then
+    trace_begin "pgo training"
+    pgo_train "$cmake_bin"
+    trace_end
+  fi
+
+  unity="$PROFILE_UNITY"
+  if [ "$unity" = "ON" ] && [ "$(cat "$unity_marker" 2>/dev/null)" = "$(git -C "$ENGINE_DIR" rev-parse HEAD)" ]; then
+    unity="OFF"
+  fi
+  trace_begin configure
+  configure_engine "$cmake_bin" "$unity"
+  trace_end
+
+  cmake_targets="$(engine_cmake_targets)"
+  target_args=""
+  plan=""
+  if [ "$cmake_targets" != "all" ]; then
+    plan="$(cmake_api_query plan "$BUILD_DIR" "$BUILD_TYPE" $cmake_targets)"
+    for name in $(echo "$plan" | awk -F '\t' '$1 == "missing" { print $2 }'); do
+      if [ "$name" = "$ENGINE_CLIENT_TARGET" ] || [ "$name" = "$ENGINE_SERVER_TARGET" ]; then
+        echo "ERROR: engine has no '$name' target." >&2
+        exit 1
+      fi
+      echo "Target '$name' does not exist in this engine revision (built into another target or disabled); skipping."
+    done
+    cmake_targets="$(echo "$plan" | awk -F '\t' '$1 == "target" { printf "%s%s", sep, $2; sep = " " }')"
+    target_args="--target ${cmake_targets}"
+  fi
+
+  jobs="$(jobs_acquire compile)"
+  echo "Building ioquake3 (${BUILD_PROFILE}, targets: ${cmake_targets}) with ${jobs} job(s)..."
+  started="$(date +%s)"
+  trace_begin compile
+  if ! "$cmake_bin" --build "$BUILD_DIR" -j"$jobs" $target_args; then
+    if [ "$unity" != "ON" ]; then
+      exit 1
+    fi
+    # File-static name clashes can break unity batches; remember the commit
+    # so later runs go straight to per-file compiles.
+    echo "WARNING: unity build failed; retrying ${BUILD_PROFILE} with per-file compiles." >&2
+    git -C "$ENGINE_DIR" rev-parse HEAD > "$unity_marker"
+    configure_engine "$cmake_bin" OFF
+    "$cmake_bin" --build "$BUILD_DIR" -j"$jobs" $target_args
+  fi
+  trace_end
+  jobs_release compile
+  compiler_cache_report
+  if [ -n "$plan" ]; then
+    report_target_savings "$plan" "$(($(date +%s) - started))"
+  fi
+
+  if [ "$SERVER_ONLY" = "1" ]; then
+    manifest_write "$BUILD_DIR" "$ENGINE_MANIFEST" "$BUILD_TYPE" "$ENGINE_SERVER_TARGET"
+  else
+    manifest_write "$BUILD_DIR" "$ENGINE_MANIFEST" "$BUILD_TYPE" "$ENGINE_CLIENT_TARGET" "$ENGINE_SERVER_TARGET"
+  fi
+  DED_BIN="$(manifest_path "$ENGINE_MANIFEST" "$ENGINE_SERVER_TARGET")"
+  if [ -z "$DED_BIN" ]; then
+    echo "ERROR: ioq3ded not found in $ENGINE_MANIFEST." >&2
     exit 1
   fi
+  if [ "$SERVER_ONLY" != "1" ]; then
+    client_bin="$(manifest_path "$ENGINE_MANIFEST" "$ENGINE_CLIENT_TARGET")"
+    case "$client_bin" in
+      */ioquake3.app/Contents/MacOS/*)
+        CLIENT_APP="${client_bin%/Contents/MacOS/*}"
+        ;;
+      *)
+        echo "ERROR: ioquake3.app not found in $ENGINE_MANIFEST." >&2
+        exit 1
+        ;;
+    esac
+  fi
+
+  if [ "$BUILD_PROFILE" = "pgo" ]; then
+    trace_begin "pgo benchmark"
+    pgo_report "$cmake_bin"
+    trace_end
+  fi
+
+  if [ -n "$key" ]; then
+    trace_begin "cache store"
+    store_engine_cache "$key"
+    trace_end
+  fi
 }
 
-main() {
-  require_cmd git
-  require_cmd curl
-  require_cmd unzip
-  require_cmd tar
-  require_cmd find
+file_size_mtime() {
+  stat -c '%s %Y' "$1" 2>/dev/null || stat -f '%z %m' "$1"
+}
 
-  cd "$ROOT_DIR"
+# Materializes src at dst without reading it where possible. "link" mode
+# hardlinks first (read-only pk3 payloads); both modes then try a reflink
+# (GNU --reflink / APFS clonefile) before falling back to a real copy.
+place_file() {
+  local src="$1" dst="$2" mode="$3"
+  local tmp="${dst}.sync.$$"
 
-  local cmake_bin
-  cmake_bin="$(detect_cmake)"
-  echo "Using CMake: $cmake_bin"
+  rm -f "$tmp"
+  if [ "$mode" = "link" ] && ln "$src" "$tmp" 2>/dev/null; then
+    :
+  elif cp --reflink=auto -p "$src" "$tmp" 2>/dev/null; then
+    :
+  elif cp -c -p "$src" "$tmp" 2>/dev/null; then
+    :
+  else
+    cp -p "$src" "$tmp"
+  fi
+  mv -f "$tmp" "$dst"
+}
 
-  if [ ! -d "$ENGINE_DIR/.git" ]; then
-    echo "Cloning ioquake3 source..."
-    git clone https://github.com/ioquake/ioq3.git "$ENGINE_DIR"
+# Returns 0 when dst was (re)written, 1 when it was already up to date.
+sync_file() {
+  local src="$1" dst="$2" mode="$3"
+
+  if [ -f "$dst" ] && [ ! -L "$dst" ]; then
+    if [ "$src" -ef "$dst" ]; then
+      # A copy that is still a hardlink from an older sync is split off, so
+      # editing it cannot change the source.
+      [ "$mode" = "link" ] && return 1
+    elif [ "$(file_size_mtime "$src")" = "$(file_size_mtime "$dst")" ]; then
+      return 1
+    elif [ "$(wc -c < "$src")" -eq "$(wc -c < "$dst")" ] && cmp -s "$src" "$dst"; then
+      # Same content, different mtime: fix the mtime so the next run skips the compare.
+      touch -r "$src" "$dst"
+      return 1
+    fi
+  fi
+
+  rm -rf "$dst"
+  place_file "$src" "$dst" "$mode"
+  return 0
+}
+
+# Incrementally mirrors src into dst. "link" mode hardlinks only the .pk3
+# payloads; other files (cfgs users edit in place) are copied. "prune" removes
+# files that no longer exist in src; "keep" leaves them (user drops,
+# q3config.cfg, ...).
+sync_tree() {
+  local src="$1" dst="$2" mode="$3" prune="$4"
+  local rel file_mode updated=0 unchanged=0 removed=0
+
+  mkdir -p "$dst"
+  while IFS= read -r rel; do
+    mkdir -p "$dst/$rel"
+  done < <(cd "$src" && find . -mindepth 1 -type d)
+
+  while IFS= read -r rel; do
+    if [ -L "$src/$rel" ]; then
+      if [ "$(readlink "$src/$rel")" != "$(readlink "$dst/$rel" 2>/dev/null || true)" ]; then
+        rm -rf "$dst/$rel"
+        ln -s "$(readlink "$src/$rel")" "$dst/$rel"
+        updated=$((updated + 1))
+      else
+        unchanged=$((unchanged + 1))
+      fi
+    else
+      file_mode="$mode"
+      case "$rel" in
+        *.pk3) ;;
+        *) file_mode=copy ;;
+      esac
+      if sync_file "$src/$rel" "$dst/$rel" "$file_mode"; then
+        updated=$((updated + 1))
+      else
+        unchanged=$((unchanged + 1))
+      fi
+    fi
+  done < <(cd "$src" && find . \( -type f -o -type l \))
+
+  if [ "$prune" = "prune" ]; then
+    while IFS= read -r rel; do
+      if [ ! -e "$src/$rel" ] && [ ! -L "$src/$rel" ]; then
+        rm -rf "$dst/$rel"
+        removed=$((removed + 1))
+      fi
+    done < <(cd "$dst" && find . -mindepth 1 -depth)
+  fi
+
+  echo "  $(basename "$dst"): ${updated} updated, ${unchanged} unchanged, ${removed} removed"
+}
+
+# Sidecar format: "<sha256>\t<size>\t<mtime>" of the last archive that passed a
+# full check. Matching size/mtime means the archive is trusted without reading it.
+write_openarena_sidecar() {
+  local sig
+  sig="$(file_size_mtime "$OA_ZIP")"
+  printf '%s\t%s\t%s\n' "$OA_ZIP_SHA256" "${sig% *}" "${sig#* }" > "${OA_ZIP_SIDECAR}.tmp"
+  mv -f "${OA_ZIP_SIDECAR}.tmp" "$OA_ZIP_SIDECAR"
+}
+
+# Validates a cached archive with at most one streaming hash (no decompression).
+# Sets OA_ZIP_SHA256 on success.
+openarena_zip_trusted() {
+  local sidecar_hash sidecar_size sidecar_mtime sig hash
+
+  [ -f "$OA_ZIP" ] || return 1
+
+  if [ -f "$OA_ZIP_SIDECAR" ]; then
+    IFS=$'\t' read -r sidecar_hash sidecar_size sidecar_mtime < "$OA_ZIP_SIDECAR" || true
+    if [ -z "$OPENARENA_SHA256" ] || [ "$sidecar_hash" = "$OPENARENA_SHA256" ]; then
+      sig="$(file_size_mtime "$OA_ZIP")"
+      if [ "$sig" = "${sidecar_size} ${sidecar_mtime}" ]; then
+        OA_ZIP_SHA256="$sidecar_hash"
+        return 0
+      fi
+    fi
+  fi
+
+  if [ -z "$OPENARENA_SHA256" ] && [ ! -f "$OA_ZIP_SIDECAR" ]; then
+    # Archive cached before sidecars existed: check it fully once.
+    verify_full_openarena_zip
+    return
+  fi
+
+  hash="$(sha256_stdin < "$OA_ZIP")"
+  if [ -n "$OPENARENA_SHA256" ]; then
+    [ "$hash" = "$OPENARENA_SHA256" ] || return 1
+  elif [ "$hash" != "$sidecar_hash" ]; then
+    return 1
+  fi
+
+  OA_ZIP_SHA256="$hash"
+  write_openarena_sidecar
+}
+
+# Full CRC test plus pin check; only run after a fresh download (or once for an
+# archive with no verified record).
+verify_full_openarena_zip() {
+  trace_begin "unzip test"
+  if ! unzip -tq "$OA_ZIP" >/dev/null 2>&1; then
+    trace_end
+    return 1
+  fi
+  trace_end
+  OA_ZIP_SHA256="$(sha256_stdin < "$OA_ZIP")"
+  if [ -n "$OPENARENA_SHA256" ] && [ "$OA_ZIP_SHA256" != "$OPENARENA_SHA256" ]; then
+    echo "Downloaded archive SHA-256 ${OA_ZIP_SHA256} does not match pinned ${OPENARENA_SHA256}." >&2
+    return 1
+  fi
+  write_openarena_sidecar
+}
+
+# Probes one mirror with a small range request. Prints
+# "<bytes_per_sec> <ranged 0|1> <total_size> <resolved_url>", or fails when the
+# mirror is unreachable or serves something that is not a zip (e.g. an HTML
+# mirror-selection page).
+probe_openarena_mirror() {
+  local url="$1"
+  local work="$2"
+  local rc=0 stats http speed effective total ranged=0
+
+  stats="$(curl -fsSL --connect-timeout 10 --max-time 30 \
+    -r 0-65535 --max-filesize 65536 \
+    -D "${work}.headers" -o "${work}.body" \
+    -w '%{http_code} %{speed_download} %{url_effective}' "$url" 2>/dev/null)" || rc=$?
+
+  # 63 = server ignored the Range header and announced the full file.
+  if [ "$rc" -ne 0 ] && [ "$rc" -ne 63 ]; then
+    return 1
+  fi
+
+  http="${stats%% *}"
+  speed="$(echo "$stats" | awk '{print $2}')"
+  effective="${stats#* * }"
+  total="$(tr -d '\r' < "${work}.headers" | awk '
+    tolower($1) == "content-range:" { n = split($0, parts, "/"); range_total = parts[n] }
+    tolower($1) == "content-length:" { length_total = $2 }
+    END { print (range_total != "" ? range_total : length_total) }')"
+
+  if [ "$rc" -eq 63 ]; then
+    speed=0
   else
-    echo "Using existing engine checkout at $ENGINE_DIR"
+    [ "$(head -c 2 "${work}.body")" = "PK" ] || return 1
+    # file:// reports no HTTP status but honours ranges.
+    if [ "$http" = "206" ] || [ "$http" = "000" ]; then
+      ranged=1
+    fi
+  fi
+
+  case "$total" in
+    ''|*[!0-9]*) ranged=0; total=0 ;;
+  esac
+  echo "${speed} ${ranged} ${total} ${effective}"
+}
+
+# Races all mirrors concurrently; prints probe results fastest first.
+rank_openarena_mirrors() {
+  local work="$1"
+  local url i=0 pids=""
+
+  for url in $OPENARENA_MIRRORS; do
+    probe_openarena_mirror "$url" "${work}/probe.${i}" > "${work}/probe.${i}.result" 2>/dev/null &
+    pids="$pids $!"
+    i=$((i + 1))
+  done
+  for url in $pids; do
+    wait "$url" || true
+  done
+
+  cat "$work"/probe.*.result 2>/dev/null | awk 'NF >= 4' | sort -k1,1gr
+}
+
+# Downloads [0, total) as parallel byte-range segments into OA_ZIP_PARTS, then
+# concatenates them. Segments already on disk are resumed, not refetched.
+# Usage: fetch_segment <url> <file> <start> <end>
+# Fills <file> with bytes <start>-<end> of <url>. Each attempt asks only for
+# the bytes the file does not have yet and appends what arrives, so a failed
+# attempt loses nothing and never duplicates bytes (curl --retry restarts the
+# range and writes the same bytes again).
+fetch_segment() {
+  local url="$1"
+  local file="$2"
+  local start="$3"
+  local end="$4"
+  local want=$((end - start + 1))
+  local have attempt=0
+
+  while :; do
+    have=0
+    [ -f "$file" ] && have="$(wc -c < "$file" | tr -d ' ')"
+    if [ "$have" -gt "$want" ]; then
+      # A server that ignored the range; start the segment over.
+      rm -f "$file"
+      return 1
+    fi
+    [ "$have" -lt "$want" ] || return 0
+    [ "$attempt" -lt 4 ] || return 1
+    attempt=$((attempt + 1))
+    curl -fsSL -r "$((start + have))-${end}" "$url" >> "$file" || sleep "$attempt"
+  done
+}
+
+download_segmented() {
+  local url="$1"
+  local total="$2"
+  local segments="$DOWNLOAD_SEGMENTS"
+  local seg_len i start end pids="" failed=0
+
+  if [ "$(cat "${OA_ZIP_PARTS}/layout" 2>/dev/null)" != "${total} ${segments}" ]; then
+    rm -rf "$OA_ZIP_PARTS"
+  fi
+  mkdir -p "$OA_ZIP_PARTS"
+  echo "${total} ${segments}" > "${OA_ZIP_PARTS}/layout"
+
+  seg_len=$(((total + segments - 1) / segments))
+  i=0
+  while [ "$i" -lt "$segments" ]; do
+    start=$((i * seg_len))
+    end=$((start + seg_len - 1))
+    [ "$end" -lt "$total" ] || end=$((total - 1))
+    if [ "$start" -le "$end" ]; then
+      fetch_segment "$url" "${OA_ZIP_PARTS}/seg.${i}" "$start" "$end" &
+      pids="$pids $!"
+    else
+      : > "${OA_ZIP_PARTS}/seg.${i}"
+    fi
+    i=$((i + 1))
+  done
+
+  for i in $pids; do
+    wait "$i" || failed=1
+  done
+  [ "$failed" -eq 0 ] || return 1
+
+  i=0
+  : > "${OA_ZIP}.download"
+  while [ "$i" -lt "$segments" ]; do
+    cat "${OA_ZIP_PARTS}/seg.${i}" >> "${OA_ZIP}.download"
+    i=$((i + 1))
+  done
+  if [ "$(wc -c < "${OA_ZIP}.download" | tr -d ' ')" -ne "$total" ]; then
+    rm -rf "$OA_ZIP_PARTS" "${OA_ZIP}.download"
+    return 1
+  fi
+  mv -f "${OA_ZIP}.download" "$OA_ZIP"
+  rm -rf "$OA_ZIP_PARTS"
+}
+
+# Single-stream fallback for mirrors without range support; still resumes a
+# partial download when the server allows it.
+download_single_stream() {
+  local url="$1"
+
+  if ! curl -fL --retry 3 -C - -o "${OA_ZIP}.download" "$url"; then
+    rm -f "${OA_ZIP}.download"
+    curl -fL --retry 3 -o "${OA_ZIP}.download" "$url" || return 1
   fi
+  mv -f "${OA_ZIP}.download" "$OA_ZIP"
+}
+
+download_openarena_zip() {
+  local work speed ranged total url
+
+  if openarena_zip_trusted; then
+    echo "Using cached OpenArena archive: $OA_ZIP"
+    return 0
+  fi
+
+  rm -f "$OA_ZIP_SIDECAR"
+  work="${OA_ZIP}.probe.$$"
+  rm -rf "$work"
+  mkdir -p "$work"
+
+  echo "Racing OpenArena mirrors..."
+  rank_openarena_mirrors "$work" > "${work}/ranking"
+
+  while read -r speed ranged total url; do
+    if [ "$ranged" = "1" ]; then
+      echo "Downloading OpenArena 0.8.8 assets from ${url} (${DOWNLOAD_SEGMENTS} segments)..."
+      download_segmented "$url" "$total" || true
+    else
+      echo "Downloading OpenArena 0.8.8 assets from ${url}..."
+      download_single_stream "$url" || true
+    fi
+
+    if [ -f "$OA_ZIP" ] && verify_full_openarena_zip; then
+      rm -rf "$work"
+      return 0
+    fi
+    echo "Mirror ${url} did not return a valid zip, trying next mirror..."
+    rm -rf "$OA_ZIP_PARTS" "${OA_ZIP}.download"
+  done < "${work}/ranking"
+
+  rm -rf "$work"
+  echo "ERROR: unable to fetch a valid OpenArena 0.8.8 zip archive." >&2
+  exit 1
+}
 
-  echo "Configuring ioquake3..."
-  "$cmake_bin" -S "$ENGINE_DIR" -B "$BUILD_DIR" -DCMAKE_BUILD_TYPE=Release
+# "<size>\t<crc32>\t<name>" for every file member, read from the zip central
+# directory (no decompression).
+zip_members() {
+  unzip -lv "$1" | awk '
+    $1 ~ /^[0-9]+$/ && $7 ~ /^[0-9a-f][0-9a-f][0-9a-f][0-9a-f][0-9a-f][0-9a-f][0-9a-f][0-9a-f]$/ {
+      name = $0
+      sub(/^ *[^ ]+ +[^ ]+ +[^ ]+ +[^ ]+ +[^ ]+ +[^ ]+ +[^ ]+  /, "", name)
+      if (name !~ /\/$/) printf "%s\t%s\t%s\n", $1, $7, name
+    }'
+}
+
+# The stamp is "archive\t<sha256>\tbaseoa" (archive hash and member selection)
+# followed by one "<size>\t<mtime>\t<crc32>\t<name>" line per extracted file,
+# with size/mtime taken from disk after extraction.
+extract_stamp_current() {
+  local archive_hash="$1"
+  local size mtime crc rel
+
+  [ -f "$OA_EXTRACT_STAMP" ] || return 1
+  [ "$(head -n1 "$OA_EXTRACT_STAMP")" = "archive	${archive_hash}	baseoa" ] || return 1
+
+  while IFS=$'\t' read -r size mtime crc rel; do
+    [ "$(file_size_mtime "${OA_EXTRACT}/${rel}" 2>/dev/null || true)" = "${size} ${mtime}" ] || return 1
+  done < <(tail -n +2 "$OA_EXTRACT_STAMP")
+}
+
+write_extract_stamp() {
+  local archive_hash="$1"
+  local members="$2"
+  local size crc rel sig
+
+  {
+    printf 'archive\t%s\tbaseoa\n' "$archive_hash"
+    while IFS=$'\t' read -r size crc rel; do
+      sig="$(file_size_mtime "${OA_EXTRACT}/${rel}")"
+      printf '%s\t%s\t%s\t%s\n' "${sig% *}" "${sig#* }" "$crc" "$rel"
+    done < "$members"
+  } > "${OA_EXTRACT_STAMP}.tmp"
+  mv -f "${OA_EXTRACT_STAMP}.tmp" "$OA_EXTRACT_STAMP"
+}
+
+# Directory (relative to OA_EXTRACT) holding baseoa, from an archive member path.
+baseoa_rel_dir() {
+  printf '%s\n' "$1" | sed 's|^\(.*baseoa\)/.*$|\1|'
+}
 
-  local jobs
-  jobs="$(sysctl -n hw.ncpu 2>/dev/null || echo 4)"
-  echo "Building ioquake3 with ${jobs} job(s)..."
-  "$cmake_bin" --build "$BUILD_DIR" -j"$jobs"
+# Extracts the baseoa members of the OpenArena archive into OA_EXTRACT and sets
+# OA_BASEOA_DIR. Skips entirely when the stamp matches the archive and the files
+# on disk; otherwise only re-extracts members that are missing, changed on disk,
+# or changed in the archive, streaming them in parallel to their final path.
+extract_openarena() {
+  local archive_hash members repair size crc rel recorded count jobs
 
-  local client_app_rel ded_bin_rel client_app ded_bin
-  client_app_rel="$(find "$BUILD_DIR" -type d -name 'ioquake3.app' | head -n1)"
-  ded_bin_rel="$(find "$BUILD_DIR" -type f -name 'ioq3ded' | head -n1)"
-  if [ -z "$client_app_rel" ] || [ -z "$ded_bin_rel" ]; then
-    echo "ERROR: build artifacts not found (ioquake3.app / ioq3ded)." >&2
+  archive_hash="${OA_ZIP_SHA256:-$(sha256_stdin < "$OA_ZIP")}"
+  if extract_stamp_current "$archive_hash"; then
+    OA_BASEOA_DIR="${OA_EXTRACT}/$(baseoa_rel_dir "$(sed -n '2p' "$OA_EXTRACT_STAMP" | cut -f4)")"
+    echo "OpenArena assets already extracted (stamp matches); skipping extraction."
+    return 0
+  fi
+
+  mkdir -p "$OA_EXTRACT"
+  members="${OA_EXTRACT_STAMP}.members"
+  repair="${OA_EXTRACT_STAMP}.repair"
+  # Binaries, docs and missionpack are never shipped; only baseoa is needed.
+  zip_members "$OA_ZIP" | awk -F '\t' '$3 ~ /(^|\/)baseoa\//' > "$members"
+  if [ ! -s "$members" ]; then
+    rm -f "$members"
+    echo "ERROR: baseoa directory not found in OpenArena archive." >&2
     exit 1
   fi
-  client_app="$client_app_rel"
-  ded_bin="$ded_bin_rel"
+  OA_BASEOA_DIR="${OA_EXTRACT}/$(baseoa_rel_dir "$(head -n1 "$members" | cut -f3)")"
+  : > "$repair"
 
-  download_openarena_zip
+  while IFS=$'\t' read -r size crc rel; do
+    recorded=""
+    if [ -f "$OA_EXTRACT_STAMP" ]; then
+      recorded="$(awk -F '\t' -v name="$rel" 'NR > 1 && $4 == name { print $1 " " $2 " " $3; exit }' "$OA_EXTRACT_STAMP")"
+    fi
+    if [ "$recorded" != "$(file_size_mtime "${OA_EXTRACT}/${rel}" 2>/dev/null || echo missing) ${crc}" ] ||
+      [ "${recorded%% *}" != "$size" ]; then
+      printf '%s\n' "$rel" >> "$repair"
+    fi
+  done < "$members"
 
-  echo "Extracting OpenArena assets..."
-  rm -rf "$OA_EXTRACT"
-  unzip -q "$OA_ZIP" -d "$OA_EXTRACT"
+  # Files from a previous archive (or a previous full extraction) that are no longer wanted.
+  if [ -f "$OA_EXTRACT_STAMP" ]; then
+    tail -n +2 "$OA_EXTRACT_STAMP" | cut -f4 | while IFS= read -r rel; do
+      if ! cut -f3 "$members" | grep -Fxq "$rel"; then
+        rm -f "${OA_EXTRACT}/${rel}"
+      fi
+    done
+    find "$OA_EXTRACT" -mindepth 1 -type d -empty -delete 2>/dev/null || true
+  fi
+
+  count="$(wc -l < "$repair" | tr -d ' ')"
+  if [ "$count" -gt 0 ]; then
+    jobs="$(jobs_acquire extract 8)"
+    echo "Extracting ${count} OpenArena baseoa member(s) with ${jobs} worker(s)..."
+    # Unlink first so hardlinked copies in VibeArena_Build/ are never modified in place.
+    while IFS= read -r rel; do
+      rm -f "${OA_EXTRACT}/${rel}"
+    done < "$repair"
+    if ! tr '\n' '\0' < "$repair" | xargs -0 -n 1 -P "$jobs" unzip -o -q "$OA_ZIP" -d "$OA_EXTRACT"; then
+      rm -f "$members" "$repair"
+      echo "ERROR: failed to extract OpenArena archive members." >&2
+      exit 1
+    fi
+    jobs_release extract
+  fi
 
-  local baseoa_dir
-  baseoa_dir="$(find "$OA_EXTRACT" -type d -name baseoa | head -n1)"
-  if [ -z "$baseoa_dir" ]; then
-    echo "ERROR: baseoa directory not found in extracted OpenArena archive." >&2
+  write_extract_stamp "$archive_hash" "$members"
+  rm -f "$members" "$repair"
+}
+
+pinned_engine_rev() {
+  if [ -n "${VIBEARENA_ENGINE_REV:-}" ]; then
+    echo "$VIBEARENA_ENGINE_REV"
+    return 0
+  fi
+  if [ ! -f "$ENGINE_PIN_FILE" ]; then
+    echo "ERROR: engine pin file not found at $ENGINE_PIN_FILE." >&2
     exit 1
   fi
-  if [ "$(find "$baseoa_dir" -maxdepth 1 -name '*.pk3' | wc -l | tr -d ' ')" -eq 0 ]; then
-    echo "ERROR: no .pk3 files found in $baseoa_dir." >&2
+  awk '!/^#/ && NF { print $1; exit }' "$ENGINE_PIN_FILE"
+}
+
+# Serializes updates of the shared mirror between builds on the host. The lock
+# can be held for a whole network fetch, so it is only broken when its owner
+# has exited.
+engine_mirror_lock() {
+  local lock="${ENGINE_MIRROR_DIR}.lock"
+  local owner
+
+  mkdir -p "$(dirname "$lock")"
+  while ! mkdir "$lock" 2>/dev/null; do
+    owner="$(cat "$lock/pid" 2>/dev/null || true)"
+    if [ -n "$owner" ] && ! ps -p "$owner" >/dev/null 2>&1; then
+      rm -rf "$lock"
+      continue
+    fi
+    sleep 0.5
+  done
+  echo "$$" > "$lock/pid"
+}
+
+engine_mirror_unlock() {
+  if [ "$(cat "${ENGINE_MIRROR_DIR}.lock/pid" 2>/dev/null || true)" = "$$" ]; then
+    rm -rf "${ENGINE_MIRROR_DIR}.lock"
+  fi
+}
+
+# Prints the full commit SHA for a pin. Abbreviated pins are looked up in the
+# shared mirror first, then resolved from a commits-only (tree:0) fetch.
+resolve_engine_rev() {
+  local pin="$1"
+  local resolve_dir sha
+
+  if echo "$pin" | grep -Eq '^[0-9a-f]{40}$'; then
+    echo "$pin"
+    return 0
+  fi
+  if sha="$(git -C "$ENGINE_MIRROR_DIR" rev-parse --verify --quiet "${pin}^{commit}" 2>/dev/null)"; then
+    echo "$sha"
+    return 0
+  fi
+
+  echo "Resolving ioquake3 revision '$pin' from $ENGINE_SOURCE..." >&2
+  resolve_dir="${ENGINE_MIRROR_DIR}.resolve.$$"
+  rm -rf "$resolve_dir"
+  git init -q --bare "$resolve_dir"
+  git -C "$resolve_dir" fetch --quiet --filter=tree:0 "$ENGINE_SOURCE" \
+    '+refs/heads/*:refs/heads/*' '+refs/tags/*:refs/tags/*'
+  if ! sha="$(git -C "$resolve_dir" rev-parse --verify --quiet "${pin}^{commit}")"; then
+    rm -rf "$resolve_dir"
+    echo "ERROR: ioquake3 revision '$pin' not found in $ENGINE_SOURCE." >&2
     exit 1
   fi
+  rm -rf "$resolve_dir"
+  echo "Pinned revision '$pin' is $sha; pin the full SHA in ${ENGINE_PIN_FILE#${ROOT_DIR}/} to skip this lookup." >&2
+  echo "$sha"
+}
+
+# Makes sure the shared bare mirror holds a depth-1 snapshot of the commit,
+# kept alive by refs/pinned/<sha>.
+update_engine_mirror() {
+  local sha="$1"
+
+  if [ ! -d "$ENGINE_MIRROR_DIR" ]; then
+    git init -q --bare "$ENGINE_MIRROR_DIR"
+  fi
+  if git -C "$ENGINE_MIRROR_DIR" rev-parse --verify --quiet "refs/pinned/${sha}" >/dev/null; then
+    return 0
+  fi
+
+  echo "Fetching ioquake3 ${sha} (depth 1) into shared mirror ${ENGINE_MIRROR_DIR}..."
+  git -C "$ENGINE_MIRROR_DIR" fetch --quiet --depth 1 "$ENGINE_SOURCE" "$sha"
+  git -C "$ENGINE_MIRROR_DIR" update-ref "refs/pinned/${sha}" "$sha"
+}
+
+engine_patch_files() {
+  if [ "$ENGINE_PATCH_DIR" = "none" ] || [ ! -d "$ENGINE_PATCH_DIR" ]; then
+    return 0
+  fi
+  find "$ENGINE_PATCH_DIR" -maxdepth 1 -type f -name '*.patch' | LC_ALL=C sort
+}
 
+# Names and contents of the engine patch series, or "none".
+engine_patch_set_hash() {
+  local patch listing=""
+
+  while IFS= read -r patch; do
+    listing="${listing}$(basename "$patch") $(sha256_stdin < "$patch")
+"
+  done < <(engine_patch_files)
+  if [ -z "$listing" ]; then
+    echo "none"
+  else
+    printf '%s' "$listing" | sha256_stdin
+  fi
+}
+
+engine_diff_hash() {
+  git -C "$ENGINE_DIR" diff HEAD --binary | sha256_stdin
+}
+
+engine_patch_record() {
+  awk -F= -v key="$1" '$1 == key { print substr($0, length(key) + 2) }' "$ENGINE_PATCH_RECORD" 2>/dev/null || true
+}
+
+# True when the changes in quake_engine/ are exactly the patches build.sh
+# applied last, so reverting them loses nothing.
+engine_patches_ours() {
+  [ -f "$ENGINE_PATCH_RECORD" ] &&
+    [ "$(engine_patch_record head)" = "$(git -C "$ENGINE_DIR" rev-parse HEAD)" ] &&
+    [ "$(engine_patch_record diff)" = "$(engine_diff_hash)" ]
+}
+
+# Applies the series to the pristine checkout. A patch that does not apply
+# resets the checkout and fails the build, naming the patch.
+apply_engine_patches() {
+  local set="$1"
+  local total count=0 patch head log="${ROOT_DIR}/.tmp/engine-patch.log"
+
+  head="$(git -C "$ENGINE_DIR" rev-parse HEAD)"
+  total="$(engine_patch_files | wc -l | tr -d ' ')"
+  rm -f "$ENGINE_PATCH_RECORD"
+  if [ "$total" -gt 0 ]; then
+    echo "Applying ${total} engine patch(es) from ${ENGINE_PATCH_DIR#${ROOT_DIR}/}..."
+    mkdir -p "${ROOT_DIR}/.tmp"
+  fi
+  while IFS= read -r patch; do
+    count=$((count + 1))
+    if ! git -C "$ENGINE_DIR" apply --index --whitespace=nowarn "$patch" 2> "$log"; then
+      cat "$log" >&2
+      git -C "$ENGINE_DIR" reset --quiet --hard
+      echo "ERROR: engine patch $(basename "$patch") (${count} of ${total}) does not apply to ioquake3 $(echo "$head" | cut -c1-12); quake_engine/ was reset to the pristine revision." >&2
+      exit 1
+    fi
+    echo "  applied $(basename "$patch")"
+  done < <(engine_patch_files)
+  rm -f "$log"
+
+  printf 'head=%s\nset=%s\ndiff=%s\n' "$head" "$set" "$(engine_diff_hash)" > "$ENGINE_PATCH_RECORD"
+  ENGINE_PATCH_COUNT="$total"
+}
+
+# Checks out the pinned revision in quake_engine/, borrowing objects from the
+# shared mirror (git alternates, as with clone --reference), and applies the
+# engine patch series. Patches applied by an earlier run are reverted first; a
+# checkout with other uncommitted changes is left alone.
+fetch_engine() {
+  local pin sha head alternates set
+
+  pin="$(pinned_engine_rev)"
+  engine_mirror_lock
+  sha="$(resolve_engine_rev "$pin")"
+  update_engine_mirror "$sha"
+  engine_mirror_unlock
+
+  if [ ! -d "$ENGINE_DIR/.git" ]; then
+    echo "Creating ioquake3 checkout at $ENGINE_DIR..."
+    git init -q "$ENGINE_DIR"
+    git -C "$ENGINE_DIR" remote add origin "$ENGINE_URL"
+  fi
+
+  ENGINE_PATCH_COUNT=0
+  set="$(engine_patch_set_hash)"
+  head="$(git -C "$ENGINE_DIR" rev-parse --verify --quiet HEAD || true)"
+  if [ -n "$head" ] && [ -n "$(git -C "$ENGINE_DIR" status --porcelain --untracked-files=no)" ]; then
+    if ! engine_patches_ours; then
+      if [ "$head" = "$sha" ]; then
+        echo "WARNING: $ENGINE_DIR has local changes; not applying engine patches." >&2
+      else
+        echo "WARNING: $ENGINE_DIR has local changes on $(echo "$head" | cut -c1-12); not switching to pinned $(echo "$sha" | cut -c1-12) or applying engine patches." >&2
+      fi
+      return 0
+    fi
+    if [ "$head" = "$sha" ] && [ "$(engine_patch_record set)" = "$set" ]; then
+      ENGINE_PATCH_COUNT="$(engine_patch_files | wc -l | tr -d ' ')"
+      echo "Using engine checkout at pinned revision $(echo "$sha" | cut -c1-12) with ${ENGINE_PATCH_COUNT} engine patch(es) applied"
+      return 0
+    fi
+    echo "Reverting engine patches applied by an earlier build..."
+    git -C "$ENGINE_DIR" reset --quiet --hard
+  fi
+
+  if [ "$head" = "$sha" ]; then
+    echo "Using engine checkout at pinned revision $(echo "$sha" | cut -c1-12)"
+  else
+    alternates="$ENGINE_DIR/.git/objects/info/alternates"
+    if ! grep -qxF "${ENGINE_MIRROR_DIR}/objects" "$alternates" 2>/dev/null; then
+      mkdir -p "$(dirname "$alternates")"
+      echo "${ENGINE_MIRROR_DIR}/objects" >> "$alternates"
+    fi
+    if ! git -C "$ENGINE_DIR" cat-file -e "${sha}^{commit}" 2>/dev/null || [ -z "$head" ]; then
+      git -C "$ENGINE_DIR" fetch --quiet --depth 1 "$ENGINE_MIRROR_DIR" "refs/pinned/${sha}"
+    fi
+    echo "Checking out pinned ioquake3 revision $(echo "$sha" | cut -c1-12)..."
+    git -C "$ENGINE_DIR" -c advice.detachedHead=false checkout --quiet --detach "$sha"
+  fi
+
+  trace_begin "engine patches"
+  apply_engine_patches "$set"
+  trace_end
+}
+
+assemble_client_dist() {
   echo "Assembling portable distribution..."
-  rm -rf "$DIST_DIR"
+  if [ "$CLEAN_DIST" = "1" ]; then
+    rm -rf "$DIST_DIR"
+  fi
   mkdir -p "$DIST_DIR"
-  cp -R "$client_app" "$DIST_DIR/"
-  cp "$ded_bin" "$DIST_DIR/"
-  cp -R "$baseoa_dir" "$DIST_DIR/baseoa"
+  sync_tree "$CLIENT_APP" "$DIST_DIR/ioquake3.app" copy prune
+  if sync_file "$DED_BIN" "$DIST_DIR/ioq3ded" copy; then
+    echo "  ioq3ded: updated"
+  fi
+  sync_tree "$OA_BASEOA_DIR" "$DIST_DIR/baseoa" link keep
+}
 
+write_play_launcher() {
   cat > "${DIST_DIR}/play.sh" <<'EOF'
 #!/usr/bin/env bash
 set -euo pipefail
@@ -175,29 +1488,384 @@ exec "$HERE/ioquake3.app/Contents/MacOS/ioquake3" \
   "$@"
 EOF
   chmod +x "${DIST_DIR}/play.sh"
+}
 
-  echo "Running client dry-run verification..."
+# Slim headless layout for server hosts: ioq3ded, launcher, and baseoa.
+assemble_server_dist() {
+  echo "Assembling server distribution..."
+  if [ "$CLEAN_DIST" = "1" ]; then
+    rm -rf "$SERVER_DIST_DIR"
+  fi
+  mkdir -p "$SERVER_DIST_DIR"
+  if sync_file "$DED_BIN" "$SERVER_DIST_DIR/ioq3ded" copy; then
+    echo "  ioq3ded: updated"
+  fi
+  sync_tree "$OA_BASEOA_DIR" "$SERVER_DIST_DIR/baseoa" link keep
+}
+
+write_server_launcher() {
+  cat > "${SERVER_DIST_DIR}/run_server.sh" <<'EOF'
+#!/usr/bin/env bash
+set -euo pipefail
+HERE="$(cd "$(dirname "$0")" && pwd)"
+
+# Usage: ./run_server.sh [--mod NAME] [+set ...] [+map MAP]
+MOD_ARGS=()
+if [ "${1:-}" = "--mod" ] && [ $# -ge 2 ]; then
+  MOD_ARGS=(+set fs_game "$2" +set vm_game 2)
+  shift 2
+fi
+
+# dedicated 1 is LAN-only; pass "+set dedicated 2" to announce to the master server.
+exec "$HERE/ioq3ded" \
+  +set fs_basepath "$HERE" \
+  +set fs_homepath "$HERE" \
+  +set com_basegame baseoa \
+  +set dedicated 1 \
+  +set com_hunkMegs 128 \
+  ${MOD_ARGS[@]+"${MOD_ARGS[@]}"} \
+  "$@"
+EOF
+  chmod +x "${SERVER_DIST_DIR}/run_server.sh"
+}
+
+now_ms() {
+  perl -MTime::HiRes=time -e 'printf "%d\n", time() * 1000'
+}
+
+# Usage: run_timed <timeout_s> <log> <dir> <command>...
+# Runs the command in dir with output to log, killing it (and its children)
+# after timeout_s seconds. Prints "<exit code|timeout> <wall ms> <cpu ms>",
+# where cpu is the child's user+system time ("null" after a timeout).
+run_timed() {
+  local limit="$1"
+  local log="$2"
+  local dir="$3"
+  shift 3
+  local started deadline pid rc=0 cpu cpu_file
+
+  mkdir -p "${ROOT_DIR}/.tmp"
+  cpu_file="$(mktemp "${ROOT_DIR}/.tmp/cpu.XXXXXX")"
+  started="$(now_ms)"
+  deadline=$((started + limit * 1000))
   (
-    cd "$DIST_DIR"
-    ./play.sh +quit > "$VERIFY_CLIENT_LOG" 2>&1 || true
-  )
-
-  if grep -q "Client Shutdown (Client quit)" "$VERIFY_CLIENT_LOG"; then
-    echo "Client verification passed (clean +quit)."
-  else
-    echo "Client did not complete clean +quit; running dedicated fallback verification..."
-    (
-      cd "$DIST_DIR"
-      ./ioq3ded \
-        +set net_enabled 0 \
-        +set fs_basepath "$DIST_DIR" \
-        +set fs_homepath "$DIST_DIR" \
-        +set com_basegame baseoa \
-        +set fs_game baseoa \
-        +quit > "$VERIFY_DEDICATED_LOG" 2>&1 || true
-    )
+    cd "$dir"
+    status=0
+    "$@" || status=$?
+    # A builtin in a pipeline runs in a fresh subshell with no children, so
+    # write the times first and parse them afterwards.
+    times > "$cpu_file"
+    exit "$status"
+  ) > "$log" 2>&1 < /dev/null &
+  pid=$!
+  while kill -0 "$pid" 2>/dev/null; do
+    if [ "$(now_ms)" -ge "$deadline" ]; then
+      kill_tree "$pid"
+      rc="timeout"
+      break
+    fi
+    sleep 0.1
+  done
+  if [ "$rc" = "timeout" ]; then
+    wait "$pid" 2>/dev/null || true
+    cpu=""
+  else
+    wait "$pid" || rc=$?
+    cpu="$(awk 'NR == 2 {
+      split($1, u, "m"); split($2, s, "m")
+      printf "%d\n", ((u[1] * 60 + u[2]) + (s[1] * 60 + s[2])) * 1000
+    }' "$cpu_file")"
+  fi
+  rm -f "$cpu_file"
+  echo "$rc $(($(now_ms) - started)) ${cpu:-null}"
+}
+
+# Usage: verify_run <name> <log> <marker> <dir> <command>...
+# Runs a +quit dry run in dir with a hard timeout and writes
+# "<status> <exit> <ms> <pk3 count> <hunk total> <hunk in use>" to
+# ${VERIFY_WORK}/<name>. It passes on a clean exit that printed the marker
+# (if any) and loaded at least one pk3.
+verify_run() {
+  local name="$1"
+  local log="$2"
+  local marker="$3"
+  local dir="$4"
+  shift 4
+  local rc elapsed cpu status pk3 hunk_total hunk_used
+
+  read -r rc elapsed cpu <<EOF
+$(run_timed "$VERIFY_TIMEOUT" "$log" "$dir" "$@")
+EOF
+
+  pk3="$(grep -cE '\.pk3 \([0-9]+ files\)' "$log" || true)"
+  hunk_total="$(awk '/bytes total hunk$/ { print $1; exit }' "$log")"
+  hunk_used="$(awk '/total hunk in use$/ { print $1; exit }' "$log")"
+
+  if [ "$rc" = "timeout" ]; then
+    status="timeout"
+  elif [ "$rc" -eq 0 ] && [ "$pk3" -gt 0 ] && { [ -z "$marker" ] || grep -qF "$marker" "$log"; }; then
+    status="pass"
+  else
+    status="fail"
   fi
+  echo "$status $rc $elapsed $pk3 ${hunk_total:-null} ${hunk_used:-null}" > "${VERIFY_WORK}/${name}"
+}
+
+# Usage: verify_dist <dist_dir> <check>... (checks: client, dedicated)
+# Runs the checks concurrently, prints a result table, writes
+# verify_results.json, and applies VERIFY_GATE.
+verify_dist() {
+  local dist="$1"
+  shift
+  local check pids="" pid passed=0 failed=0 first=1
+  local status rc elapsed pk3 hunk_total hunk_used log
+
+  VERIFY_WORK="${ROOT_DIR}/.tmp/verify-$$"
+  rm -rf "$VERIFY_WORK"
+  mkdir -p "$VERIFY_WORK"
+
+  echo "Running dry-run verification ($(echo "$*" | sed 's/ /, /g'); timeout ${VERIFY_TIMEOUT}s each)..."
+  for check in "$@"; do
+    case "$check" in
+      client)
+        verify_run client "$VERIFY_CLIENT_LOG" "Client Shutdown (Client quit)" "$dist" \
+          ./play.sh +meminfo +quit &
+        ;;
+      dedicated)
+        verify_run dedicated "$VERIFY_DEDICATED_LOG" "" "$dist" \
+          ./ioq3ded \
+          +set net_enabled 0 \
+          +set fs_basepath "$dist" \
+          +set fs_homepath "$dist" \
+          +set com_basegame baseoa \
+          +set fs_game baseoa \
+          +meminfo \
+          +quit &
+        ;;
+    esac
+    pids="$pids $!"
+  done
+  for pid in $pids; do
+    wait "$pid" || true
+  done
 
+  {
+    printf '{\n  "timeout_seconds": %s,\n  "gate": "%s",\n  "checks": {' "$VERIFY_TIMEOUT" "$VERIFY_GATE"
+    for check in "$@"; do
+      read -r status rc elapsed pk3 hunk_total hunk_used < "${VERIFY_WORK}/${check}"
+      if [ "$check" = "client" ]; then
+        log="verify_client.log"
+      else
+        log="verify_dedicated.log"
+      fi
+      if [ "$first" -eq 0 ]; then
+        printf ','
+      fi
+      first=0
+      case "$rc" in
+        timeout) rc="null" ;;
+      esac
+      printf '\n    "%s": {"status": "%s", "exit_code": %s, "startup_ms": %s, "pk3_count": %s, "hunk_total_bytes": %s, "hunk_used_bytes": %s, "log": "%s"}' \
+        "$check" "$status" "$rc" "$elapsed" "$pk3" "$hunk_total" "$hunk_used" "$log"
+    done
+    printf '\n  }\n}\n'
+  } > "$VERIFY_RESULTS"
+
+  printf '  %-10s %-8s %10s %6s %s\n' check status startup pk3s "hunk used/total"
+  for check in "$@"; do
+    read -r status rc elapsed pk3 hunk_total hunk_used < "${VERIFY_WORK}/${check}"
+    printf '  %-10s %-8s %8sms %6s %s/%s\n' "$check" "$status" "$elapsed" "$pk3" "$hunk_used" "$hunk_total"
+    if [ "$status" = "pass" ]; then
+      passed=$((passed + 1))
+    else
+      failed=$((failed + 1))
+    fi
+  done
+  rm -rf "$VERIFY_WORK"
+
+  if [ "$VERIFY_GATE" = "any" ] && [ "$passed" -eq 0 ]; then
+    echo "ERROR: no verification check passed; see verify_*.log and verify_results.json." >&2
+    exit 1
+  fi
+  if [ "$VERIFY_GATE" = "all" ] && [ "$failed" -gt 0 ]; then
+    echo "ERROR: ${failed} verification check(s) failed; see verify_*.log and verify_results.json." >&2
+    exit 1
+  fi
+}
+
+# Build graph nodes (scripts/lib/graph.sh). Run functions execute in a
+# subshell and hand their results to later nodes with graph_result; inputs
+# functions print what the node's stamp depends on besides its dependencies.
+
+node_cmake() {
+  trace_begin "cmake detect"
+  CMAKE_BIN="$(detect_cmake)"
+  trace_end
+  echo "Using CMake: $CMAKE_BIN"
+  graph_result CMAKE_BIN
+}
+
+node_engine_fetch() {
+  trace_begin clone
+  fetch_engine
+  trace_end
+  ENGINE_HEAD="$(git -C "$ENGINE_DIR" rev-parse HEAD)"
+  ENGINE_DIFF="$(engine_diff_hash)"
+  graph_result ENGINE_HEAD ENGINE_DIFF ENGINE_PATCH_COUNT
+}
+
+inputs_engine_fetch() {
+  echo "source=${ENGINE_SOURCE} pin=$(pinned_engine_rev) patches=$(engine_patch_set_hash)"
+}
+
+check_engine_fetch() {
+  [ "$(git -C "$ENGINE_DIR" rev-parse --verify --quiet HEAD 2>/dev/null)" = "$ENGINE_HEAD" ] &&
+    [ "$(engine_diff_hash)" = "$ENGINE_DIFF" ]
+}
+
+node_compile() {
+  build_engine "$CMAKE_BIN"
+  graph_result CLIENT_APP DED_BIN
+}
+
+inputs_compile() {
+  if [ "$ENGINE_CACHE_ENABLED" != "1" ]; then
+    echo "no-cache $$"
+  fi
+  engine_cache_key
+}
+
+check_compile() {
+  [ -x "$DED_BIN" ] && { [ "$SERVER_ONLY" = "1" ] || [ -d "$CLIENT_APP" ]; }
+}
+
+node_assets() {
+  trace_begin download
+  download_openarena_zip
+  trace_end
+  OA_ZIP_STAT="$(file_size_mtime "$OA_ZIP")"
+  graph_result OA_ZIP_SHA256 OA_ZIP_STAT
+}
+
+inputs_assets() {
+  echo "sha256=${OPENARENA_SHA256}"
+}
+
+check_assets() {
+  [ "$(file_size_mtime "$OA_ZIP" 2>/dev/null || true)" = "$OA_ZIP_STAT" ]
+}
+
+node_extract() {
+  trace_begin extract
+  extract_openarena
+  trace_end
+  if [ "$(find "$OA_BASEOA_DIR" -maxdepth 1 -name '*.pk3' | wc -l | tr -d ' ')" -eq 0 ]; then
+    echo "ERROR: no .pk3 files found in $OA_BASEOA_DIR." >&2
+    exit 1
+  fi
+  graph_result OA_BASEOA_DIR
+}
+
+inputs_extract() {
+  echo "zip=${OA_ZIP_SHA256}"
+}
+
+check_extract() {
+  extract_stamp_current "$OA_ZIP_SHA256"
+}
+
+# No inputs function: assemble runs every time. sync_tree only rewrites what
+# differs, so a rerun is cheap and repairs deleted or edited files in the dist.
+node_assemble() {
+  trace_begin copy
+  if [ "$SERVER_ONLY" = "1" ]; then
+    assemble_server_dist
+  else
+    assemble_client_dist
+  fi
+  trace_end
+}
+
+node_launcher() {
+  if [ "$SERVER_ONLY" = "1" ]; then
+    write_server_launcher
+  else
+    write_play_launcher
+  fi
+}
+
+inputs_launcher() {
+  declare -f write_play_launcher write_server_launcher
+}
+
+check_launcher() {
+  if [ "$SERVER_ONLY" = "1" ]; then
+    [ -x "$SERVER_DIST_DIR/run_server.sh" ]
+  else
+    [ -x "$DIST_DIR/play.sh" ]
+  fi
+}
+
+node_verify() {
+  trace_begin verification
+  if [ "$SERVER_ONLY" = "1" ]; then
+    verify_dist "$SERVER_DIST_DIR" dedicated
+  else
+    verify_dist "$DIST_DIR" client dedicated
+  fi
+  trace_end
+}
+
+inputs_verify() {
+  echo "gate=${VERIFY_GATE} timeout=${VERIFY_TIMEOUT}"
+  # A dist recreated from scratch is verified again.
+  if [ "$CLEAN_DIST" = "1" ]; then
+    echo "clean $$"
+  fi
+}
+
+check_verify() {
+  [ -f "$VERIFY_RESULTS" ]
+}
+
+# Mod nodes always run; generate_default_mod.sh keeps its own stamps and skips
+# the QVM build when nothing changed.
+node_mod() {
+  local mod="${1#mod:}"
+
+  "${ROOT_DIR}/scripts/generate_default_mod.sh" "$mod" --variant "$(mod_variant "$mod")"
+}
+
+# Registers the build graph. The pgo profile trains on the game data, so its
+# compile waits for the extract node.
+build_graph() {
+  local compile_deps="cmake engine-fetch"
+  local mod_dir
+
+  if [ "$BUILD_PROFILE" = "pgo" ]; then
+    compile_deps="$compile_deps extract"
+  fi
+
+  graph_node cmake "" node_cmake
+  graph_node engine-fetch "" node_engine_fetch inputs_engine_fetch check_engine_fetch
+  graph_node compile "$compile_deps" node_compile inputs_compile check_compile
+  graph_node assets "" node_assets inputs_assets check_assets
+  graph_node extract "assets" node_extract inputs_extract check_extract
+  graph_node assemble "compile extract" node_assemble
+  graph_node launcher "assemble" node_launcher inputs_launcher check_launcher
+  graph_node verify "assemble launcher" node_verify inputs_verify check_verify
+
+  if [ "$BUILD_MODS" = "1" ]; then
+    for mod_dir in "${ROOT_DIR}"/mods/*/; do
+      [ -f "${mod_dir}README.md" ] || continue
+      graph_node "mod:$(basename "$mod_dir")" "engine-fetch launcher" node_mod
+    done
+  fi
+}
+
+print_build_summary() {
+  local run_cmd="$1"
+  local logs="$2"
   local commit_hash build_date
   commit_hash="$(cd "$ENGINE_DIR" && git rev-parse --short HEAD)"
   build_date="$(date +%Y-%m-%d)"
@@ -205,10 +1873,173 @@ EOF
   echo
   echo "Build complete."
   echo "Date:   $build_date"
-  echo "Engine: ioquake3 ($commit_hash)"
+  if [ "${ENGINE_PATCH_COUNT:-0}" -gt 0 ]; then
+    echo "Engine: ioquake3 ($commit_hash) + ${ENGINE_PATCH_COUNT} engine patch(es)"
+  else
+    echo "Engine: ioquake3 ($commit_hash)"
+  fi
   echo "Assets: OpenArena 0.8.8"
-  echo "Run:    ./VibeArena_Build/play.sh"
-  echo "Logs:   verify_client.log (and verify_dedicated.log if fallback ran)"
+  echo "Run:    $run_cmd"
+  echo "Logs:   $logs"
+}
+
+main() {
+  while [ $# -gt 0 ]; do
+    case "$1" in
+      --no-cache)
+        ENGINE_CACHE_ENABLED="0"
+        ;;
+      --clean)
+        CLEAN_DIST="1"
+        ;;
+      --concurrent)
+        # Kept so existing scripts keep working.
+        echo "WARNING: --concurrent is deprecated and has no effect; independent build nodes always run in parallel (VIBEARENA_GRAPH_JOBS)." >&2
+        ;;
+      --only)
+        if [ $# -lt 2 ]; then
+          echo "ERROR: --only requires a node list." >&2
+          exit 1
+        fi
+        GRAPH_ONLY="$2"
+        shift
+        ;;
+      --only=*)
+        GRAPH_ONLY="${1#--only=}"
+        ;;
+      --from)
+        if [ $# -lt 2 ]; then
+          echo "ERROR: --from requires a node." >&2
+          exit 1
+        fi
+        GRAPH_FROM="$2"
+        shift
+        ;;
+      --from=*)
+        GRAPH_FROM="${1#--from=}"
+        ;;
+      --mods)
+        BUILD_MODS="1"
+        ;;
+      --engine-patches)
+        if [ $# -lt 2 ]; then
+          echo "ERROR: --engine-patches requires a directory." >&2
+          exit 1
+        fi
+        ENGINE_PATCH_DIR="$2"
+        shift
+        ;;
+      --engine-patches=*)
+        ENGINE_PATCH_DIR="${1#--engine-patches=}"
+        ;;
+      --list-nodes)
+        LIST_NODES="1"
+        ;;
+      --profile)
+        if [ $# -lt 2 ]; then
+          echo "ERROR: --profile requires a name." >&2
+          exit 1
+        fi
+        BUILD_PROFILE="$2"
+        shift
+        ;;
+      --profile=*)
+        BUILD_PROFILE="${1#--profile=}"
+        ;;
+      --targets)
+        if [ $# -lt 2 ]; then
+          echo "ERROR: --targets requires a list." >&2
+          exit 1
+        fi
+        ENGINE_TARGETS="$2"
+        shift
+        ;;
+      --targets=*)
+        ENGINE_TARGETS="${1#--targets=}"
+        ;;
+      --server-only)
+        SERVER_ONLY="1"
+        ;;
+      --verify)
+        if [ $# -lt 2 ]; then
+          echo "ERROR: --verify requires a mode." >&2
+          exit 1
+        fi
+        VERIFY_GATE="$2"
+        shift
+        ;;
+      --verify=*)
+        VERIFY_GATE="${1#--verify=}"
+        ;;
+      -h|--help)
+        usage
+        exit 0
+        ;;
+      *)
+        echo "ERROR: unknown argument '$1'." >&2
+        usage >&2
+        exit 1
+        ;;
+    esac
+    shift
+  done
+
+  require_cmd git
+  require_cmd curl
+  require_cmd unzip
+  require_cmd tar
+  require_cmd find
+
+  configure_build_profile
+  validate_engine_targets
+  case "$VERIFY_GATE" in
+    any|all|off) ;;
+    *)
+      echo "ERROR: unknown --verify mode '$VERIFY_GATE' (expected any, all, or off)." >&2
+      exit 1
+      ;;
+  esac
+
+  if [ "$ENGINE_PATCH_DIR" != "none" ]; then
+    if [ -d "$ENGINE_PATCH_DIR" ]; then
+      ENGINE_PATCH_DIR="$(cd "$ENGINE_PATCH_DIR" && pwd)"
+    elif [ "$ENGINE_PATCH_DIR" != "${ROOT_DIR}/engine/patches" ]; then
+      echo "ERROR: engine patch directory '$ENGINE_PATCH_DIR' not found." >&2
+      exit 1
+    fi
+  fi
+
+  case ",${GRAPH_ONLY},${GRAPH_FROM}," in
+    *,mod:*)
+      BUILD_MODS="1"
+      ;;
+  esac
+  if [ "$SERVER_ONLY" = "1" ] && [ "$BUILD_MODS" = "1" ]; then
+    echo "ERROR: mods are packaged into VibeArena_Build/; build them without --server-only." >&2
+    exit 1
+  fi
+
+  cd "$ROOT_DIR"
+  trace_init "$BUILD_TRACE" "${ROOT_DIR}/.tmp/trace-$$"
+  trap 'jobs_release_all; engine_mirror_unlock; trace_finish' EXIT
+
+  if [ "$SERVER_ONLY" = "1" ]; then
+    GRAPH_DIR="${ROOT_DIR}/.tmp/stamps/server"
+  else
+    GRAPH_DIR="${ROOT_DIR}/.tmp/stamps/build"
+  fi
+  build_graph
+  if [ "$LIST_NODES" = "1" ]; then
+    graph_list
+    exit 0
+  fi
+  graph_run
+
+  if [ "$SERVER_ONLY" = "1" ]; then
+    print_build_summary "./VibeArena_Server/run_server.sh +map oa_dm1" "verify_dedicated.log, verify_results.json"
+  else
+    print_build_summary "./VibeArena_Build/play.sh" "verify_client.log, verify_dedicated.log, verify_results.json"
+  fi
 }
 
 main "$@"
@@ -4,24 +4,69 @@ set -euo pipefail
 ROOT_DIR="$(cd "$(dirname "$0")/.." && pwd)"
 ENGINE_DIR="${ROOT_DIR}/quake_engine"
 DIST_DIR="${ROOT_DIR}/VibeArena_Build"
+SERVER_DIST_DIR="${ROOT_DIR}/VibeArena_Server"
 DEFAULT_MOD_NAME="bounce_twice_rockets"
 DEFAULT_VARIANT="default"
 MOD_NAME="$DEFAULT_MOD_NAME"
 MOD_NAME_SET=0
 MOD_VARIANT="$DEFAULT_VARIANT"
+MOD_VARIANT_SET=0
+# Variants from a comma-separated --variant; more than one builds a matrix.
+MOD_VARIANTS=""
+# --all: rebuild every mod under mods/ that changed since its last build.
+BUILD_ALL=0
+# standalone: compile the game sources with a cached q3lcc/q3asm toolchain from
+# a sparse checkout; cmake: build the engine's qagameqvm_baseq3 target.
+QVM_TOOLCHAIN="${VIBEARENA_QVM_TOOLCHAIN:-standalone}"
+
+. "${ROOT_DIR}/scripts/lib/jobs.sh"
+. "${ROOT_DIR}/scripts/lib/compiler_cache.sh"
+. "${ROOT_DIR}/scripts/lib/manifest.sh"
+. "${ROOT_DIR}/scripts/lib/graph.sh"
+. "${ROOT_DIR}/scripts/lib/trace.sh"
+. "${ROOT_DIR}/scripts/lib/mods.sh"
 
 while [ $# -gt 0 ]; do
   case "$1" in
     --variant)
       shift
       if [ $# -eq 0 ]; then
-        echo "ERROR: --variant requires a value: default or debug-visible." >&2
+        echo "ERROR: --variant requires a value: default, debug-visible, or a comma-separated list." >&2
         exit 1
       fi
       MOD_VARIANT="$1"
+      MOD_VARIANT_SET=1
       ;;
     --debug-visible)
       MOD_VARIANT="debug-visible"
+      MOD_VARIANT_SET=1
+      ;;
+    --all)
+      BUILD_ALL=1
+      ;;
+    --qvm-toolchain)
+      shift
+      if [ $# -eq 0 ]; then
+        echo "ERROR: --qvm-toolchain requires a value: standalone or cmake." >&2
+        exit 1
+      fi
+      QVM_TOOLCHAIN="$1"
+      ;;
+    --only)
+      shift
+      if [ $# -eq 0 ]; then
+        echo "ERROR: --only requires a node list: sources, toolchain, qvm, package, launcher, publish." >&2
+        exit 1
+      fi
+      GRAPH_ONLY="$1"
+      ;;
+    --from)
+      shift
+      if [ $# -eq 0 ]; then
+        echo "ERROR: --from requires a node: sources, toolchain, qvm, package, launcher, publish." >&2
+        exit 1
+      fi
+      GRAPH_FROM="$1"
       ;;
     *)
       if [ "$MOD_NAME_SET" -eq 0 ]; then
@@ -29,7 +74,7 @@ while [ $# -gt 0 ]; do
         MOD_NAME_SET=1
       else
         echo "ERROR: unexpected argument '$1'." >&2
-        echo "Usage: ./scripts/generate_default_mod.sh [mod_name] [--variant default|debug-visible]" >&2
+        echo "Usage: ./scripts/generate_default_mod.sh [mod_name|--all] [--variant default|debug-visible[,...]] [--qvm-toolchain standalone|cmake] [--only NODES] [--from NODE]" >&2
         exit 1
       fi
       ;;
@@ -40,23 +85,66 @@ done
 REQUIRED_CMAKE_MAJOR=3
 REQUIRED_CMAKE_MINOR=25
 LOCAL_CMAKE_VERSION="3.31.6"
-LOCAL_CMAKE_DIR="${ROOT_DIR}/.tools/cmake-${LOCAL_CMAKE_VERSION}-macos-universal"
-LOCAL_CMAKE_ARCHIVE="${ROOT_DIR}/.tools/cmake-${LOCAL_CMAKE_VERSION}-macos-universal.tar.gz"
-LOCAL_CMAKE_BIN="${LOCAL_CMAKE_DIR}/CMake.app/Contents/bin/cmake"
-
-MOD_DIR="${ROOT_DIR}/mods/${MOD_NAME}"
-PATCH_DIR="${MOD_DIR}/patches"
-PATCH_FILE="${PATCH_DIR}/rocket_bounce_twice.patch"
-MOD_BUILD_DIR="${MOD_DIR}/build"
-MOD_VM_DIR="${MOD_BUILD_DIR}/vm"
-MOD_DIST_DIR="${DIST_DIR}/${MOD_NAME}"
-MOD_PK3="${MOD_DIST_DIR}/z_${MOD_NAME}.pk3"
-MOD_LAUNCHER="${DIST_DIR}/run_${MOD_NAME}.sh"
-
-TMP_ROOT="${ROOT_DIR}/.tmp/modgen-${MOD_NAME}-$$"
-TMP_ENGINE="${TMP_ROOT}/engine"
-TMP_BUILD="${TMP_ENGINE}/build-mod"
-WORKTREE_ADDED=0
+case "$(uname -s)" in
+  Darwin)
+    LOCAL_CMAKE_PLATFORM="macos-universal"
+    LOCAL_CMAKE_BIN_PATH="CMake.app/Contents/bin/cmake"
+    ;;
+  *)
+    LOCAL_CMAKE_PLATFORM="linux-$(uname -m)"
+    LOCAL_CMAKE_BIN_PATH="bin/cmake"
+    ;;
+esac
+LOCAL_CMAKE_DIR="${ROOT_DIR}/.tools/cmake-${LOCAL_CMAKE_VERSION}-${LOCAL_CMAKE_PLATFORM}"
+LOCAL_CMAKE_ARCHIVE="${ROOT_DIR}/.tools/cmake-${LOCAL_CMAKE_VERSION}-${LOCAL_CMAKE_PLATFORM}.tar.gz"
+LOCAL_CMAKE_BIN="${LOCAL_CMAKE_DIR}/${LOCAL_CMAKE_BIN_PATH}"
+
+# Usage: set_mod_paths <mod>
+# Points the per-mod paths below at mods/<mod>/; a variant matrix switches
+# between its variants' mods with it.
+set_mod_paths() {
+  MOD_NAME="$1"
+  MOD_DIR="${ROOT_DIR}/mods/${MOD_NAME}"
+  PATCH_DIR="${MOD_DIR}/patches"
+  PATCH_FILE="${PATCH_DIR}/rocket_bounce_twice.patch"
+  MOD_BUILD_DIR="${MOD_DIR}/build"
+  MOD_VM_DIR="${MOD_BUILD_DIR}/vm"
+  MOD_DIST_DIR="${DIST_DIR}/${MOD_NAME}"
+  MOD_PK3="${MOD_DIST_DIR}/z_${MOD_NAME}.pk3"
+  MOD_LAUNCHER="${DIST_DIR}/run_${MOD_NAME}.sh"
+
+  # Persistent engine worktree (patch applied) and configured build tree for
+  # the mod, reused so a rebuild only recompiles the game sources that changed.
+  MOD_WORKSPACE="${ROOT_DIR}/.tmp/mod-workspaces/${MOD_NAME}"
+  WS_ENGINE="${MOD_WORKSPACE}/engine"
+  WS_BUILD="${WS_ENGINE}/build-mod"
+  # Standalone toolchain: sparse worktree with just the game sources, and the
+  # .asm files and linked qagame.qvm.
+  WS_GAME="${MOD_WORKSPACE}/game"
+  WS_QVM="${MOD_WORKSPACE}/qvm"
+}
+
+set_mod_paths "$MOD_NAME"
+# Base name of a variant matrix; its variants share one game worktree and
+# object set in .tmp/mod-workspaces/<name>.matrix/ (mod names have no dots).
+MATRIX_NAME="$MOD_NAME"
+MATRIX_WORKSPACE="${ROOT_DIR}/.tmp/mod-workspaces/${MOD_NAME}.matrix"
+QVM_SPARSE_DIRS="code/game code/qcommon code/botlib"
+# ioquake3's game QVM compile flags; q3lcc runs q3cpp and q3rcc from its own
+# directory.
+QVM_LCC_FLAGS="-DQ3_VM -DQAGAME -S -Wf-target=bytecode -Wf-g"
+CACHE_ROOT="${VIBEARENA_CACHE_DIR:-${XDG_CACHE_HOME:-$HOME/.cache}/vibearena}"
+QVM_TOOLS_CACHE="${CACHE_ROOT}/qvm-tools"
+# Compiled .asm per preprocessed game source, shared by every mod and variant.
+QVM_ASM_CACHE="${CACHE_ROOT}/qvm-asm"
+QVM_ASM_CACHE_MAX_MB="${VIBEARENA_QVM_ASM_CACHE_MAX_MB:-512}"
+QVM_ASM_CACHE_ENABLED="${VIBEARENA_QVM_ASM_CACHE:-1}"
+# Set by the toolchain node: directory holding q3lcc, q3cpp, q3rcc, q3asm.
+QVM_TOOLS=""
+# Set by the cmake node.
+CMAKE_BIN=""
+# Hash of the engine patches build.sh applied in quake_engine/; set in main.
+ENGINE_DIFF_HASH=""
 
 require_cmd() {
   if ! command -v "$1" >/dev/null 2>&1; then
@@ -93,7 +181,7 @@ detect_cmake() {
 
   if [ ! -x "$LOCAL_CMAKE_BIN" ]; then
     echo "Bootstrapping local CMake ${LOCAL_CMAKE_VERSION} into .tools/"
-    curl -L "https://github.com/Kitware/CMake/releases/download/v${LOCAL_CMAKE_VERSION}/cmake-${LOCAL_CMAKE_VERSION}-macos-universal.tar.gz" -o "$LOCAL_CMAKE_ARCHIVE"
+    curl -L "https://github.com/Kitware/CMake/releases/download/v${LOCAL_CMAKE_VERSION}/cmake-${LOCAL_CMAKE_VERSION}-${LOCAL_CMAKE_PLATFORM}.tar.gz" -o "$LOCAL_CMAKE_ARCHIVE"
     tar -xzf "$LOCAL_CMAKE_ARCHIVE" -C "${ROOT_DIR}/.tools"
   fi
 
@@ -106,16 +194,14 @@ detect_cmake() {
 }
 
 cleanup() {
-  if [ "$WORKTREE_ADDED" -eq 1 ]; then
-    git -C "$ENGINE_DIR" worktree remove --force "$TMP_ENGINE" >/dev/null 2>&1 || true
-  fi
-  rm -rf "$TMP_ROOT"
+  jobs_release_all
+  workspace_unlock
 }
 
-write_patch_file() {
-  mkdir -p "$PATCH_DIR"
-  if [ "$MOD_VARIANT" = "debug-visible" ]; then
-    cat > "$PATCH_FILE" <<'PATCH'
+# Usage: patch_template <default|debug-visible>
+patch_template() {
+  if [ "$1" = "debug-visible" ]; then
+    cat <<'PATCH'
 diff --git a/code/game/g_missile.c b/code/game/g_missile.c
 --- a/code/game/g_missile.c
 +++ b/code/game/g_missile.c
@@ -203,7 +289,7 @@ diff --git a/code/game/bg_public.h b/code/game/bg_public.h
  
 PATCH
   else
-    cat > "$PATCH_FILE" <<'PATCH'
+    cat <<'PATCH'
 diff --git a/code/game/g_missile.c b/code/game/g_missile.c
 --- a/code/game/g_missile.c
 +++ b/code/game/g_missile.c
@@ -281,13 +367,32 @@ PATCH
   fi
 }
 
+# Writes the variant's template unless the patch was edited by hand: a patch
+# that matches neither template is kept, so it can be changed line by line.
+write_patch_file() {
+  local variant
+
+  mkdir -p "$PATCH_DIR"
+  if [ -f "$PATCH_FILE" ]; then
+    for variant in default debug-visible; do
+      if patch_template "$variant" | cmp -s - "$PATCH_FILE"; then
+        patch_template "$MOD_VARIANT" > "$PATCH_FILE"
+        return 0
+      fi
+    done
+    echo "Keeping edited patch: ${PATCH_FILE} (delete it to regenerate the ${MOD_VARIANT} template)"
+    return 0
+  fi
+  patch_template "$MOD_VARIANT" > "$PATCH_FILE"
+}
+
 write_mod_readme() {
   mkdir -p "$MOD_DIR"
   if [ "$MOD_VARIANT" = "debug-visible" ]; then
     cat > "${MOD_DIR}/README.md" <<EOF
 # ${MOD_NAME}
 
-Debug-visible vibe mod generated by \`scripts/generate_default_mod.sh\`.
+${MOD_DEBUG_VISIBLE_MARKER} generated by \`scripts/generate_default_mod.sh\`.
 
 Behavior:
 - Rocket launcher projectiles bounce on any impact (including players) for clear testing.
@@ -334,14 +439,29 @@ write_mod_scaffold() {
   touch "${MOD_DIR}/scripts/.gitkeep" "${MOD_DIR}/maps/.gitkeep" "${MOD_DIR}/textures/.gitkeep" "${MOD_DIR}/sound/.gitkeep" "${MOD_DIR}/vm/.gitkeep"
 }
 
+client_dist_ready() {
+  [ -f "${DIST_DIR}/play.sh" ] && [ -f "${DIST_DIR}/baseoa/pak0.pk3" ]
+}
+
+# A build.sh --server-only base (headless hosts) is enough to build mods: the
+# pk3 is published to VibeArena_Server/ and no client launcher is written.
+server_dist_ready() {
+  [ -x "${SERVER_DIST_DIR}/ioq3ded" ] && [ -f "${SERVER_DIST_DIR}/baseoa/pak0.pk3" ]
+}
+
 ensure_base_setup() {
   if [ ! -x "${ROOT_DIR}/scripts/build.sh" ]; then
     echo "ERROR: scripts/build.sh not found or not executable." >&2
     exit 1
   fi
 
-  if [ ! -f "${DIST_DIR}/play.sh" ] || [ ! -f "${DIST_DIR}/baseoa/pak0.pk3" ]; then
-    echo "Base build not found; running scripts/build.sh first..."
+  if ! client_dist_ready && ! server_dist_ready; then
+    # build.sh honours VIBEARENA_SERVER_ONLY=1 itself.
+    if [ "${VIBEARENA_SERVER_ONLY:-0}" = "1" ]; then
+      echo "Base build not found; running scripts/build.sh --server-only first..."
+    else
+      echo "Base build not found; running scripts/build.sh first (on a headless host, run scripts/build.sh --server-only instead)..."
+    fi
     "${ROOT_DIR}/scripts/build.sh"
   fi
 
@@ -351,23 +471,340 @@ ensure_base_setup() {
   fi
 }
 
-build_qagame_qvm() {
+# git worktree add/prune and sparse-checkout rewrite the engine checkout's
+# shared worktree list and config, so mod builds running at the same time (for
+# example under --all) take turns creating their workspaces.
+workspace_lock() {
+  local lock="${ENGINE_DIR}/.git/vibearena-worktrees.lock"
+  local owner
+
+  while ! mkdir "$lock" 2>/dev/null; do
+    owner="$(cat "$lock/pid" 2>/dev/null || true)"
+    if [ -n "$owner" ] && ! ps -p "$owner" >/dev/null 2>&1; then
+      rm -rf "$lock"
+      continue
+    fi
+    sleep 0.2
+  done
+  echo "$$" > "$lock/pid"
+}
+
+workspace_unlock() {
+  local lock="${ENGINE_DIR}/.git/vibearena-worktrees.lock"
+
+  if [ "$(cat "$lock/pid" 2>/dev/null || true)" = "$$" ]; then
+    rm -rf "$lock"
+  fi
+}
+
+# The engine patches as build.sh applied them in quake_engine/ (staged with
+# git apply --index), so mods build against the same game code as the engine.
+engine_diff() {
+  git -C "$ENGINE_DIR" diff HEAD --binary
+}
+
+# Usage: sync_mod_workspace <worktree> [sparse directory...]
+# Brings a workspace worktree to the engine revision plus the engine patches
+# plus the mod patch. The patched tree is built in a scratch index and checked
+# out with read-tree,
+# which only rewrites files whose contents differ, so unchanged sources keep
+# their mtimes and are not recompiled. With directories, the worktree is a
+# sparse checkout of just those.
+sync_mod_workspace() {
+  local worktree="$1"
+  local head index current patched changed
+  shift
+
+  head="$(git -C "$ENGINE_DIR" rev-parse HEAD)"
+  if [ ! -f "${worktree}/.git" ] || ! git -C "$worktree" rev-parse --verify --quiet HEAD >/dev/null 2>&1; then
+    echo "Creating mod workspace ${worktree#${ROOT_DIR}/}..."
+    rm -rf "$worktree"
+    mkdir -p "$MOD_WORKSPACE"
+    workspace_lock
+    git -C "$ENGINE_DIR" worktree prune
+    if [ $# -gt 0 ]; then
+      # Empty index: the read-tree below checks out only the sparse paths.
+      git -C "$ENGINE_DIR" worktree add --quiet --no-checkout --detach "$worktree" "$head"
+      git -C "$worktree" sparse-checkout set --cone "$@"
+    else
+      git -C "$ENGINE_DIR" worktree add --quiet --detach "$worktree" "$head"
+    fi
+    workspace_unlock
+  fi
+
+  if ! git -C "$worktree" diff --quiet; then
+    echo "Discarding edits made inside the mod workspace; edit ${PATCH_FILE#${ROOT_DIR}/} instead."
+    git -C "$worktree" checkout -- .
+  fi
+
+  index="${MOD_WORKSPACE}/patch.index"
+  rm -f "$index"
+  GIT_INDEX_FILE="$index" git -C "$worktree" read-tree "$head"
+  engine_diff > "${MOD_WORKSPACE}/engine.diff"
+  if [ -s "${MOD_WORKSPACE}/engine.diff" ] &&
+    ! GIT_INDEX_FILE="$index" git -C "$worktree" apply --cached "${MOD_WORKSPACE}/engine.diff"; then
+    rm -f "$index"
+    echo "ERROR: the engine patches in quake_engine/ do not apply to ioquake3 $(echo "$head" | cut -c1-12); rerun ./scripts/build.sh." >&2
+    exit 1
+  fi
+  if ! GIT_INDEX_FILE="$index" git -C "$worktree" apply --cached "$PATCH_FILE"; then
+    rm -f "$index"
+    if [ -s "${MOD_WORKSPACE}/engine.diff" ]; then
+      echo "ERROR: ${PATCH_FILE#${ROOT_DIR}/} does not apply to ioquake3 $(echo "$head" | cut -c1-12) with the engine patches applied." >&2
+    else
+      echo "ERROR: ${PATCH_FILE#${ROOT_DIR}/} does not apply to ioquake3 $(echo "$head" | cut -c1-12)." >&2
+    fi
+    exit 1
+  fi
+  patched="$(GIT_INDEX_FILE="$index" git -C "$worktree" write-tree)"
+  rm -f "$index"
+
+  current="$(git -C "$worktree" write-tree)"
+  if [ "$current" = "$patched" ]; then
+    echo "Mod workspace is up to date with the patch."
+  else
+    changed="$(git -C "$worktree" diff --name-only "$current" "$patched" -- "$@" | wc -l | tr -d ' ')"
+    if [ "$changed" -le 8 ]; then
+      changed="$(git -C "$worktree" diff --name-only "$current" "$patched" -- "$@" | tr '\n' ' ')"
+    else
+      changed="${changed} files"
+    fi
+    git -C "$worktree" read-tree -m -u "$current" "$patched"
+    echo "Updated in mod workspace: ${changed}"
+  fi
+  git -C "$worktree" update-ref --no-deref HEAD "$head"
+}
+
+# Everything the QVM tools are built from: the tools source tree (shared by
+# engine revisions that did not touch it), local changes to it, and the host
+# compiler.
+qvm_tools_key() {
+  {
+    echo "tools=$(git -C "$ENGINE_DIR" rev-parse HEAD:code/tools 2>/dev/null || git -C "$ENGINE_DIR" rev-parse HEAD)"
+    git -C "$ENGINE_DIR" diff HEAD --binary -- code/tools
+    echo "compiler=$("${CC:-cc}" --version 2>/dev/null | head -n1)"
+    echo "host=$(uname -s)-$(uname -m)"
+  } | graph_sha256
+}
+
+# Sets QVM_TOOLS. Builds q3lcc, q3cpp, q3rcc and q3asm with the engine's CMake
+# project once and caches them in ~/.cache/vibearena/qvm-tools/<key>/; every
+# mod built against the same tools source reuses them.
+build_qvm_tools() {
   local cmake_bin="$1"
-  local jobs qvm_path
+  local key entry tmp_entry jobs tool path
 
-  mkdir -p "$TMP_ROOT"
-  git -C "$ENGINE_DIR" worktree add --detach "$TMP_ENGINE" >/dev/null
-  WORKTREE_ADDED=1
+  key="$(qvm_tools_key)"
+  entry="${QVM_TOOLS_CACHE}/${key}"
+  QVM_TOOLS="$entry"
+  if [ -x "${entry}/q3lcc" ] && [ -x "${entry}/q3cpp" ] && [ -x "${entry}/q3rcc" ] && [ -x "${entry}/q3asm" ]; then
+    echo "QVM toolchain cache hit ($(echo "$key" | cut -c1-12))."
+    return 0
+  fi
+
+  echo "Building QVM toolchain ($(echo "$key" | cut -c1-12))..."
+  rm -rf "$entry"
+  tmp_entry="${entry}.tmp.$$"
+  rm -rf "$tmp_entry"
+  mkdir -p "$tmp_entry"
+  compiler_cache_setup "$ENGINE_DIR"
+  manifest_request "${tmp_entry}/build"
+  "$cmake_bin" -S "$ENGINE_DIR" -B "${tmp_entry}/build" -DCMAKE_BUILD_TYPE=Release \
+    -DBUILD_CLIENT=OFF -DBUILD_RENDERER_GL1=OFF -DBUILD_RENDERER_GL2=OFF $COMPILER_CACHE_CMAKE_ARGS
+  jobs="$(jobs_acquire qvm)"
+  "$cmake_bin" --build "${tmp_entry}/build" --target q3lcc q3cpp q3rcc q3asm -j"$jobs"
+  jobs_release qvm
+  compiler_cache_report
+
+  manifest_write "${tmp_entry}/build" "${tmp_entry}/build/vibearena-manifest.tsv" Release q3lcc q3cpp q3rcc q3asm
+  for tool in q3lcc q3cpp q3rcc q3asm; do
+    path="$(manifest_path "${tmp_entry}/build/vibearena-manifest.tsv" "$tool")"
+    if [ -z "$path" ]; then
+      echo "ERROR: the engine build produced no ${tool}; use --qvm-toolchain cmake." >&2
+      exit 1
+    fi
+    cp "$path" "${tmp_entry}/"
+  done
+  rm -rf "${tmp_entry}/build"
+
+  # Publish with a rename so concurrent mod builds never use a partial entry.
+  if ! mv "$tmp_entry" "$entry" 2>/dev/null; then
+    rm -rf "$tmp_entry"
+  fi
+}
+
+# Usage: qvm_asm_key <source, relative to WS_QVM>
+# Cache key of one game source: its preprocessed text, the compile flags and
+# the toolchain. Sources are named relative to the .asm directory, so the line
+# markers (and the .asm output) are the same in every mod workspace.
+qvm_asm_key() {
+  {
+    echo "flags=${QVM_LCC_FLAGS}"
+    echo "tools=$(basename "$QVM_TOOLS")"
+    echo "engine-patches=${ENGINE_DIFF_HASH}"
+    (cd "$WS_QVM" && "${QVM_TOOLS}/q3lcc" -E $QVM_LCC_FLAGS "$1")
+  } | graph_sha256
+}
+
+evict_qvm_asm_cache() {
+  local max_kb total_kb file file_kb
+
+  max_kb=$((QVM_ASM_CACHE_MAX_MB * 1024))
+  total_kb="$(du -sk "$QVM_ASM_CACHE" | awk '{print $1}')"
+
+  # Oldest first; every cache hit touches its entry.
+  while IFS= read -r file; do
+    [ "$total_kb" -le "$max_kb" ] && break
+    file_kb="$(du -sk "$file" | awk '{print $1}')"
+    rm -f "$file"
+    total_kb=$((total_kb - file_kb))
+  done < <(ls -1tr "$QVM_ASM_CACHE"/*/*.asm 2>/dev/null)
+}
+
+# Compiles the game sources to .asm with q3lcc, one process per file in
+# parallel, and links them with q3asm. Every source is keyed by its
+# preprocessed text, so a change to any header it includes (game, qcommon or
+# botlib) is seen. An .asm in the workspace whose recorded key still matches
+# is kept; otherwise the shared .asm cache is tried, so only sources whose
+# preprocessed text is new anywhere are compiled.
+compile_qvm_standalone() {
+  local game="${WS_GAME}/code/game"
+  local qcommon="${WS_GAME}/code/qcommon"
+  local src rel base asm key entry stale="" count=0 hits=0 jobs i
+  local objs=("${WS_QVM}/g_main.asm")
+  local miss_asm=() miss_key=()
+
+  trace_begin "patch apply"
+  sync_mod_workspace "$WS_GAME" $QVM_SPARSE_DIRS
+  trace_end
+
+  mkdir -p "$WS_QVM"
+  trace_begin "asm cache"
+  for src in "$game"/*.c "${qcommon}/q_math.c" "${qcommon}/q_shared.c"; do
+    base="$(basename "$src" .c)"
+    # g_syscalls.c is the native library's syscall shim; the QVM links
+    # g_syscalls.asm instead.
+    [ "$base" = "g_syscalls" ] && continue
+    asm="${WS_QVM}/${base}.asm"
+    if [ "$base" != "g_main" ]; then
+      objs+=("$asm")
+    fi
+
+    rel="../${src#${MOD_WORKSPACE}/}"
+    if ! key="$(qvm_asm_key "$rel")"; then
+      echo "ERROR: preprocessing ${src#${WS_GAME}/} failed; see the errors above." >&2
+      exit 1
+    fi
+    if [ -f "$asm" ] && [ "$(cat "${asm}.key" 2>/dev/null)" = "$key" ]; then
+      continue
+    fi
+
+    rm -f "$asm" "${asm}.key"
+    entry="${QVM_ASM_CACHE}/$(echo "$key" | cut -c1-2)/${key}.asm"
+    if [ "$QVM_ASM_CACHE_ENABLED" = "1" ] && [ -f "$entry" ]; then
+      cp "$entry" "$asm"
+      echo "$key" > "${asm}.key"
+      touch "$entry"
+      hits=$((hits + 1))
+      continue
+    fi
+    stale="${stale}${rel}
+"
+    miss_asm+=("$asm")
+    miss_key+=("$key")
+    count=$((count + 1))
+  done
+  trace_end
+
+  # Read by --all for its summary table.
+  echo "${hits} ${count}" > "${MOD_WORKSPACE}/asm-stats"
+  if [ "$count" -eq 0 ]; then
+    echo "No game sources to compile (${hits} from the .asm cache)."
+  else
+    jobs="$(jobs_acquire qvm "$count")"
+    echo "Compiling ${count} game source(s) with q3lcc, ${jobs} job(s) (${hits} from the .asm cache)..."
+    trace_begin "qvm compile"
+    if ! (cd "$WS_QVM" && printf '%s' "$stale" | tr '\n' '\0' | xargs -0 -n 1 -P "$jobs" "${QVM_TOOLS}/q3lcc" $QVM_LCC_FLAGS); then
+      # A failed compile can leave a partial .asm behind.
+      rm -f "${miss_asm[@]}"
+      echo "ERROR: q3lcc failed; see the errors above." >&2
+      exit 1
+    fi
+    trace_end
+    jobs_release qvm
+
+    i=0
+    while [ "$i" -lt "$count" ]; do
+      echo "${miss_key[$i]}" > "${miss_asm[$i]}.key"
+      if [ "$QVM_ASM_CACHE_ENABLED" = "1" ]; then
+        entry="${QVM_ASM_CACHE}/$(echo "${miss_key[$i]}" | cut -c1-2)/${miss_key[$i]}.asm"
+        mkdir -p "$(dirname "$entry")"
+        # Publish with a rename so concurrent mod builds never read a partial entry.
+        cp "${miss_asm[$i]}" "${entry}.tmp.$$"
+        mv "${entry}.tmp.$$" "$entry"
+      fi
+      i=$((i + 1))
+    done
+    if [ "$QVM_ASM_CACHE_ENABLED" = "1" ]; then
+      evict_qvm_asm_cache
+    fi
+  fi
+
+  trace_begin "qvm link"
+  rm -f "${WS_QVM}/qagame.qvm"
+  "${QVM_TOOLS}/q3asm" -o "${WS_QVM}/qagame.qvm" "${objs[@]}" "${game}/g_syscalls.asm"
+  trace_end
+}
+
+compile_qvm_cmake() {
+  local cmake_bin="$1"
+  local jobs configure_args
+  local configure_stamp="${WS_BUILD}/.vibearena-configure"
+
+  trace_begin "patch apply"
+  sync_mod_workspace "$WS_ENGINE"
+  trace_end
+
+  # The q3lcc toolchain is built with the host compiler and is cacheable; the
+  # QVM compiles themselves run through q3lcc and are not.
+  compiler_cache_setup "$WS_ENGINE"
+
+  # cmake --build re-runs the configure step itself when CMakeLists.txt
+  # changes, so an existing tree is only configured again for new arguments.
+  configure_args="-DCMAKE_BUILD_TYPE=Release $COMPILER_CACHE_CMAKE_ARGS"
+  if [ -f "${WS_BUILD}/CMakeCache.txt" ] && [ "$(cat "$configure_stamp" 2>/dev/null)" = "${cmake_bin} ${configure_args}" ]; then
+    echo "Reusing configured build tree ${WS_BUILD#${ROOT_DIR}/}"
+  else
+    trace_begin "qvm configure"
+    rm -f "$configure_stamp"
+    manifest_request "$WS_BUILD"
+    "$cmake_bin" -S "$WS_ENGINE" -B "$WS_BUILD" $configure_args
+    echo "${cmake_bin} ${configure_args}" > "$configure_stamp"
+    trace_end
+  fi
 
-  git -C "$TMP_ENGINE" apply "$PATCH_FILE"
+  trace_begin "qvm build"
+  jobs="$(jobs_acquire qvm)"
+  "$cmake_bin" --build "$WS_BUILD" --target qagameqvm_baseq3 -j"$jobs"
+  jobs_release qvm
+  trace_end
+  compiler_cache_report
 
-  "$cmake_bin" -S "$TMP_ENGINE" -B "$TMP_BUILD" \
-    -DCMAKE_BUILD_TYPE=Release
+  manifest_write "$WS_BUILD" "${WS_BUILD}/vibearena-manifest.tsv" Release qagameqvm_baseq3
+}
 
-  jobs="$(sysctl -n hw.ncpu 2>/dev/null || echo 4)"
-  "$cmake_bin" --build "$TMP_BUILD" --target qagameqvm_baseq3 -j"$jobs"
+build_qagame_qvm() {
+  local cmake_bin="$1"
+  local qvm_path
 
-  qvm_path="$(find "$TMP_BUILD" -type f -path '*/baseq3/vm/qagame.qvm' | head -n1)"
+  if [ "$QVM_TOOLCHAIN" = "standalone" ]; then
+    compile_qvm_standalone
+    qvm_path="${WS_QVM}/qagame.qvm"
+    [ -f "$qvm_path" ] || qvm_path=""
+  else
+    compile_qvm_cmake "$cmake_bin"
+    qvm_path="$(manifest_path "${WS_BUILD}/vibearena-manifest.tsv" qagameqvm_baseq3 /baseq3/vm/qagame.qvm)"
+  fi
   if [ -z "$qvm_path" ]; then
     echo "ERROR: qagame.qvm was not produced." >&2
     exit 1
@@ -380,13 +817,17 @@ build_qagame_qvm() {
 
 verify_qagame_identity() {
   local qvm_path="${MOD_VM_DIR}/qagame.qvm"
+  local text
 
-  if ! strings "$qvm_path" | grep -q 'baseoa-1'; then
+  # Not strings | grep -q: grep exiting at the first match makes strings die of
+  # SIGPIPE, which pipefail reports as a failed check.
+  text="$(strings "$qvm_path")"
+  if ! grep -q 'baseoa-1' <<< "$text"; then
     echo "ERROR: generated qagame.qvm does not contain baseoa-1 (OpenArena compatibility marker)." >&2
     exit 1
   fi
 
-  if strings "$qvm_path" | grep -q 'baseq3-1'; then
+  if grep -q 'baseq3-1' <<< "$text"; then
     echo "ERROR: generated qagame.qvm still contains baseq3-1, which triggers client/server mismatch with OpenArena." >&2
     exit 1
   fi
@@ -401,6 +842,16 @@ package_mod_pk3() {
   )
 }
 
+# Servers assembled with build.sh --server-only get the same pk3; run it with
+# ./VibeArena_Server/run_server.sh --mod <name>.
+publish_server_mod() {
+  [ -d "$SERVER_DIST_DIR" ] || return 0
+
+  mkdir -p "${SERVER_DIST_DIR}/${MOD_NAME}"
+  cp "$MOD_PK3" "${SERVER_DIST_DIR}/${MOD_NAME}/"
+  echo "Server copy: ${SERVER_DIST_DIR}/${MOD_NAME}/$(basename "$MOD_PK3")"
+}
+
 write_mod_launcher() {
   mkdir -p "$DIST_DIR"
 cat > "$MOD_LAUNCHER" <<'EOF'
@@ -421,16 +872,587 @@ EOF
   chmod +x "$MOD_LAUNCHER"
 }
 
+# Mod build graph nodes (scripts/lib/graph.sh). The QVM is rebuilt only when
+# the patch or the engine revision changes.
+
+node_cmake() {
+  trace_begin "cmake detect"
+  CMAKE_BIN="$(detect_cmake)"
+  trace_end
+  echo "Using CMake: $CMAKE_BIN"
+  graph_result CMAKE_BIN
+}
+
+node_toolchain() {
+  trace_begin toolchain
+  build_qvm_tools "$CMAKE_BIN"
+  trace_end
+  graph_result QVM_TOOLS
+}
+
+inputs_toolchain() {
+  qvm_tools_key
+}
+
+check_toolchain() {
+  [ -x "${QVM_TOOLS}/q3lcc" ] && [ -x "${QVM_TOOLS}/q3asm" ]
+}
+
+node_sources() {
+  write_patch_file
+  write_mod_scaffold
+  write_mod_readme
+}
+
+node_qvm() {
+  trap cleanup EXIT
+  build_qagame_qvm "$CMAKE_BIN"
+  trace_begin "strings check"
+  verify_qagame_identity
+  trace_end
+}
+
+inputs_qvm() {
+  echo "engine=$(git -C "$ENGINE_DIR" rev-parse HEAD)"
+  echo "engine-patches=${ENGINE_DIFF_HASH}"
+  echo "patch=$(graph_sha256 < "$PATCH_FILE")"
+  echo "toolchain=${QVM_TOOLCHAIN}"
+  declare -f sync_mod_workspace build_qagame_qvm verify_qagame_identity
+  if [ "$QVM_TOOLCHAIN" = "standalone" ]; then
+    declare -f qvm_asm_key compile_qvm_standalone
+  else
+    declare -f compile_qvm_cmake
+  fi
+}
+
+check_qvm() {
+  [ -f "${MOD_VM_DIR}/qagame.qvm" ]
+}
+
+node_package() {
+  trace_begin zip
+  package_mod_pk3
+  trace_end
+}
+
+inputs_package() {
+  echo "qvm=$(graph_sha256 < "${MOD_VM_DIR}/qagame.qvm")"
+}
+
+check_package() {
+  [ -f "$MOD_PK3" ]
+}
+
+node_launcher() {
+  write_mod_launcher
+}
+
+inputs_launcher() {
+  declare -f write_mod_launcher
+}
+
+check_launcher() {
+  [ -x "$MOD_LAUNCHER" ]
+}
+
+node_publish() {
+  publish_server_mod
+}
+
+mod_graph() {
+  graph_node cmake "" node_cmake
+  graph_node sources "" node_sources
+  if [ "$QVM_TOOLCHAIN" = "standalone" ]; then
+    graph_node toolchain "cmake" node_toolchain inputs_toolchain check_toolchain
+    graph_node qvm "sources toolchain" node_qvm inputs_qvm check_qvm
+  else
+    graph_node qvm "cmake sources" node_qvm inputs_qvm check_qvm
+  fi
+  graph_node package "qvm" node_package inputs_package check_package
+  if client_dist_ready; then
+    graph_node launcher "" node_launcher inputs_launcher check_launcher
+  fi
+  graph_node publish "package" node_publish
+}
+
+# Batch mode (--all): one graph node per mod under mods/, each running this
+# script for that mod. A mod is rebuilt when its patch or content, the engine
+# revision, or the generator changed; mods build in parallel, and their QVM
+# compiles share the host job budget through jobs_acquire.
+#
+# The generator rewrites its own files in the mod (README, template patch,
+# scaffold), so the content hash is taken after a build, kept next to the
+# node's stamp, and compared by the check function rather than hashed into
+# the stamp beforehand.
+
+# Hash of every file under mods/<mod>/ except build output.
+mod_content_hash() {
+  local dir="${ROOT_DIR}/mods/${1}"
+  local file
+
+  if [ ! -d "$dir" ]; then
+    echo "none"
+    return 0
+  fi
+  (cd "$dir" && find . \( -path ./build -o -name '*.pk3' \) -prune -o -type f -print | LC_ALL=C sort) |
+    while IFS= read -r file; do
+      echo "file ${file}"
+      cat "${dir}/${file#./}"
+    done | graph_sha256
+}
+
+node_batch_mod() {
+  local mod="${1#mod:}"
+
+  rm -f "${ROOT_DIR}/.tmp/mod-workspaces/${mod}/asm-stats" "$(graph_file "$1").content"
+  "${ROOT_DIR}/scripts/generate_default_mod.sh" "$mod" --variant "$(mod_variant "$mod")" --qvm-toolchain "$QVM_TOOLCHAIN"
+  mod_content_hash "$mod" > "$(graph_file "$1").content"
+}
+
+inputs_batch_mod() {
+  local mod="${1#mod:}"
+
+  echo "engine=$(git -C "$ENGINE_DIR" rev-parse HEAD)"
+  echo "engine-patches=${ENGINE_DIFF_HASH}"
+  echo "variant=$(mod_variant "$mod")"
+  echo "toolchain=${QVM_TOOLCHAIN}"
+}
+
+check_batch_mod() {
+  local mod="${1#mod:}"
+
+  [ -f "${ROOT_DIR}/mods/${mod}/build/vm/qagame.qvm" ] && [ -f "${DIST_DIR}/${mod}/z_${mod}.pk3" ] || return 1
+  [ "$(cat "$(graph_file "$1").content" 2>/dev/null)" = "$(mod_content_hash "$mod")" ] || return 1
+  if client_dist_ready; then
+    [ -x "${DIST_DIR}/run_${mod}.sh" ]
+  fi
+}
+
+# The toolchain is built once up front, so the mod builds only read its cache.
+batch_graph() {
+  local mod_dir mod deps="cmake"
+
+  graph_node cmake "" node_cmake
+  if [ "$QVM_TOOLCHAIN" = "standalone" ]; then
+    graph_node toolchain "cmake" node_toolchain inputs_toolchain check_toolchain
+    deps="toolchain"
+  fi
+  for mod_dir in "${ROOT_DIR}"/mods/*/; do
+    [ -f "${mod_dir}README.md" ] || continue
+    mod="$(basename "$mod_dir")"
+    if [[ ! "$mod" =~ ^[A-Za-z0-9_-]+$ ]]; then
+      echo "Skipping mods/${mod}: not a valid mod name."
+      continue
+    fi
+    graph_node "mod:${mod}" "$deps" node_batch_mod inputs_batch_mod check_batch_mod
+  done
+}
+
+print_batch_summary() {
+  local i=0 built=0 total=0
+  local mod state seconds hits compiled
+
+  echo
+  echo "Mod builds:"
+  printf '  %-32s %-14s %-10s %6s %10s %9s\n' mod variant result time ".asm hits" compiled
+  while [ "$i" -lt "${#GRAPH_NAMES[@]}" ]; do
+    case "${GRAPH_NAMES[$i]}" in
+      mod:*) ;;
+      *)
+        i=$((i + 1))
+        continue
+        ;;
+    esac
+    mod="${GRAPH_NAMES[$i]#mod:}"
+    case "${GRAPH_STATE[$i]}" in
+      ran) state="built" ;;
+      skipped) state="unchanged" ;;
+      *) state="${GRAPH_STATE[$i]}" ;;
+    esac
+    seconds="${GRAPH_SECONDS[$i]}"
+    hits="-"
+    compiled="-"
+    if [ "${GRAPH_STATE[$i]}" = "ran" ] && [ -f "${ROOT_DIR}/.tmp/mod-workspaces/${mod}/asm-stats" ]; then
+      read -r hits compiled < "${ROOT_DIR}/.tmp/mod-workspaces/${mod}/asm-stats"
+    fi
+    printf '  %-32s %-14s %-10s %6s %10s %9s\n' "$mod" "$(mod_variant "$mod")" "$state" "${seconds:+${seconds}s}" "$hits" "$compiled"
+    total=$((total + 1))
+    if [ "${GRAPH_STATE[$i]}" = "ran" ]; then
+      built=$((built + 1))
+    fi
+    i=$((i + 1))
+  done
+  echo "Rebuilt ${built} of ${total} mod(s)."
+}
+
+build_all_mods() {
+  if ! ls "${ROOT_DIR}"/mods/*/README.md >/dev/null 2>&1; then
+    echo "No mods under mods/ yet; generate one with ./scripts/generate_default_mod.sh [mod_name]."
+    return 0
+  fi
+
+  GRAPH_DIR="${ROOT_DIR}/.tmp/stamps/mods-all"
+  # Mod builds mostly wait on their leased QVM compile jobs, so start as many
+  # as the budget has jobs.
+  GRAPH_JOBS="${VIBEARENA_GRAPH_JOBS:-${VIBEARENA_JOB_BUDGET:-$(cpu_count)}}"
+  batch_graph
+  graph_run
+  print_batch_summary
+}
+
+# Variant matrix (--variant default,debug-visible): every variant is built as
+# its own mod (own patch, pk3 and launcher), but the QVMs are compiled from one
+# shared game worktree and object set. The qvm node brings the worktree to
+# each variant's patch in turn (read-tree only rewrites the files that differ)
+# and keys every source by its preprocessed text; a unit whose key is already
+# in the object set is linked as is, so the units the variants share are
+# compiled once and each variant only compiles the units its patch changes.
+# Packaging, launchers and publishing are separate nodes per variant.
+
+# Usage: variant_mod_name <mod> <variant>
+# debug-visible builds get a _debug suffix, like bounce_twice_rockets_debug.
+variant_mod_name() {
+  if [ "$2" = "debug-visible" ]; then
+    echo "${1}_debug"
+  else
+    echo "$1"
+  fi
+}
+
+# Usage: matrix_select <variant>
+# Points the per-mod paths at the variant's mod.
+matrix_select() {
+  set_mod_paths "$(variant_mod_name "$MATRIX_NAME" "$1")"
+  MOD_VARIANT="$1"
+}
+
+# Says which mod directory each variant writes, and warns before a variant
+# takes over a mod that was generated as another variant.
+announce_variant_matrix() {
+  local variant mod existing
+
+  echo "Variant matrix for ${MATRIX_NAME}:"
+  for variant in $MOD_VARIANTS; do
+    mod="$(variant_mod_name "$MATRIX_NAME" "$variant")"
+    if [ ! -f "${ROOT_DIR}/mods/${mod}/README.md" ]; then
+      echo "  ${variant} -> mods/${mod}/ (new)"
+      continue
+    fi
+    existing="$(mod_variant "$mod")"
+    if [ "$existing" = "$variant" ]; then
+      echo "  ${variant} -> mods/${mod}/ (existing, rebuilt)"
+    else
+      echo "  ${variant} -> mods/${mod}/ (existing ${existing} mod, overwritten)"
+      echo "WARNING: mods/${mod}/ was generated as the ${existing} variant; its README and template patch are replaced with the ${variant} ones (an edited patch is kept)." >&2
+    fi
+  done
+}
+
+# Compiles and links qagame.qvm for every variant of the matrix. Writes
+# "<compiled> <shared> <cache hits>" per variant to stats-<variant> in the
+# matrix workspace for the summary table.
+#
+# Misses are compiled in compile/, not in qvm/: the <base>.asm names in qvm/
+# are symlinks into the object set, and q3lcc writing through one would
+# overwrite another variant's object. compile/ sits at the same depth as
+# qvm/, so the sources' relative paths and keys are the same in both.
+compile_qvm_matrix() {
+  local objs="${MATRIX_WORKSPACE}/objs"
+  local scratch="${MATRIX_WORKSPACE}/compile"
+  local variant src base rel key obj entry game qcommon stale count shared hits jobs i
+  local link=() units=() miss_base=() miss_key=() used=""
+
+  mkdir -p "$objs"
+  for variant in $MOD_VARIANTS; do
+    matrix_select "$variant"
+    MOD_WORKSPACE="$MATRIX_WORKSPACE"
+    WS_GAME="${MATRIX_WORKSPACE}/game"
+    WS_QVM="${MATRIX_WORKSPACE}/qvm"
+    game="${WS_GAME}/code/game"
+    qcommon="${WS_GAME}/code/qcommon"
+    mkdir -p "$WS_QVM" "$scratch"
+
+    echo "Variant ${variant} (${MOD_NAME}):"
+    trace_begin "patch apply"
+    sync_mod_workspace "$WS_GAME" $QVM_SPARSE_DIRS
+    trace_end
+
+    trace_begin "asm cache"
+    link=()
+    miss_base=()
+    miss_key=()
+    stale=""
+    count=0
+    shared=0
+    hits=0
+    for src in "$game"/*.c "${qcommon}/q_math.c" "${qcommon}/q_shared.c"; do
+      base="$(basename "$src" .c)"
+      # g_syscalls.c is the native library's syscall shim; the QVM links
+      # g_syscalls.asm instead.
+      [ "$base" = "g_syscalls" ] && continue
+      rel="../${src#${MATRIX_WORKSPACE}/}"
+      if ! key="$(qvm_asm_key "$rel")"; then
+        echo "ERROR: preprocessing ${src#${WS_GAME}/} for ${variant} failed; see the errors above." >&2
+        exit 1
+      fi
+      obj="${objs}/${key}.asm"
+      # The unit is linked as <base>.asm, a symlink into the object set;
+      # q3asm wants g_main first.
+      if [ "$base" = "g_main" ]; then
+        link=("${base}:${key}" ${link[@]+"${link[@]}"})
+      else
+        link+=("${base}:${key}")
+      fi
+      used="${used}${key}.asm
+"
+      # Only a regular file is an object; anything else is left over from an
+      # interrupted or broken run.
+      if [ -f "$obj" ] && [ ! -L "$obj" ]; then
+        shared=$((shared + 1))
+        continue
+      fi
+      rm -f "$obj"
+      entry="${QVM_ASM_CACHE}/$(echo "$key" | cut -c1-2)/${key}.asm"
+      if [ "$QVM_ASM_CACHE_ENABLED" = "1" ] && [ -f "$entry" ]; then
+        cp "$entry" "$obj"
+        touch "$entry"
+        hits=$((hits + 1))
+        continue
+      fi
+      stale="${stale}${rel}
+"
+      miss_base+=("$base")
+      miss_key+=("$key")
+      count=$((count + 1))
+    done
+    trace_end
+
+    if [ "$count" -eq 0 ]; then
+      echo "No game sources to compile (${shared} shared, ${hits} from the .asm cache)."
+    else
+      jobs="$(jobs_acquire qvm "$count")"
+      echo "Compiling ${count} game source(s) with q3lcc, ${jobs} job(s) (${shared} shared, ${hits} from the .asm cache)..."
+      trace_begin "qvm compile"
+      rm -f "$scratch"/*.asm
+      if ! (cd "$scratch" && printf '%s' "$stale" | tr '\n' '\0' | xargs -0 -n 1 -P "$jobs" "${QVM_TOOLS}/q3lcc" $QVM_LCC_FLAGS); then
+        rm -f "$scratch"/*.asm
+        echo "ERROR: q3lcc failed for ${variant}; see the errors above." >&2
+        exit 1
+      fi
+      trace_end
+      jobs_release qvm
+
+      i=0
+      while [ "$i" -lt "$count" ]; do
+        mv "${scratch}/${miss_base[$i]}.asm" "${objs}/${miss_key[$i]}.asm"
+        if [ "$QVM_ASM_CACHE_ENABLED" = "1" ]; then
+          entry="${QVM_ASM_CACHE}/$(echo "${miss_key[$i]}" | cut -c1-2)/${miss_key[$i]}.asm"
+          mkdir -p "$(dirname "$entry")"
+          # Publish with a rename so concurrent mod builds never read a partial entry.
+          cp "${objs}/${miss_key[$i]}.asm" "${entry}.tmp.$$"
+          mv "${entry}.tmp.$$" "$entry"
+        fi
+        i=$((i + 1))
+      done
+    fi
+    echo "${count} ${shared} ${hits}" > "${MATRIX_WORKSPACE}/stats-${variant}"
+
+    trace_begin "qvm link"
+    units=()
+    for entry in "${link[@]}"; do
+      rm -f "${WS_QVM}/${entry%%:*}.asm"
+      ln -s "../objs/${entry#*:}.asm" "${WS_QVM}/${entry%%:*}.asm"
+      units+=("${WS_QVM}/${entry%%:*}.asm")
+    done
+    rm -f "${WS_QVM}/qagame.qvm"
+    "${QVM_TOOLS}/q3asm" -o "${WS_QVM}/qagame.qvm" "${units[@]}" "${game}/g_syscalls.asm"
+    trace_end
+    rm -rf "$MOD_BUILD_DIR"
+    mkdir -p "$MOD_VM_DIR"
+    cp "${WS_QVM}/qagame.qvm" "${MOD_VM_DIR}/qagame.qvm"
+    trace_begin "strings check"
+    verify_qagame_identity
+    trace_end
+  done
+
+  # Keep only the objects some variant links now.
+  for obj in "$objs"/*.asm; do
+    [ -f "$obj" ] || [ -L "$obj" ] || continue
+    case "$used" in
+      *"$(basename "$obj")"*) ;;
+      *) rm -f "$obj" ;;
+    esac
+  done
+  if [ "$QVM_ASM_CACHE_ENABLED" = "1" ] && [ -d "$QVM_ASM_CACHE" ]; then
+    evict_qvm_asm_cache
+  fi
+}
+
+node_matrix_sources() (
+  matrix_select "${1#sources:}"
+  node_sources
+)
+
+node_matrix_qvm() {
+  trap cleanup EXIT
+  compile_qvm_matrix
+}
+
+inputs_matrix_qvm() (
+  local variant
+
+  echo "engine=$(git -C "$ENGINE_DIR" rev-parse HEAD)"
+  echo "engine-patches=${ENGINE_DIFF_HASH}"
+  for variant in $MOD_VARIANTS; do
+    matrix_select "$variant"
+    echo "patch ${variant} ${MOD_NAME}=$(graph_sha256 < "$PATCH_FILE")"
+  done
+  declare -f sync_mod_workspace qvm_asm_key compile_qvm_matrix verify_qagame_identity
+)
+
+check_matrix_qvm() (
+  local variant
+
+  for variant in $MOD_VARIANTS; do
+    matrix_select "$variant"
+    [ -f "${MOD_VM_DIR}/qagame.qvm" ] || exit 1
+  done
+)
+
+node_matrix_package() (
+  matrix_select "${1#package:}"
+  node_package
+)
+
+inputs_matrix_package() (
+  matrix_select "${1#package:}"
+  inputs_package
+)
+
+check_matrix_package() (
+  matrix_select "${1#package:}"
+  check_package
+)
+
+node_matrix_launcher() (
+  matrix_select "${1#launcher:}"
+  node_launcher
+)
+
+inputs_matrix_launcher() (
+  matrix_select "${1#launcher:}"
+  echo "mod=${MOD_NAME}"
+  inputs_launcher
+)
+
+check_matrix_launcher() (
+  matrix_select "${1#launcher:}"
+  check_launcher
+)
+
+node_matrix_publish() (
+  matrix_select "${1#publish:}"
+  node_publish
+)
+
+# The variants' sources, packages, launchers and publish steps are independent
+# nodes; only the qvm node, which owns the shared worktree, sees all of them.
+matrix_graph() {
+  local variant sources=""
+
+  graph_node cmake "" node_cmake
+  graph_node toolchain "cmake" node_toolchain inputs_toolchain check_toolchain
+  for variant in $MOD_VARIANTS; do
+    graph_node "sources:${variant}" "" node_matrix_sources
+    sources="${sources} sources:${variant}"
+  done
+  graph_node qvm "toolchain${sources}" node_matrix_qvm inputs_matrix_qvm check_matrix_qvm
+  for variant in $MOD_VARIANTS; do
+    graph_node "package:${variant}" "qvm" node_matrix_package inputs_matrix_package check_matrix_package
+    if client_dist_ready; then
+      graph_node "launcher:${variant}" "" node_matrix_launcher inputs_matrix_launcher check_matrix_launcher
+    fi
+    graph_node "publish:${variant}" "package:${variant}" node_matrix_publish
+  done
+}
+
+print_matrix_summary() {
+  local variant mod compiled shared hits
+
+  echo
+  echo "Variant builds:"
+  printf '  %-14s %-32s %9s %7s %10s\n' variant mod compiled shared ".asm hits"
+  for variant in $MOD_VARIANTS; do
+    mod="$(variant_mod_name "$MATRIX_NAME" "$variant")"
+    compiled="-"
+    shared="-"
+    hits="-"
+    if [ -f "${MATRIX_WORKSPACE}/stats-${variant}" ]; then
+      read -r compiled shared hits < "${MATRIX_WORKSPACE}/stats-${variant}"
+    fi
+    printf '  %-14s %-32s %9s %7s %10s\n' "$variant" "$mod" "$compiled" "$shared" "$hits"
+  done
+
+  echo
+  for variant in $MOD_VARIANTS; do
+    mod="$(variant_mod_name "$MATRIX_NAME" "$variant")"
+    echo "Packaged ${variant}: ${DIST_DIR}/${mod}/z_${mod}.pk3"
+    if client_dist_ready; then
+      echo "Run ${variant}: ./VibeArena_Build/run_${mod}.sh"
+    else
+      echo "Run ${variant}: ./VibeArena_Server/run_server.sh --mod ${mod}"
+    fi
+  done
+}
+
+build_variant_matrix() {
+  announce_variant_matrix
+  GRAPH_DIR="${ROOT_DIR}/.tmp/stamps/matrix-${MATRIX_NAME}"
+  # The summary shows "-" for variants whose QVM was up to date.
+  rm -f "${MATRIX_WORKSPACE}"/stats-*
+  matrix_graph
+  graph_run
+  print_matrix_summary
+}
+
 main() {
-  local cmake_bin
+  local variant
+
+  if [ "$BUILD_ALL" = "1" ] && { [ "$MOD_NAME_SET" -eq 1 ] || [ "$MOD_VARIANT_SET" -eq 1 ]; }; then
+    echo "ERROR: --all builds every mod under mods/ with the variant in its README; do not pass a mod name or --variant." >&2
+    exit 1
+  fi
 
   if [[ ! "$MOD_NAME" =~ ^[A-Za-z0-9_-]+$ ]]; then
     echo "ERROR: invalid mod name '$MOD_NAME'. Use letters, numbers, '_' or '-'." >&2
     exit 1
   fi
 
-  if [ "$MOD_VARIANT" != "default" ] && [ "$MOD_VARIANT" != "debug-visible" ]; then
-    echo "ERROR: invalid variant '$MOD_VARIANT'. Use 'default' or 'debug-visible'." >&2
+  for variant in $(echo "$MOD_VARIANT" | tr ',' ' '); do
+    if [ "$variant" != "default" ] && [ "$variant" != "debug-visible" ]; then
+      echo "ERROR: invalid variant '$variant'. Use 'default' or 'debug-visible'." >&2
+      exit 1
+    fi
+    case " ${MOD_VARIANTS} " in
+      *" ${variant} "*)
+        echo "ERROR: variant '$variant' is listed twice." >&2
+        exit 1
+        ;;
+    esac
+    MOD_VARIANTS="${MOD_VARIANTS:+${MOD_VARIANTS} }${variant}"
+  done
+  if [ -z "$MOD_VARIANTS" ]; then
+    echo "ERROR: --variant requires a value: default, debug-visible, or a comma-separated list." >&2
+    exit 1
+  fi
+  MOD_VARIANT="${MOD_VARIANTS%% *}"
+
+  if [ "$QVM_TOOLCHAIN" != "standalone" ] && [ "$QVM_TOOLCHAIN" != "cmake" ]; then
+    echo "ERROR: invalid QVM toolchain '$QVM_TOOLCHAIN'. Use 'standalone' or 'cmake'." >&2
+    exit 1
+  fi
+  if [ "$QVM_TOOLCHAIN" = "cmake" ] && [ "$MOD_VARIANT" != "$MOD_VARIANTS" ]; then
+    echo "ERROR: a variant matrix compiles its variants from one shared game tree, which needs the standalone QVM toolchain; drop --qvm-toolchain cmake or build one variant at a time." >&2
     exit 1
   fi
 
@@ -443,26 +1465,37 @@ main() {
   require_cmd strings
 
   cd "$ROOT_DIR"
-  trap cleanup EXIT
+  trace_init "${ROOT_DIR}/build_trace.json" "${ROOT_DIR}/.tmp/trace-$$"
+  trap 'cleanup; trace_finish' EXIT
 
   ensure_base_setup
-  cmake_bin="$(detect_cmake)"
+  ENGINE_DIFF_HASH="$(engine_diff | graph_sha256)"
 
-  write_patch_file
-  write_mod_scaffold
-  write_mod_readme
-  build_qagame_qvm "$cmake_bin"
-  verify_qagame_identity
-  package_mod_pk3
-  write_mod_launcher
+  if [ "$BUILD_ALL" = "1" ]; then
+    build_all_mods
+    return 0
+  fi
+
+  if [ "$MOD_VARIANT" != "$MOD_VARIANTS" ]; then
+    build_variant_matrix
+    return 0
+  fi
+
+  GRAPH_DIR="${ROOT_DIR}/.tmp/stamps/mod-${MOD_NAME}"
+  mod_graph
+  graph_run
 
   echo
   echo "Mod generated: ${MOD_NAME} (variant: ${MOD_VARIANT})"
   echo "Patch source: ${PATCH_FILE}"
   echo "Built qagame VM: ${MOD_VM_DIR}/qagame.qvm"
   echo "Packaged mod: ${MOD_PK3}"
-  echo "Launcher: ${MOD_LAUNCHER}"
-  echo "Run: ./VibeArena_Build/run_${MOD_NAME}.sh"
+  if client_dist_ready; then
+    echo "Launcher: ${MOD_LAUNCHER}"
+    echo "Run: ./VibeArena_Build/run_${MOD_NAME}.sh"
+  else
+    echo "Run: ./VibeArena_Server/run_server.sh --mod ${MOD_NAME}"
+  fi
 }
 
 main "$@"
@@ -0,0 +1,104 @@
+# Compiler cache (ccache/sccache) wiring shared by build.sh and
+# generate_default_mod.sh (sourced, not run).
+#
+# compiler_cache_setup exports the cache configuration and fills
+# COMPILER_CACHE_CMAKE_ARGS with the CMake launcher flags; compiler_cache_report
+# prints the hits and misses accumulated since setup.
+
+COMPILER_CACHE="${VIBEARENA_COMPILER_CACHE:-auto}"
+COMPILER_CACHE_DIR="${VIBEARENA_COMPILER_CACHE_DIR:-${VIBEARENA_CACHE_DIR:-${XDG_CACHE_HOME:-$HOME/.cache}/vibearena}/compiler-cache}"
+COMPILER_CACHE_MAX_SIZE="${VIBEARENA_COMPILER_CACHE_MAX_SIZE:-5G}"
+
+COMPILER_CACHE_TOOL=""
+COMPILER_CACHE_CMAKE_ARGS=""
+COMPILER_CACHE_BASELINE="0 0"
+
+compiler_cache_detect() {
+  case "$COMPILER_CACHE" in
+    none|0|off)
+      ;;
+    auto)
+      command -v ccache 2>/dev/null || command -v sccache 2>/dev/null || true
+      ;;
+    *)
+      command -v "$COMPILER_CACHE" 2>/dev/null || true
+      ;;
+  esac
+}
+
+# "<hits> <misses>" from the tool's cumulative statistics.
+compiler_cache_counts() {
+  case "$COMPILER_CACHE_TOOL" in
+    '')
+      echo "0 0"
+      ;;
+    *sccache)
+      "$COMPILER_CACHE_TOOL" --show-stats 2>/dev/null | awk '
+        /^Cache hits +[0-9]+$/ { hits = $NF }
+        /^Cache misses +[0-9]+$/ { misses = $NF }
+        END { print hits + 0, misses + 0 }'
+      ;;
+    *)
+      "$COMPILER_CACHE_TOOL" --print-stats 2>/dev/null | awk -F '\t' '
+        $1 ~ /_cache_hit$/ { hits += $2 }
+        $1 == "cache_miss" { misses += $2 }
+        END { print hits + 0, misses + 0 }'
+      ;;
+  esac
+}
+
+# Usage: compiler_cache_setup <source_root>
+# Paths under source_root are hashed relative to it, so throwaway worktrees in
+# different directories still hit entries created by other checkouts.
+compiler_cache_setup() {
+  local source_root="$1"
+
+  COMPILER_CACHE_TOOL="$(compiler_cache_detect)"
+  if [ -z "$COMPILER_CACHE_TOOL" ]; then
+    case "$COMPILER_CACHE" in
+      auto|none|0|off) ;;
+      *)
+        echo "ERROR: compiler cache '$COMPILER_CACHE' not found in PATH." >&2
+        exit 1
+        ;;
+    esac
+    # Clear a launcher left in CMakeCache.txt by an earlier configure.
+    COMPILER_CACHE_CMAKE_ARGS="-DCMAKE_C_COMPILER_LAUNCHER= -DCMAKE_CXX_COMPILER_LAUNCHER="
+    return 0
+  fi
+
+  mkdir -p "$COMPILER_CACHE_DIR"
+  case "$COMPILER_CACHE_TOOL" in
+    *sccache)
+      # sccache hashes absolute paths; only builds from the same directory share entries.
+      export SCCACHE_DIR="$COMPILER_CACHE_DIR"
+      export SCCACHE_CACHE_SIZE="$COMPILER_CACHE_MAX_SIZE"
+      ;;
+    *)
+      export CCACHE_DIR="$COMPILER_CACHE_DIR"
+      export CCACHE_MAXSIZE="$COMPILER_CACHE_MAX_SIZE"
+      export CCACHE_BASEDIR="$source_root"
+      export CCACHE_NOHASHDIR=1
+      ;;
+  esac
+
+  COMPILER_CACHE_CMAKE_ARGS="-DCMAKE_C_COMPILER_LAUNCHER=${COMPILER_CACHE_TOOL} -DCMAKE_CXX_COMPILER_LAUNCHER=${COMPILER_CACHE_TOOL}"
+  COMPILER_CACHE_BASELINE="$(compiler_cache_counts)"
+  echo "Compiler cache: $(basename "$COMPILER_CACHE_TOOL") at ${COMPILER_CACHE_DIR} (max ${COMPILER_CACHE_MAX_SIZE})"
+}
+
+compiler_cache_report() {
+  local now hits misses total
+
+  [ -n "$COMPILER_CACHE_TOOL" ] || return 0
+
+  now="$(compiler_cache_counts)"
+  hits=$((${now% *} - ${COMPILER_CACHE_BASELINE% *}))
+  misses=$((${now#* } - ${COMPILER_CACHE_BASELINE#* }))
+  total=$((hits + misses))
+  if [ "$total" -gt 0 ]; then
+    echo "Compiler cache ($(basename "$COMPILER_CACHE_TOOL")): ${hits} hit(s), ${misses} miss(es), $((hits * 100 / total))% hit rate"
+  else
+    echo "Compiler cache ($(basename "$COMPILER_CACHE_TOOL")): no cacheable compilations"
+  fi
+}
@@ -0,0 +1,372 @@
+# Dependency-graph step runner shared by build.sh and generate_default_mod.sh
+# (sourced, not run).
+#
+# graph_node registers a step with its dependencies, the function that runs it,
+# and optional functions printing its inputs and checking its outputs.
+# graph_run starts every node whose dependencies are done, up to GRAPH_JOBS at
+# a time, and skips a node when the hash of its inputs (the code of the calling
+# script and of scripts/lib, its run function, its inputs function, and its
+# dependencies' stamps) matches the stamp written by its last successful run
+# and its check function still finds the outputs.
+# Variables a node publishes with graph_result are saved next to its stamp and
+# restored when it is skipped, so an interrupted build resumes at the first
+# unfinished node.
+#
+# GRAPH_ONLY (comma-separated) runs just those nodes, restoring everything else
+# from earlier runs; GRAPH_FROM reruns one node and everything downstream of it.
+
+GRAPH_DIR=""
+GRAPH_JOBS="${VIBEARENA_GRAPH_JOBS:-4}"
+GRAPH_ONLY=""
+GRAPH_FROM=""
+
+# Hashed into every stamp, since run functions call helpers anywhere in the
+# script: any edit to it or to the libraries reruns the nodes. Resolved here,
+# before the script changes directory.
+GRAPH_CODE_FILES=(
+  "$(cd "$(dirname "$0")" && pwd)/$(basename "$0")"
+  "$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"/*.sh
+)
+GRAPH_CODE_HASH=""
+
+GRAPH_NAMES=()
+GRAPH_DEPS=()
+GRAPH_RUN=()
+GRAPH_INPUTS=()
+GRAPH_CHECK=()
+# pending, forced, running, ran, skipped, restored, excluded, failed, or
+# stopped.
+GRAPH_STATE=()
+GRAPH_HASH=()
+GRAPH_PID=()
+GRAPH_START=()
+GRAPH_SECONDS=()
+
+prefix_output() {
+  awk -v tag="[$1] " '{ print tag $0; fflush() }'
+}
+
+kill_tree() {
+  local pid="$1"
+  local child
+
+  for child in $(pgrep -P "$pid" 2>/dev/null); do
+    kill_tree "$child"
+  done
+  kill "$pid" 2>/dev/null || true
+}
+
+# Usage: graph_node <name> "<dependency> ..." <run_fn> [inputs_fn] [check_fn]
+# run_fn gets the node name as its argument and runs in a subshell. A node
+# without inputs_fn runs every time.
+graph_node() {
+  GRAPH_NAMES+=("$1")
+  GRAPH_DEPS+=("$2")
+  GRAPH_RUN+=("$3")
+  GRAPH_INPUTS+=("${4:-}")
+  GRAPH_CHECK+=("${5:-}")
+  GRAPH_STATE+=(pending)
+  GRAPH_HASH+=("")
+  GRAPH_PID+=("")
+  GRAPH_START+=(0)
+  GRAPH_SECONDS+=("")
+}
+
+# Usage: graph_result <variable>...
+# Called from a run function to hand variables to the nodes that follow.
+graph_result() {
+  local var
+
+  for var in "$@"; do
+    printf '%s=%q\n' "$var" "${!var}"
+  done >> "$GRAPH_RESULT_FILE"
+}
+
+graph_index() {
+  local i=0
+
+  while [ "$i" -lt "${#GRAPH_NAMES[@]}" ]; do
+    if [ "${GRAPH_NAMES[$i]}" = "$1" ]; then
+      echo "$i"
+      return 0
+    fi
+    i=$((i + 1))
+  done
+  return 1
+}
+
+# Stamp and result files of a node, without extension.
+graph_file() {
+  echo "${GRAPH_DIR}/$(echo "$1" | tr ':/' '__')"
+}
+
+graph_sha256() {
+  (shasum -a 256 2>/dev/null || sha256sum) | awk '{ print $1 }'
+}
+
+graph_hash() {
+  local i="$1"
+  local dep
+
+  {
+    echo "node ${GRAPH_NAMES[$i]}"
+    echo "code ${GRAPH_CODE_HASH}"
+    declare -f "${GRAPH_RUN[$i]}"
+    for dep in ${GRAPH_DEPS[$i]}; do
+      echo "dep ${dep} $(cat "$(graph_file "$dep").stamp" 2>/dev/null)"
+    done
+    if [ -n "${GRAPH_INPUTS[$i]}" ]; then
+      "${GRAPH_INPUTS[$i]}" "${GRAPH_NAMES[$i]}"
+    fi
+  } | graph_sha256
+}
+
+graph_restore() {
+  local file
+  file="$(graph_file "$1")"
+
+  [ -f "${file}.env" ] || return 1
+  . "${file}.env"
+}
+
+graph_up_to_date() {
+  local i="$1"
+  local file
+  file="$(graph_file "${GRAPH_NAMES[$i]}")"
+
+  [ -n "${GRAPH_INPUTS[$i]}" ] || return 1
+  [ "$(cat "${file}.stamp" 2>/dev/null)" = "${GRAPH_HASH[$i]}" ] || return 1
+  graph_restore "${GRAPH_NAMES[$i]}" || return 1
+  if [ -n "${GRAPH_CHECK[$i]}" ]; then
+    "${GRAPH_CHECK[$i]}" "${GRAPH_NAMES[$i]}" || return 1
+  fi
+}
+
+graph_list() {
+  local i=0
+
+  while [ "$i" -lt "${#GRAPH_NAMES[@]}" ]; do
+    printf '  %-32s %s\n' "${GRAPH_NAMES[$i]}" "${GRAPH_DEPS[$i]:+after ${GRAPH_DEPS[$i]}}"
+    i=$((i + 1))
+  done
+}
+
+# Applies GRAPH_ONLY and GRAPH_FROM to the initial node states.
+graph_select() {
+  local n="${#GRAPH_NAMES[@]}"
+  local name i dep changed
+
+  i=0
+  while [ "$i" -lt "$n" ]; do
+    for dep in ${GRAPH_DEPS[$i]}; do
+      if ! graph_index "$dep" >/dev/null; then
+        echo "ERROR: build node ${GRAPH_NAMES[$i]} depends on unknown node '$dep'." >&2
+        exit 1
+      fi
+    done
+    i=$((i + 1))
+  done
+
+  for name in $(echo "${GRAPH_ONLY},${GRAPH_FROM}" | tr ',' ' '); do
+    if ! graph_index "$name" >/dev/null; then
+      echo "ERROR: unknown build node '$name'. Nodes:" >&2
+      graph_list >&2
+      exit 1
+    fi
+  done
+
+  if [ -n "$GRAPH_ONLY" ]; then
+    i=0
+    while [ "$i" -lt "$n" ]; do
+      case ",${GRAPH_ONLY}," in
+        *",${GRAPH_NAMES[$i]},"*)
+          GRAPH_STATE[$i]=forced
+          ;;
+        *)
+          if graph_restore "${GRAPH_NAMES[$i]}"; then
+            GRAPH_STATE[$i]=restored
+          else
+            GRAPH_STATE[$i]=excluded
+          fi
+          ;;
+      esac
+      i=$((i + 1))
+    done
+  fi
+
+  if [ -n "$GRAPH_FROM" ]; then
+    GRAPH_STATE[$(graph_index "$GRAPH_FROM")]=forced
+    changed=1
+    while [ "$changed" -eq 1 ]; do
+      changed=0
+      i=0
+      while [ "$i" -lt "$n" ]; do
+        if [ "${GRAPH_STATE[$i]}" = "pending" ]; then
+          for dep in ${GRAPH_DEPS[$i]}; do
+            if [ "${GRAPH_STATE[$(graph_index "$dep")]}" = "forced" ]; then
+              GRAPH_STATE[$i]=forced
+              changed=1
+              break
+            fi
+          done
+        fi
+        i=$((i + 1))
+      done
+    done
+  fi
+}
+
+graph_launch() {
+  local i="$1"
+  local name="${GRAPH_NAMES[$i]}"
+  local file
+  file="$(graph_file "$name")"
+
+  # Drop the old stamp first so an interrupted run is never taken as current.
+  rm -f "${file}.stamp" "${file}.env" "${file}.env.tmp"
+  : > "${file}.env.tmp"
+  (
+    (
+      GRAPH_RESULT_FILE="${file}.env.tmp"
+      # Node path for nested graphs and the build trace, e.g. mod:foo/qvm.
+      export GRAPH_NODE="${GRAPH_NODE:+${GRAPH_NODE}/}${name}"
+      "${GRAPH_RUN[$i]}" "$name"
+    ) 2>&1 | prefix_output "$name"
+  ) &
+  GRAPH_PID[$i]=$!
+  GRAPH_START[$i]=$SECONDS
+  GRAPH_STATE[$i]=running
+}
+
+graph_abort() {
+  local i=0
+
+  while [ "$i" -lt "${#GRAPH_NAMES[@]}" ]; do
+    if [ "${GRAPH_STATE[$i]}" = "running" ]; then
+      kill_tree "${GRAPH_PID[$i]}"
+      GRAPH_STATE[$i]=stopped
+    fi
+    i=$((i + 1))
+  done
+  wait 2>/dev/null || true
+}
+
+graph_summary() {
+  local i=0
+  local seconds
+
+  echo "Build graph:"
+  while [ "$i" -lt "${#GRAPH_NAMES[@]}" ]; do
+    seconds="${GRAPH_SECONDS[$i]}"
+    printf '  %-32s %-10s %s\n' "${GRAPH_NAMES[$i]}" "${GRAPH_STATE[$i]}" "${seconds:+${seconds}s}"
+    i=$((i + 1))
+  done
+}
+
+graph_run() {
+  local n="${#GRAPH_NAMES[@]}"
+  local i dep dep_state ready running pending progress rc file failed=""
+
+  mkdir -p "$GRAPH_DIR"
+  GRAPH_CODE_HASH="$(cat "${GRAPH_CODE_FILES[@]}" | graph_sha256)"
+  graph_select
+  trap 'graph_abort; exit 130' INT TERM
+
+  while :; do
+    running=0
+    progress=0
+    i=0
+    while [ "$i" -lt "$n" ]; do
+      if [ "${GRAPH_STATE[$i]}" = "running" ]; then
+        if kill -0 "${GRAPH_PID[$i]}" 2>/dev/null; then
+          running=$((running + 1))
+        else
+          rc=0
+          wait "${GRAPH_PID[$i]}" || rc=$?
+          GRAPH_SECONDS[$i]=$((SECONDS - GRAPH_START[$i]))
+          progress=1
+          file="$(graph_file "${GRAPH_NAMES[$i]}")"
+          if [ "$rc" -eq 0 ]; then
+            mv "${file}.env.tmp" "${file}.env"
+            echo "${GRAPH_HASH[$i]}" > "${file}.stamp"
+            . "${file}.env"
+            GRAPH_STATE[$i]=ran
+          else
+            GRAPH_STATE[$i]=failed
+            failed="${GRAPH_NAMES[$i]} (exit ${rc})"
+          fi
+        fi
+      fi
+      i=$((i + 1))
+    done
+
+    if [ -n "$failed" ]; then
+      graph_abort
+      trap - INT TERM
+      graph_summary
+      echo "ERROR: build node ${failed} failed; completed nodes are kept, rerun to resume." >&2
+      return 1
+    fi
+
+    pending=0
+    i=0
+    while [ "$i" -lt "$n" ]; do
+      case "${GRAPH_STATE[$i]}" in
+        pending|forced) ;;
+        *)
+          i=$((i + 1))
+          continue
+          ;;
+      esac
+      pending=$((pending + 1))
+
+      ready=1
+      for dep in ${GRAPH_DEPS[$i]}; do
+        dep_state="${GRAPH_STATE[$(graph_index "$dep")]}"
+        case "$dep_state" in
+          ran|skipped|restored) ;;
+          excluded)
+            graph_abort
+            trap - INT TERM
+            echo "ERROR: ${GRAPH_NAMES[$i]} needs ${dep}, which has not completed yet; run without --only first." >&2
+            return 1
+            ;;
+          *)
+            ready=0
+            ;;
+        esac
+      done
+      if [ "$ready" -eq 0 ] || [ "$running" -ge "$GRAPH_JOBS" ]; then
+        i=$((i + 1))
+        continue
+      fi
+
+      GRAPH_HASH[$i]="$(graph_hash "$i")"
+      progress=1
+      if [ "${GRAPH_STATE[$i]}" = "pending" ] && graph_up_to_date "$i"; then
+        GRAPH_STATE[$i]=skipped
+        echo "[${GRAPH_NAMES[$i]}] up to date"
+      else
+        graph_launch "$i"
+        running=$((running + 1))
+      fi
+      i=$((i + 1))
+    done
+
+    if [ "$pending" -eq 0 ] && [ "$running" -eq 0 ]; then
+      break
+    fi
+    if [ "$progress" -eq 0 ]; then
+      if [ "$running" -eq 0 ]; then
+        trap - INT TERM
+        echo "ERROR: build graph has a dependency cycle." >&2
+        graph_list >&2
+        return 1
+      fi
+      sleep 0.1
+    fi
+  done
+
+  trap - INT TERM
+  graph_summary
+}
@@ -0,0 +1,182 @@
+# Job sizing shared by build.sh and generate_default_mod.sh (sourced, not run).
+#
+# jobs_acquire sizes a parallel step from the usable cores (cgroup CPU quotas
+# included), available memory, and load average, and records the result as a
+# lease under the shared cache root. Builds running at the same time on the
+# host see each other's leases and split the budget instead of each taking
+# every core.
+
+JOBS_DIR="${VIBEARENA_CACHE_DIR:-${XDG_CACHE_HOME:-$HOME/.cache}/vibearena}/jobs"
+JOBS_MB_PER_JOB="${VIBEARENA_MB_PER_JOB:-512}"
+
+# Usable cores: scheduler affinity (nproc) capped by a cgroup v2/v1 CPU quota.
+cpu_count() {
+  local cpus quota="" period="" cgroup_path quota_cpus
+
+  if command -v nproc >/dev/null 2>&1; then
+    cpus="$(nproc)"
+  else
+    cpus="$(sysctl -n hw.ncpu 2>/dev/null || getconf _NPROCESSORS_ONLN 2>/dev/null || echo 1)"
+  fi
+
+  if [ -r /proc/self/cgroup ]; then
+    cgroup_path="$(awk -F: '$1 == "0" { print $3 }' /proc/self/cgroup 2>/dev/null)"
+    if [ -n "$cgroup_path" ] && [ -r "/sys/fs/cgroup${cgroup_path}/cpu.max" ]; then
+      read -r quota period < "/sys/fs/cgroup${cgroup_path}/cpu.max"
+    elif [ -r /sys/fs/cgroup/cpu.max ]; then
+      read -r quota period < /sys/fs/cgroup/cpu.max
+    elif [ -r /sys/fs/cgroup/cpu/cpu.cfs_quota_us ]; then
+      quota="$(cat /sys/fs/cgroup/cpu/cpu.cfs_quota_us)"
+      period="$(cat /sys/fs/cgroup/cpu/cpu.cfs_period_us)"
+    fi
+  fi
+
+  case "$quota" in
+    ''|max|-*|*[!0-9]*) ;;
+    *)
+      if [ -n "$period" ] && [ "$period" -gt 0 ]; then
+        quota_cpus=$(((quota + period - 1) / period))
+        if [ "$quota_cpus" -lt "$cpus" ]; then
+          cpus="$quota_cpus"
+        fi
+      fi
+      ;;
+  esac
+
+  echo "$cpus"
+}
+
+# Available memory in MB (host MemAvailable or free+inactive pages, capped by a
+# cgroup v2 memory limit). Empty when it cannot be determined.
+mem_available_mb() {
+  local mem="" limit current
+
+  if [ -r /proc/meminfo ]; then
+    mem="$(awk '/^MemAvailable:/ { print int($2 / 1024) }' /proc/meminfo)"
+    if [ -r /sys/fs/cgroup/memory.max ] && [ -r /sys/fs/cgroup/memory.current ]; then
+      limit="$(cat /sys/fs/cgroup/memory.max)"
+      current="$(cat /sys/fs/cgroup/memory.current)"
+      case "$limit" in
+        ''|max|*[!0-9]*) ;;
+        *)
+          limit=$(((limit - current) / 1048576))
+          if [ -z "$mem" ] || [ "$limit" -lt "$mem" ]; then
+            mem="$limit"
+          fi
+          ;;
+      esac
+    fi
+  elif command -v vm_stat >/dev/null 2>&1; then
+    mem="$(vm_stat | awk '
+      /page size of/ { for (i = 1; i <= NF; i++) if ($i ~ /^[0-9]+$/) page = $i }
+      /^Pages (free|inactive|speculative):/ { gsub(/\./, "", $NF); pages += $NF }
+      END { if (page > 0) print int(pages * page / 1048576) }')"
+  fi
+
+  echo "$mem"
+}
+
+# One-minute load average.
+load_average() {
+  if [ -r /proc/loadavg ]; then
+    awk '{ print $1 }' /proc/loadavg
+  elif sysctl -n vm.loadavg >/dev/null 2>&1; then
+    sysctl -n vm.loadavg | awk '{ print $2 }'
+  else
+    echo 0
+  fi
+}
+
+jobs_lock() {
+  local tries=0
+
+  while ! mkdir "${JOBS_DIR}/.lock" 2>/dev/null; do
+    tries=$((tries + 1))
+    # A holder only keeps the lock for a few stat calls; break stale locks.
+    if [ "$tries" -ge 50 ]; then
+      rm -rf "${JOBS_DIR}/.lock"
+      tries=0
+    fi
+    sleep 0.1
+  done
+}
+
+jobs_unlock() {
+  rmdir "${JOBS_DIR}/.lock" 2>/dev/null || true
+}
+
+# Sum of live leases, excluding the given lease file name. Leases of processes
+# that no longer exist are removed.
+jobs_leased() {
+  local skip="$1"
+  local lease name total=0
+
+  for lease in "$JOBS_DIR"/*.*; do
+    [ -f "$lease" ] || continue
+    name="$(basename "$lease")"
+    if ! ps -p "${name%%.*}" >/dev/null 2>&1; then
+      rm -f "$lease"
+      continue
+    fi
+    [ "$name" = "$skip" ] && continue
+    total=$((total + $(cat "$lease" 2>/dev/null || echo 0)))
+  done
+
+  echo "$total"
+}
+
+# Prints the job count for a build step and leases it until jobs_release.
+# Usage: jobs="$(jobs_acquire <tag> [max_jobs])"
+# VIBEARENA_JOBS forces a fixed count; VIBEARENA_JOB_BUDGET caps the host-wide
+# total (default: usable cores).
+jobs_acquire() {
+  local tag="$1"
+  local max_jobs="${2:-0}"
+  local cpus budget leased_others leased_all load external mem mem_jobs jobs
+
+  if [ -n "${VIBEARENA_JOBS:-}" ]; then
+    echo "$VIBEARENA_JOBS"
+    return 0
+  fi
+
+  mkdir -p "$JOBS_DIR"
+  jobs_lock
+
+  cpus="$(cpu_count)"
+  budget="${VIBEARENA_JOB_BUDGET:-$cpus}"
+  leased_others="$(jobs_leased "$$.${tag}")"
+  leased_all="$(jobs_leased "")"
+  load="$(load_average)"
+  mem="$(mem_available_mb)"
+
+  # Load not explained by leased jobs comes from outside VibeArena builds.
+  external="$(awk -v load="$load" -v leased="$leased_all" 'BEGIN { e = load - leased; if (e < 0) e = 0; printf "%d", e + 0.5 }')"
+
+  jobs=$((budget - leased_others - external))
+  if [ -n "$mem" ]; then
+    mem_jobs=$((mem / JOBS_MB_PER_JOB))
+    if [ "$mem_jobs" -lt "$jobs" ]; then
+      jobs="$mem_jobs"
+    fi
+  fi
+  if [ "$max_jobs" -gt 0 ] && [ "$jobs" -gt "$max_jobs" ]; then
+    jobs="$max_jobs"
+  fi
+  if [ "$jobs" -lt 1 ]; then
+    jobs=1
+  fi
+
+  echo "$jobs" > "${JOBS_DIR}/$$.${tag}"
+  jobs_unlock
+
+  echo "Job budget for ${tag}: ${jobs} of ${budget} (${cpus} usable cores, load ${load}, ${mem:-unknown} MB free, ${leased_others} job(s) leased elsewhere)" >&2
+  echo "$jobs"
+}
+
+jobs_release() {
+  rm -f "${JOBS_DIR}/$$.${1}"
+}
+
+jobs_release_all() {
+  rm -f "${JOBS_DIR}/$$."*
+}
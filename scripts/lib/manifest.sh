@@ -0,0 +1,157 @@
+# Build manifests shared by build.sh and generate_default_mod.sh (sourced, not
+# run).
+#
+# Artifact paths and target lists come from the CMake File API (codemodel-v2)
+# instead of scanning the build tree: manifest_request registers the query
+# before the configure step, manifest_write records target, size, SHA-256 and
+# path for each artifact of the requested targets after the build, and
+# manifest_path reads a path back.
+
+manifest_request() {
+  mkdir -p "$1/.cmake/api/v1/query"
+  : > "$1/.cmake/api/v1/query/codemodel-v2"
+}
+
+# Usage: cmake_api_query <artifacts|plan> <build_dir> <config> <target>...
+#
+# artifacts: prints "<target>\t<absolute path>" for each artifact of the
+# named targets. Executables and libraries list their artifacts directly;
+# custom targets (QVMs) expose each custom command output as a generated
+# "<output>.rule" source.
+#
+# plan: resolves a target selection against the configured tree. "qvms"
+# expands to every QVM target. Prints "target\t<name>" for each selected
+# target that exists, "missing\t<name>" for the rest, "skipped\t<name>" for
+# buildable targets left out, and "units\t<selected>\t<total>" with the
+# compile units in the selection (dependencies included) versus all targets.
+cmake_api_query() {
+  perl -MJSON::PP -e '
+    use strict;
+    use warnings;
+
+    my ($mode, $build_dir, $config, @requested) = @ARGV;
+    my $reply = "$build_dir/.cmake/api/v1/reply";
+    opendir(my $dh, $reply) or die "ERROR: no CMake File API reply in $reply.\n";
+    my ($index) = sort { $b cmp $a } grep { /^index-.*\.json$/ } readdir($dh);
+    die "ERROR: no CMake File API index in $reply.\n" unless $index;
+
+    sub load {
+      my ($file) = @_;
+      open(my $fh, "<", "$reply/$file") or die "ERROR: cannot read $reply/$file.\n";
+      local $/;
+      return decode_json(<$fh>);
+    }
+
+    my ($codemodel) = grep { $_->{kind} eq "codemodel" } @{ load($index)->{objects} };
+    die "ERROR: CMake File API reply has no codemodel.\n" unless $codemodel;
+    my $model = load($codemodel->{jsonFile});
+    my ($cfg) = grep { $_->{name} eq $config } @{ $model->{configurations} };
+    $cfg ||= $model->{configurations}[0];
+
+    my (%targets, %by_id);
+    for my $ref (@{ $cfg->{targets} }) {
+      $targets{ $ref->{name} } = $by_id{ $ref->{id} } = load($ref->{jsonFile});
+    }
+
+    my @names;
+    for my $name (@requested) {
+      if ($name eq "qvms") {
+        push @names, sort grep { /qvm/ } keys %targets;
+      } else {
+        push @names, $name;
+      }
+    }
+
+    if ($mode eq "artifacts") {
+      for my $name (@names) {
+        my $target = $targets{$name} or next;
+        my @paths;
+        for my $artifact (@{ $target->{artifacts} || [] }) {
+          my $path = $artifact->{path};
+          push @paths, $path =~ m{^/} ? $path : "$model->{paths}{build}/$path";
+        }
+        if (!@paths) {
+          for my $source (@{ $target->{sources} || [] }) {
+            my $path = $source->{path};
+            next unless $source->{isGenerated} && $path =~ s/\.rule$//;
+            $path = "$model->{paths}{source}/$path" unless $path =~ m{^/};
+            push @paths, $path if -f $path;
+          }
+        }
+        print "$name\t$_\n" for @paths;
+      }
+      exit 0;
+    }
+
+    sub units {
+      my ($target) = @_;
+      my $count = 0;
+      $count += scalar @{ $_->{sourceIndexes} } for @{ $target->{compileGroups} || [] };
+      return $count;
+    }
+
+    my (%selected, @queue);
+    for my $name (@names) {
+      if ($targets{$name}) {
+        print "target\t$name\n";
+        push @queue, $targets{$name};
+      } else {
+        print "missing\t$name\n";
+      }
+    }
+    while (my $target = shift @queue) {
+      next if $selected{ $target->{id} }++;
+      push @queue, map { $by_id{ $_->{id} } || () } @{ $target->{dependencies} || [] };
+    }
+
+    my ($selected_units, $total_units) = (0, 0);
+    for my $target (sort { $a->{name} cmp $b->{name} } values %by_id) {
+      next if $target->{type} eq "UTILITY" && !@{ $target->{sources} || [] };
+      my $count = units($target);
+      $total_units += $count;
+      if ($selected{ $target->{id} }) {
+        $selected_units += $count;
+      } elsif ($target->{type} ne "UTILITY" || $target->{name} =~ /qvm/) {
+        print "skipped\t$target->{name}\n";
+      }
+    }
+    print "units\t$selected_units\t$total_units\n";
+  ' "$@"
+}
+
+# Usage: manifest_write <build_dir> <manifest_file> <config> <target>...
+manifest_write() {
+  local build_dir="$1"
+  local manifest="$2"
+  local config="$3"
+  shift 3
+  local tmp="${manifest}.tmp.$$"
+  local artifacts target path size hash
+
+  artifacts="$(cmake_api_query artifacts "$build_dir" "$config" "$@")"
+
+  {
+    printf '# target\tsize\tsha256\tpath\n'
+    while IFS="$(printf '\t')" read -r target path; do
+      [ -n "$target" ] || continue
+      if [ ! -e "$path" ]; then
+        echo "ERROR: $target artifact missing after build: $path" >&2
+        exit 1
+      fi
+      size="$(wc -c < "$path" | tr -d ' ')"
+      hash="$( (shasum -a 256 "$path" 2>/dev/null || sha256sum "$path") | awk '{ print $1 }')"
+      printf '%s\t%s\t%s\t%s\n' "$target" "$size" "$hash" "$path"
+    done <<EOF
+$artifacts
+EOF
+  } > "$tmp"
+  mv "$tmp" "$manifest"
+}
+
+# Usage: manifest_path <manifest_file> <target> [path suffix]
+# Prints the first artifact path of the target (optionally ending in suffix).
+manifest_path() {
+  awk -F '\t' -v target="$2" -v suffix="${3:-}" '
+    $1 == target && substr($4, length($4) - length(suffix) + 1) == suffix { print $4; exit }
+  ' "$1"
+}
@@ -0,0 +1,19 @@
+# Mod directory helpers shared by build.sh and generate_default_mod.sh
+# (sourced, not run).
+#
+# A generated mod records its variant in the first line of its README's
+# description; generate_default_mod.sh writes that line from
+# MOD_DEBUG_VISIBLE_MARKER and mod_variant reads it back, so both scripts
+# agree on which variant an existing mod is rebuilt with.
+
+MOD_DEBUG_VISIBLE_MARKER="Debug-visible vibe mod"
+
+# Usage: mod_variant <mod>
+# Prints default or debug-visible for mods/<mod>/.
+mod_variant() {
+  if grep -q "^${MOD_DEBUG_VISIBLE_MARKER}" "${ROOT_DIR}/mods/${1}/README.md" 2>/dev/null; then
+    echo "debug-visible"
+  else
+    echo "default"
+  fi
+}
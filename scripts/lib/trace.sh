@@ -0,0 +1,200 @@
+# Build timing trace shared by build.sh and generate_default_mod.sh (sourced,
+# not run).
+#
+# trace_begin/trace_end bracket one phase of the build. Each phase becomes a
+# begin/end event pair in Chrome trace format, and the end event carries the
+# CPU time of the child processes that finished during the phase and, on
+# Linux, the bytes they read and wrote (/proc/<pid>/io accumulates reaped
+# children). Graph nodes show up as separate threads. trace_finish writes
+# build_trace.json (open it in chrome://tracing or https://ui.perfetto.dev) and
+# prints a per-phase summary table.
+#
+# A script started from a traced build (a mod node, or build.sh run by the mod
+# generator) appends to the parent's trace instead of writing its own.
+
+TRACE_FILE=""
+TRACE_DIR=""
+TRACE_OWNER=0
+TRACE_PID=""
+TRACE_CAT=""
+TRACE_START=""
+TRACE_TID_NAMED=""
+TRACE_STACK=()
+
+# Set by trace_now_us and trace_counters.
+TRACE_NOW=""
+TRACE_CPU=""
+TRACE_RCHAR=""
+TRACE_WCHAR=""
+TRACE_RBYTES=""
+TRACE_WBYTES=""
+
+# Usage: trace_init <trace_json> <work_dir>
+trace_init() {
+  TRACE_FILE="$1"
+  TRACE_CAT="$(basename "$0" .sh)"
+
+  if [ -n "${VIBEARENA_TRACE_DIR:-}" ] && [ -d "$VIBEARENA_TRACE_DIR" ]; then
+    TRACE_DIR="$VIBEARENA_TRACE_DIR"
+    TRACE_PID="${VIBEARENA_TRACE_PID:-$$}"
+    return 0
+  fi
+
+  TRACE_DIR="$2"
+  TRACE_OWNER=1
+  TRACE_PID="$$"
+  rm -rf "$TRACE_DIR"
+  mkdir -p "$TRACE_DIR"
+  : > "${TRACE_DIR}/events"
+  : > "${TRACE_DIR}/steps"
+  trace_now_us
+  TRACE_START="$TRACE_NOW"
+  export VIBEARENA_TRACE_DIR="$TRACE_DIR"
+  export VIBEARENA_TRACE_PID="$TRACE_PID"
+}
+
+trace_now_us() {
+  if [ -n "${EPOCHREALTIME:-}" ]; then
+    TRACE_NOW="${EPOCHREALTIME//[!0-9]/}"
+  else
+    TRACE_NOW="$(perl -MTime::HiRes=time -e 'printf "%d", time() * 1000000')"
+  fi
+}
+
+# "1m2.345s" from the times builtin, in milliseconds.
+trace_ms() {
+  local value="$1"
+  local minutes seconds fraction
+
+  minutes="${value%%m*}"
+  seconds="${value#*m}"
+  seconds="${seconds%s}"
+  fraction="${seconds#*[.,]}"
+  seconds="${seconds%%[.,]*}"
+  TRACE_MS=$(((minutes * 60 + seconds) * 1000 + 10#${fraction:-0}))
+}
+
+# Reads the children's CPU time and the I/O counters of the current shell
+# without forking, so the measurement does not count itself.
+trace_counters() {
+  local tid="${BASHPID:-$$}"
+  local shell_times child_user child_sys key value
+
+  times > "${TRACE_DIR}/times.${tid}"
+  {
+    read -r shell_times
+    read -r child_user child_sys
+  } < "${TRACE_DIR}/times.${tid}"
+  trace_ms "$child_user"
+  TRACE_CPU="$TRACE_MS"
+  trace_ms "$child_sys"
+  TRACE_CPU=$((TRACE_CPU + TRACE_MS))
+
+  TRACE_RCHAR="null"
+  TRACE_WCHAR="null"
+  TRACE_RBYTES="null"
+  TRACE_WBYTES="null"
+  if [ -r "/proc/${tid}/io" ]; then
+    while read -r key value; do
+      case "$key" in
+        rchar:) TRACE_RCHAR="$value" ;;
+        wchar:) TRACE_WCHAR="$value" ;;
+        read_bytes:) TRACE_RBYTES="$value" ;;
+        write_bytes:) TRACE_WBYTES="$value" ;;
+      esac
+    done < "/proc/${tid}/io"
+  fi
+}
+
+trace_delta() {
+  if [ "$1" = "null" ] || [ "$2" = "null" ]; then
+    echo null
+  else
+    echo $(($2 - $1))
+  fi
+}
+
+# Usage: trace_begin <phase>
+trace_begin() {
+  local tid="${BASHPID:-$$}"
+
+  [ -n "$TRACE_DIR" ] || return 0
+
+  if [ "$TRACE_TID_NAMED" != "$tid" ]; then
+    printf '{"name":"thread_name","ph":"M","pid":%s,"tid":%s,"args":{"name":"%s"}}\n' \
+      "$TRACE_PID" "$tid" "${GRAPH_NODE:-$TRACE_CAT}" >> "${TRACE_DIR}/events"
+    TRACE_TID_NAMED="$tid"
+  fi
+  trace_now_us
+  printf '{"name":"%s","cat":"%s","ph":"B","pid":%s,"tid":%s,"ts":%s}\n' \
+    "$1" "$TRACE_CAT" "$TRACE_PID" "$tid" "$TRACE_NOW" >> "${TRACE_DIR}/events"
+  trace_counters
+  TRACE_STACK+=("${TRACE_NOW} ${TRACE_CPU} ${TRACE_RCHAR} ${TRACE_WCHAR} ${TRACE_RBYTES} ${TRACE_WBYTES} $1")
+}
+
+# Ends the innermost open phase.
+trace_end() {
+  local top=$((${#TRACE_STACK[@]} - 1))
+  local started cpu rchar wchar rbytes wbytes name wall
+
+  [ -n "$TRACE_DIR" ] || return 0
+
+  trace_counters
+  read -r started cpu rchar wchar rbytes wbytes name <<EOF
+${TRACE_STACK[$top]}
+EOF
+  unset "TRACE_STACK[$top]"
+  cpu=$((TRACE_CPU - cpu))
+  rchar="$(trace_delta "$rchar" "$TRACE_RCHAR")"
+  wchar="$(trace_delta "$wchar" "$TRACE_WCHAR")"
+  rbytes="$(trace_delta "$rbytes" "$TRACE_RBYTES")"
+  wbytes="$(trace_delta "$wbytes" "$TRACE_WBYTES")"
+  trace_now_us
+  wall=$(((TRACE_NOW - started) / 1000))
+
+  printf '{"name":"%s","cat":"%s","ph":"E","pid":%s,"tid":%s,"ts":%s,"args":{"cpu_ms":%s,"read_bytes":%s,"write_bytes":%s,"disk_read_bytes":%s,"disk_write_bytes":%s}}\n' \
+    "$name" "$TRACE_CAT" "$TRACE_PID" "${BASHPID:-$$}" "$TRACE_NOW" "$cpu" "$rchar" "$wchar" "$rbytes" "$wbytes" >> "${TRACE_DIR}/events"
+  printf '%s\t%s\t%s\t%s\t%s\n' "$name" "$wall" "$cpu" "$rchar" "$wchar" >> "${TRACE_DIR}/steps"
+}
+
+# Writes the trace file and prints the summary. Only the script that started
+# the trace does this; call it from the EXIT trap.
+trace_finish() {
+  local total
+
+  [ "$TRACE_OWNER" = "1" ] || return 0
+  TRACE_OWNER=0
+  if [ ! -s "${TRACE_DIR}/steps" ]; then
+    rm -rf "$TRACE_DIR"
+    return 0
+  fi
+
+  {
+    printf '{"displayTimeUnit":"ms","traceEvents":[\n'
+    awk 'NR > 1 { printf ",\n" } { printf "%s", $0 } END { printf "\n" }' "${TRACE_DIR}/events"
+    printf ']}\n'
+  } > "$TRACE_FILE"
+
+  trace_now_us
+  total=$(((TRACE_NOW - TRACE_START) / 1000))
+  echo
+  echo "Build trace: ${TRACE_FILE} (total ${total} ms)"
+  awk -F '\t' '
+    function mb(bytes) { return bytes == "" ? "-" : sprintf("%.1f MB", bytes / 1048576) }
+    !($1 in runs) { order[++n] = $1 }
+    {
+      runs[$1]++
+      wall[$1] += $2
+      cpu[$1] += $3
+      if ($4 != "null") read[$1] += $4
+      if ($5 != "null") written[$1] += $5
+    }
+    END {
+      printf "  %-16s %5s %10s %10s %10s %10s\n", "phase", "runs", "wall", "cpu", "read", "written"
+      for (i = 1; i <= n; i++) {
+        p = order[i]
+        printf "  %-16s %5d %8d ms %8d ms %10s %10s\n", p, runs[p], wall[p], cpu[p], mb(read[p]), mb(written[p])
+      }
+    }' "${TRACE_DIR}/steps"
+  rm -rf "$TRACE_DIR"
+}